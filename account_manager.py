@@ -2,146 +2,174 @@
 Sistema de Contas Bancárias Predefinidas
 Substitui a integração Pluggy por sistema manual
 """
-from typing import Dict, List, Optional
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
 import logging
 
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from message_templates import MessageTemplate
+from callback_router import encode_callback
+
 logger = logging.getLogger(__name__)
 
+# Templates de listagem de contas
+ACCOUNT_SELECTION_LINE = MessageTemplate("{color} {name} ({type})\n")
+ACCOUNT_DETAIL_BLOCK = MessageTemplate("{color} **{name}**\n   Tipo: {type}\n   Banco: {bank_code}\n\n")
+
+# Rota do callback_data de seleção de conta (acc:<chave>)
+ACCOUNT_ROUTE = 'acc'
+ACCOUNT_SEPARATOR_CALLBACK = encode_callback(ACCOUNT_ROUTE)
+
+
+@dataclass(frozen=True, slots=True)
+class BankAccount:
+    """Conta bancária predefinida (imutável e compartilhada)"""
+    key: str
+    name: str
+    type: str
+    bank_code: str
+    color: str
+    is_revenue_account: bool
+    account_types: Tuple[str, ...] = ('Conta Corrente', 'Conta Poupança')
+
+    def __getitem__(self, field: str):
+        """Acesso por nome de campo (usado pelos templates de mensagem)"""
+        return getattr(self, field)
+
+
+PREDEFINED_ACCOUNTS = (
+    # Inter (contas de receita)
+    BankAccount('inter_pf', 'Banco Inter PF', 'Pessoa Física', 'INTER', '🟡', True),
+    BankAccount('inter_pj', 'Banco Inter PJ', 'Pessoa Jurídica', 'INTER', '🟡', True),
+
+    # C6 Bank
+    BankAccount('c6_pf', 'C6 Bank PF', 'Pessoa Física', 'C6', '⚫', False),
+    BankAccount('c6_pj', 'C6 Bank PJ', 'Pessoa Jurídica', 'C6', '⚫', False),
+
+    # Nubank
+    BankAccount('nubank_pf', 'Nubank PF', 'Pessoa Física', 'NUBANK', '💜', False),
+    BankAccount('nubank_pj', 'Nubank PJ', 'Pessoa Jurídica', 'NUBANK', '💜', False),
+
+    # Santander
+    BankAccount('santander_pf', 'Santander PF', 'Pessoa Física', 'SANTANDER', '🔴', False),
+    BankAccount('santander_pj', 'Santander PJ', 'Pessoa Jurídica', 'SANTANDER', '🔴', False),
+)
+
+
+def _account_button(account: BankAccount, prefix: str = "") -> InlineKeyboardButton:
+    return InlineKeyboardButton(
+        f"{prefix}{account.color} {account.name}",
+        callback_data=encode_callback(ACCOUNT_ROUTE, account.key)
+    )
+
+
 class AccountManager:
-    """Gerenciador de contas bancárias predefinidas"""
-    
-    def __init__(self):
-        self.predefined_accounts = {
-            # Inter
-            'inter_pf': {
-                'name': 'Banco Inter PF',
-                'type': 'Pessoa Física',
-                'bank_code': 'INTER',
-                'color': '🟡',
-                'is_revenue_account': True,  # Conta de receita
-                'account_types': ['Conta Corrente', 'Conta Poupança']
-            },
-            'inter_pj': {
-                'name': 'Banco Inter PJ',
-                'type': 'Pessoa Jurídica', 
-                'bank_code': 'INTER',
-                'color': '🟡',
-                'is_revenue_account': True,  # Conta de receita
-                'account_types': ['Conta Corrente', 'Conta Poupança']
-            },
-            
-            # C6 Bank
-            'c6_pf': {
-                'name': 'C6 Bank PF',
-                'type': 'Pessoa Física',
-                'bank_code': 'C6',
-                'color': '⚫',
-                'is_revenue_account': False,
-                'account_types': ['Conta Corrente', 'Conta Poupança']
-            },
-            'c6_pj': {
-                'name': 'C6 Bank PJ', 
-                'type': 'Pessoa Jurídica',
-                'bank_code': 'C6',
-                'color': '⚫',
-                'is_revenue_account': False,
-                'account_types': ['Conta Corrente', 'Conta Poupança']
-            },
-            
-            # Nubank
-            'nubank_pf': {
-                'name': 'Nubank PF',
-                'type': 'Pessoa Física',
-                'bank_code': 'NUBANK',
-                'color': '💜',
-                'is_revenue_account': False,
-                'account_types': ['Conta Corrente', 'Conta Poupança']
-            },
-            'nubank_pj': {
-                'name': 'Nubank PJ',
-                'type': 'Pessoa Jurídica', 
-                'bank_code': 'NUBANK',
-                'color': '💜',
-                'is_revenue_account': False,
-                'account_types': ['Conta Corrente', 'Conta Poupança']
-            },
-            
-            # Santander
-            'santander_pf': {
-                'name': 'Santander PF',
-                'type': 'Pessoa Física',
-                'bank_code': 'SANTANDER',
-                'color': '🔴',
-                'is_revenue_account': False,
-                'account_types': ['Conta Corrente', 'Conta Poupança']
-            },
-            'santander_pj': {
-                'name': 'Santander PJ',
-                'type': 'Pessoa Jurídica',
-                'bank_code': 'SANTANDER', 
-                'color': '🔴',
-                'is_revenue_account': False,
-                'account_types': ['Conta Corrente', 'Conta Poupança']
-            }
-        }
-    
-    def get_all_accounts(self) -> Dict:
+    """Registro imutável das contas predefinidas
+
+    Visões filtradas, textos e teclados são calculados uma única vez na
+    importação e compartilhados entre todos os handlers.
+    """
+
+    __slots__ = (
+        'predefined_accounts', 'revenue_accounts', 'expense_accounts',
+        'account_keys', 'account_names', 'revenue_keyboard_rows',
+        'expense_keyboard_rows', '_formatted',
+    )
+
+    def __init__(self, accounts: Tuple[BankAccount, ...] = PREDEFINED_ACCOUNTS):
+        self.predefined_accounts = MappingProxyType({account.key: account for account in accounts})
+        self.revenue_accounts = MappingProxyType({
+            account.key: account for account in accounts if account.is_revenue_account
+        })
+        self.expense_accounts = MappingProxyType({
+            account.key: account for account in accounts if not account.is_revenue_account
+        })
+
+        # Chaves e nomes na mesma ordem (usados no backfill de account_key)
+        self.account_keys = tuple(account.key for account in accounts)
+        self.account_names = tuple(account.name for account in accounts)
+
+        self.revenue_keyboard_rows = tuple((_account_button(a),) for a in self.revenue_accounts.values())
+        self.expense_keyboard_rows = tuple((_account_button(a),) for a in self.expense_accounts.values())
+
+        self._formatted = MappingProxyType({
+            (id(view), for_selection): self._render_account_list(view, for_selection)
+            for view in (self.predefined_accounts, self.revenue_accounts, self.expense_accounts)
+            for for_selection in (True, False)
+        })
+
+    def get_all_accounts(self) -> Mapping[str, BankAccount]:
         """Retornar todas as contas predefinidas"""
         return self.predefined_accounts
-    
-    def get_revenue_accounts(self) -> Dict:
+
+    def get_revenue_accounts(self) -> Mapping[str, BankAccount]:
         """Retornar apenas contas de receita (Inter PF e PJ)"""
-        return {
-            key: account for key, account in self.predefined_accounts.items()
-            if account['is_revenue_account']
-        }
-    
-    def get_expense_accounts(self) -> Dict:
+        return self.revenue_accounts
+
+    def get_expense_accounts(self) -> Mapping[str, BankAccount]:
         """Retornar contas para despesas (todas exceto receita)"""
-        return {
-            key: account for key, account in self.predefined_accounts.items()
-            if not account['is_revenue_account']
-        }
-    
-    def get_account_by_key(self, key: str) -> Optional[Dict]:
+        return self.expense_accounts
+
+    def get_account_by_key(self, key: str) -> Optional[BankAccount]:
         """Buscar conta específica por chave"""
         return self.predefined_accounts.get(key)
-    
-    def format_account_list(self, accounts: Dict, for_selection: bool = True) -> str:
+
+    def format_account_list(self, accounts: Mapping[str, BankAccount], for_selection: bool = True) -> str:
         """Formatar lista de contas para exibição"""
+        formatted = self._formatted.get((id(accounts), for_selection))
+        if formatted is not None:
+            return formatted
+        return self._render_account_list(accounts, for_selection)
+
+    @staticmethod
+    def _render_account_list(accounts: Mapping[str, BankAccount], for_selection: bool) -> str:
         if not accounts:
             return "Nenhuma conta disponível"
-        
-        text = ""
-        for key, account in accounts.items():
-            icon = account['color']
-            name = account['name']
-            type_text = account['type']
-            
-            if for_selection:
-                text += f"{icon} {name} ({type_text})\n"
-            else:
-                text += f"{icon} **{name}**\n"
-                text += f"   Tipo: {type_text}\n"
-                text += f"   Banco: {account['bank_code']}\n\n"
-        
-        return text
-    
-    def get_account_keyboard(self, accounts: Dict) -> List[List]:
-        """Gerar teclado inline para seleção de contas"""
-        from telegram import InlineKeyboardButton
-        
-        keyboard = []
-        for key, account in accounts.items():
-            icon = account['color']
-            name = account['name']
-            button = InlineKeyboardButton(
-                f"{icon} {name}",
-                callback_data=f"select_account_{key}"
-            )
-            keyboard.append([button])
-        
-        return keyboard
+
+        template = ACCOUNT_SELECTION_LINE if for_selection else ACCOUNT_DETAIL_BLOCK
+        return template.render_rows(accounts.values())
+
+    def get_account_keyboard(self, accounts: Mapping[str, BankAccount]) -> Tuple[Tuple[InlineKeyboardButton, ...], ...]:
+        """Linhas do teclado inline para seleção de contas"""
+        if accounts is self.revenue_accounts:
+            return self.revenue_keyboard_rows
+        if accounts is self.expense_accounts:
+            return self.expense_keyboard_rows
+        return tuple((_account_button(account),) for account in accounts.values())
+
+    def get_revenue_keyboard(self, cancel_callback: str) -> InlineKeyboardMarkup:
+        """Teclado pronto das contas de receita com botão de cancelar"""
+        return _revenue_keyboard(cancel_callback)
+
+    def get_expense_keyboard(self, suggested_keys: Tuple[str, ...], cancel_callback: str) -> InlineKeyboardMarkup:
+        """Teclado pronto das contas de despesa com sugeridas (⭐) primeiro"""
+        return _expense_keyboard(tuple(suggested_keys), cancel_callback)
+
 
 # Instância global do gerenciador
-account_manager = AccountManager()
\ No newline at end of file
+account_manager = AccountManager()
+
+
+@lru_cache(maxsize=None)
+def _revenue_keyboard(cancel_callback: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        account_manager.revenue_keyboard_rows
+        + ((InlineKeyboardButton("❌ Cancelar", callback_data=cancel_callback),),)
+    )
+
+
+@lru_cache(maxsize=None)
+def _expense_keyboard(suggested_keys: Tuple[str, ...], cancel_callback: str) -> InlineKeyboardMarkup:
+    expense_accounts = account_manager.expense_accounts
+    suggested = [expense_accounts[key] for key in suggested_keys if key in expense_accounts]
+    others = [account for key, account in expense_accounts.items() if key not in suggested_keys]
+
+    rows = [(_account_button(account, "⭐ "),) for account in suggested]
+    if suggested and others:
+        rows.append((InlineKeyboardButton("➖ Outras contas ➖", callback_data=ACCOUNT_SEPARATOR_CALLBACK),))
+    rows.extend((_account_button(account),) for account in others)
+    rows.append((InlineKeyboardButton("❌ Cancelar", callback_data=cancel_callback),))
+    return InlineKeyboardMarkup(rows)
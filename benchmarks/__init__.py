@@ -0,0 +1,4 @@
+"""
+Benchmarks do Bot IA Financeiro
+Execute cada script com: python -m benchmarks.<nome>
+"""
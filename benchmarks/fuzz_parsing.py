@@ -0,0 +1,216 @@
+"""
+Fuzz e benchmark do parsing pt-BR (br_parsing)
+Gera valores e datas aleatórios nos formatos que os usuários digitam, confere
+o round-trip e que entradas quebradas só levantam ValueError
+
+Uso:
+    python -m benchmarks.fuzz_parsing [--iterations 20000] [--seed 42] [--json]
+
+Também mede a vazão do parser contra a conversão antiga (replace + float)
+dos handlers e conta quantas entradas válidas ela convertia errado.
+Sai com código 1 se alguma propriedade falhar.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from br_parsing import parse_date, parse_money
+
+# Dígitos não ASCII (árabe-índicos, largura total, devanágari) e sobrescritos:
+# str.isdigit aceita todos e o \d do re aceita parte deles
+GARBAGE_ALPHABET = '0123456789.,/-R$ rsdiahojemêpassad ' + '٠١٢٣٤٥٦٧٨٩０１２５９०१२³²¹⁰'
+MAX_FAILURES_SHOWN = 10
+
+
+def legacy_money(text: str) -> float:
+    """Conversão antiga dos handlers (referência de desempenho e de erros)"""
+    value_clean = text.replace('R$', '').replace(' ', '')
+    value_clean = value_clean.replace('.', '').replace(',', '.')
+    return float(value_clean)
+
+
+def _group(integer: str, sep: str) -> str:
+    head = len(integer) % 3 or 3
+    return sep.join([integer[:head]] + [integer[i:i + 3] for i in range(head, len(integer), 3)])
+
+
+def random_money(rng: random.Random):
+    """(texto digitado, valor esperado) em um dos estilos aceitos"""
+    cents_total = rng.choice((rng.randint(1, 99_999), rng.randint(1, 10**11)))
+    value = Decimal(cents_total).scaleb(-2)
+    integer, cents = divmod(cents_total, 100)
+    integer = str(integer)
+
+    thousands, decimal_sep = rng.choice(((None, ','), (None, '.'), ('.', ','), (',', '.'), (' ', ','), ('\u00a0', ',')))
+    text = _group(integer, thousands) if thousands else integer
+    if cents or rng.random() < 0.5:
+        digits = f'{cents:02d}'
+        if digits.endswith('0') and rng.random() < 0.5:
+            digits = digits[0]
+        text += decimal_sep + digits
+
+    prefix = rng.choice(('', '', 'R$', 'R$ ', 'r$ ', ' '))
+    return prefix + text + rng.choice(('', '', ' ')), value
+
+
+def random_date(rng: random.Random, today: date):
+    day = date(2000, 1, 1) + timedelta(days=rng.randint(0, 36_000))
+    style = rng.randrange(5)
+    if style == 0:
+        return f'{day:%d/%m/%Y}', day
+    if style == 1:
+        return f'{day.day}/{day.month}/{day.year}', day
+    if style == 2:
+        return f'{day:%d-%m-%y}', day
+    if style == 3:
+        return f'{day:%d.%m.%Y}', day
+    # dd/mm: ano corrente (29/02 vira 28/02)
+    day = date(today.year, day.month, min(day.day, 28) if day.month == 2 else day.day)
+    return f'{day:%d/%m}', day
+
+
+def random_relative(rng: random.Random, today: date):
+    choice = rng.randrange(5)
+    if choice == 0:
+        return rng.choice(('hoje', 'Hoje', ' HOJE ')), today
+    if choice == 1:
+        text = rng.choice(('ontem', 'anteontem'))
+        return text, today - timedelta(days=1 if text == 'ontem' else 2)
+    if choice == 2:
+        n = rng.randint(0, 400)
+        return rng.choice((f'há {n} dias', f'ha {n} dias', f'{n} dias atrás')), today - timedelta(days=n)
+    if choice == 3:
+        text = rng.choice(('semana passada', 'próxima semana', 'semana que vem'))
+        return text, today + timedelta(days=-7 if text.endswith('passada') else 7)
+    n = rng.randint(1, 28)
+    return f'dia {n}', today.replace(day=n)
+
+
+def garbage(rng: random.Random) -> str:
+    return ''.join(rng.choice(GARBAGE_ALPHABET) for _ in range(rng.randint(0, 14)))
+
+
+def run(iterations: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    today = date.today()
+    failures = []
+    counts = {'money': 0, 'dates': 0, 'relative': 0, 'garbage_money': 0, 'garbage_dates': 0}
+    legacy_wrong = []
+
+    def fail(kind, text, expected, got):
+        failures.append({'kind': kind, 'input': text, 'expected': str(expected), 'got': repr(got)})
+
+    money_inputs = []
+    for _ in range(iterations):
+        text, expected = random_money(rng)
+        money_inputs.append(text)
+        counts['money'] += 1
+        try:
+            got = parse_money(text)
+        except Exception as e:
+            fail('money', text, expected, e)
+            continue
+        if got != expected or got.as_tuple().exponent != -2:
+            fail('money', text, expected, got)
+        try:
+            if abs(Decimal(str(legacy_money(text))) - expected) >= Decimal('0.005'):
+                legacy_wrong.append(text)
+        except ValueError:
+            legacy_wrong.append(text)
+
+        text, expected = random_date(rng, today)
+        counts['dates'] += 1
+        try:
+            got = parse_date(text, today)
+        except Exception as e:
+            fail('date', text, expected, e)
+        else:
+            if got != expected:
+                fail('date', text, expected, got)
+
+        text, expected = random_relative(rng, today)
+        counts['relative'] += 1
+        try:
+            got = parse_date(text, today)
+        except Exception as e:
+            fail('relative', text, expected, e)
+        else:
+            if got != expected:
+                fail('relative', text, expected, got)
+
+        # Lixo: só ValueError é aceitável; sucesso precisa ser um valor válido
+        text = garbage(rng)
+        counts['garbage_money'] += 1
+        try:
+            got = parse_money(text)
+            if got < 0 or got.as_tuple().exponent != -2:
+                fail('garbage_money', text, 'Decimal >= 0 com 2 casas', got)
+        except ValueError:
+            pass
+        except Exception as e:
+            fail('garbage_money', text, 'ValueError', e)
+
+        text = garbage(rng)
+        counts['garbage_dates'] += 1
+        try:
+            parse_date(text, today)
+        except ValueError:
+            pass
+        except Exception as e:
+            fail('garbage_dates', text, 'ValueError', e)
+
+    return {
+        'seed': seed,
+        'cases': counts,
+        'failures': failures,
+        'legacy_wrong': len(legacy_wrong),
+        'legacy_wrong_examples': legacy_wrong[:5],
+        'throughput': benchmark(money_inputs),
+    }
+
+
+def benchmark(inputs) -> dict:
+    """Conversões por segundo: parser novo x replace + float antigo"""
+    results = {}
+    for name, func in (('br_parsing', parse_money), ('legacy', legacy_money)):
+        started = time.perf_counter()
+        for text in inputs:
+            try:
+                func(text)
+            except ValueError:
+                pass
+        elapsed = time.perf_counter() - started
+        results[name] = {'per_call_us': round(elapsed / len(inputs) * 1e6, 3)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fuzz e benchmark do parsing pt-BR')
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    report = run(args.iterations, args.seed)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        cases = ', '.join(f'{kind}={count}' for kind, count in report['cases'].items())
+        print(f"casos: {cases} (semente {report['seed']})")
+        print(f"falhas: {len(report['failures'])}")
+        for failure in report['failures'][:MAX_FAILURES_SHOWN]:
+            print(f"  [{failure['kind']}] {failure['input']!r}: esperado {failure['expected']}, obtido {failure['got']}")
+        print(f"conversão antiga errada em {report['legacy_wrong']} de {report['cases']['money']} valores válidos "
+              f"(ex.: {', '.join(repr(t) for t in report['legacy_wrong_examples'][:3])})")
+        throughput = report['throughput']
+        print(f"por chamada: br_parsing {throughput['br_parsing']['per_call_us']}µs • "
+              f"antigo {throughput['legacy']['per_call_us']}µs")
+    sys.exit(1 if report['failures'] else 0)
+
+
+if __name__ == '__main__':
+    main()
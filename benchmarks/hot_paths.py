@@ -0,0 +1,282 @@
+"""
+Micro-benchmarks dos caminhos quentes
+Parsing de valor e data, matemática de parcelas, montagem de Markdown,
+formatação do AccountManager e roteamento de callbacks, executados em todo
+passo dos fluxos de /receitas e /gastos
+
+Uso:
+    python -m benchmarks.hot_paths [--filter parse] [--threshold 1.5]
+    python -m benchmarks.hot_paths --save     # grava novas baselines
+
+Cada caso é calibrado (timeit.autorange) e repetido; vale o menor tempo por
+chamada. Sai com código 1 se algum caso ficar mais lento que baseline ×
+threshold. As baselines dependem da máquina: regrave com --save ao trocar o
+ambiente de referência. Os handlers rodam sem banco nem rede (update, contexto
+e mensagem de mentira, corrotinas executadas sem event loop).
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import date
+from typing import Callable, Dict, List, Tuple
+
+from account_manager import account_manager
+from br_parsing import parse_date, parse_money
+from categorizer import UserIndex, description_tokens
+from callback_router import CallbackRouter, decode_callback, encode_callback
+from expense_manager import EXPENSE_CONFIRMATION, EXPENSE_ROUTE, ExpenseManager
+from message_templates import escape_markdown, split_message
+from quick_entry import QuickEntryParser
+from revenue_manager import RevenueManager
+from tracing import Tracer, TracingSettings
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'hot_paths.json')
+DEFAULT_THRESHOLD = 1.5
+REPEAT = 5
+
+# Entradas reais dos usuários (válidas e inválidas)
+VALUE_INPUTS = ('150', '150,00', '1.350,50', 'R$ 2.500,00', '2500.00', 'abc', '-10')
+DATE_INPUTS = ('15/12/2025', '15/12', 'hoje', 'ontem', '31/02/2025', 'amanhã')
+QUICK_ENTRY_INPUTS = ('gastei 45,90 ifood nubank ontem', '12x 2400 notebook c6',
+                      'recebi 3500 salário inter dia 5', 'paguei R$ 120,00 conta de luz santander')
+
+
+class _Message:
+    def __init__(self, text: str = ''):
+        self.text = text
+
+    async def reply_text(self, *args, **kwargs):
+        return None
+
+
+class _Query:
+    data = ''
+
+    async def answer(self, *args, **kwargs):
+        return None
+
+    async def edit_message_text(self, *args, **kwargs):
+        return None
+
+
+class _Update:
+    def __init__(self, text: str = '', data: str = ''):
+        self.message = _Message(text)
+        self.callback_query = _Query()
+        self.callback_query.data = data
+
+
+class _Context:
+    def __init__(self, user_data: Dict):
+        self.user_data = user_data
+
+
+def run_sync(coroutine):
+    """Executar uma corrotina que nunca suspende (fakes sem I/O)"""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError('corrotina suspendeu: o caso depende de I/O real')
+
+
+def cycle(inputs):
+    """Função que devolve as entradas em rodízio"""
+    state = {'i': 0}
+
+    def next_input():
+        state['i'] += 1
+        return inputs[state['i'] % len(inputs)]
+    return next_input
+
+
+def _expense_context() -> Dict:
+    expenses = ExpenseManager(None)
+    return {
+        'expense_type': 'shopping',
+        'expense_type_info': expenses.expense_types['shopping'],
+        'description': 'Notebook *Dell* - Loja_XYZ',
+        'value': 4599.90,
+        'expense_date': date(2025, 11, 28),
+        'account': account_manager.get_account_by_key('nubank_pf'),
+        'installments': 10,
+        'installment_value': 459.99,
+        'installment_start_date': date(2025, 12, 5),
+    }
+
+
+def build_cases() -> List[Tuple[str, Callable[[], None]]]:
+    """Casos (nome, função sem argumentos) medidos pela suíte"""
+    expenses = ExpenseManager(None)
+    revenues = RevenueManager(None)
+    cases = []
+
+    def handler_case(name, handler, inputs, user_data):
+        next_input = cycle(inputs)
+
+        def run():
+            run_sync(handler(_Update(next_input()), _Context(dict(user_data))))
+        cases.append((name, run))
+
+    expense_data = _expense_context()
+    handler_case('parse.expense_value', expenses.receive_expense_value, VALUE_INPUTS, {})
+    handler_case('parse.revenue_value', revenues.receive_revenue_value, VALUE_INPUTS, {})
+    handler_case('parse.expense_date', expenses.receive_expense_date, DATE_INPUTS, expense_data)
+    handler_case('parse.revenue_date', revenues.receive_revenue_date, DATE_INPUTS, {})
+
+    def parser_case(name, parser, inputs):
+        next_input = cycle(inputs)
+
+        def run():
+            try:
+                parser(next_input())
+            except ValueError:
+                pass
+        cases.append((name, run))
+
+    parser_case('parsing.money', parse_money, VALUE_INPUTS)
+    parser_case('parsing.date', parse_date, DATE_INPUTS + ('dia 5', 'há 3 dias', 'semana passada'))
+
+    quick_entry = QuickEntryParser(expenses.expense_types, revenues.revenue_types)
+    parser_case('parsing.quick_entry', quick_entry.parse, QUICK_ENTRY_INPUTS)
+
+    # Categorizador: índice de um usuário com histórico grande
+    index = UserIndex()
+    for n in range(2000):
+        type_key = ('food', 'transport', 'shopping', 'bills')[n % 4]
+        index.add('expense', f'palavra{n % 500}', type_key, ('nubank_pf', 'c6_pf')[n % 2], 1 + n % 3)
+    index.add('expense', 'padoca', 'food', 'c6_pf', 12)
+    cases.append(('categorizer.suggest', lambda: index.suggest('expense', ('padoca', 'palavra7', 'centro'), 0.6)))
+    cases.append(('categorizer.tokens', lambda: description_tokens('Padoca do Zé - pão de queijo (2/12)')))
+
+    # Tracing: update típica (6 queries com acquire), fora e dentro da amostra
+    def traced_update(tracer):
+        def run():
+            with tracer.trace('update', **{'telegram.update': '/gastos'}):
+                for _ in range(6):
+                    with tracer.span('db.fetchrow', **{'db.statement': 'SELECT 1'}):
+                        tracer.record('db.acquire', 0.0001)
+        return run
+    cases.append(('tracing.unsampled_update', traced_update(Tracer(TracingSettings(sample_rate=0.0)))))
+    cases.append(('tracing.sampled_update', traced_update(
+        Tracer(TracingSettings(sample_rate=1.0, file_path=os.devnull))
+    )))
+
+    # Parcelas
+    start = date(2025, 1, 31)
+    cases.append(('installments.last_date', lambda: expenses.calculate_last_installment(start, 24)))
+    cases.append(('installments.next_month_day', lambda: expenses.get_next_month_day(start, 31)))
+    cases.append(('installments.start_keyboard', lambda: run_sync(
+        expenses.ask_installment_start_date(_Query(), _Context(expense_data))
+    )))
+
+    # Markdown
+    confirmation_values = dict(
+        type_name='🛒 Compras Pessoais', description=expense_data['description'], value=4599.90,
+        expense_date=expense_data['expense_date'], account_color='🟣', account_name='Nubank PF',
+        payment_text='**Pagamento:** À vista'
+    )
+    cases.append(('markdown.confirmation_template', lambda: EXPENSE_CONFIRMATION.render(**confirmation_values)))
+    cases.append(('markdown.show_confirmation', lambda: run_sync(
+        expenses.show_confirmation(_Query(), _Context(expense_data))
+    )))
+    cases.append(('markdown.escape', lambda: escape_markdown('Mercado *Atacadão* [centro] _promo_ `x`')))
+    long_text = '\n'.join(f'• Transação {n} - R$ {n * 13.7:,.2f}' for n in range(400))
+    cases.append(('markdown.split_message', lambda: split_message(long_text)))
+
+    # AccountManager
+    all_accounts = account_manager.get_all_accounts()
+    cases.append(('accounts.format_list', lambda: account_manager.format_account_list(all_accounts)))
+    cases.append(('accounts.expense_keyboard', lambda: account_manager.get_expense_keyboard(
+        ('nubank_pf', 'c6_pf'), encode_callback(EXPENSE_ROUTE, 'x')
+    )))
+    cases.append(('accounts.by_key', lambda: account_manager.get_account_by_key('santander_pf')))
+
+    # Callbacks
+    router = CallbackRouter()
+
+    async def noop(update, context, *args):
+        return args
+    for route in ('m', 'xp', 'rv', 'acc', 'ex', 'bs'):
+        router.register(route, noop)
+    callback_data = encode_callback(EXPENSE_ROUTE, 's', '2025-12-05')
+    callback_update = _Update(data=callback_data)
+    cases.append(('callbacks.encode', lambda: encode_callback(EXPENSE_ROUTE, 's', '2025-12-05')))
+    cases.append(('callbacks.decode', lambda: decode_callback(callback_data)))
+    cases.append(('callbacks.matches', lambda: router.matches(callback_data)))
+    cases.append(('callbacks.dispatch', lambda: run_sync(router.dispatch(callback_update, None))))
+    return cases
+
+
+def measure(func: Callable[[], None], repeat: int = REPEAT) -> Dict[str, float]:
+    """Tempo por chamada (µs): menor e mediana das repetições"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    runs = sorted(total / number for total in timer.repeat(repeat=repeat, number=number))
+    return {'min_us': round(runs[0] * 1e6, 3), 'median_us': round(runs[len(runs) // 2] * 1e6, 3)}
+
+
+def load_baselines(path: str = BASELINES_PATH) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baselines(results: Dict[str, Dict[str, float]], path: str = BASELINES_PATH):
+    baselines = load_baselines(path)
+    baselines.update(results)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(baselines.items())), f, indent=2)
+        f.write('\n')
+
+
+def compare(results, baselines, threshold: float) -> List[str]:
+    """Casos mais lentos que baseline × threshold"""
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline and result['min_us'] > baseline['min_us'] * threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks dos caminhos quentes')
+    parser.add_argument('--filter', default='', help='só casos cujo nome contém o texto')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='regressão acima de baseline × threshold')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--save', action='store_true', help='gravar os resultados como baselines')
+    parser.add_argument('--baselines', default=BASELINES_PATH)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    results = {}
+    for name, func in build_cases():
+        if args.filter in name:
+            results[name] = measure(func, args.repeat)
+
+    baselines = load_baselines(args.baselines)
+    regressions = [] if args.save else compare(results, baselines, args.threshold)
+
+    if args.json:
+        print(json.dumps({'results': results, 'regressions': regressions}, indent=2))
+    else:
+        for name, result in results.items():
+            baseline = baselines.get(name)
+            ratio = f"{result['min_us'] / baseline['min_us']:.2f}x" if baseline else 'sem baseline'
+            flag = '  ⚠️ REGRESSÃO' if name in regressions else ''
+            print(f"{name:<34} {result['min_us']:>10.3f}µs  (mediana {result['median_us']:.3f}µs)  {ratio}{flag}")
+
+    if args.save:
+        save_baselines(results, args.baselines)
+        print(f"Baselines gravadas em {args.baselines}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
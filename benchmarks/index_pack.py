@@ -0,0 +1,224 @@
+"""
+Benchmark do conjunto de índices
+Mede as queries afetadas por cada mudança de índice com o conjunto antigo
+(BEFORE_SQL) e o atual do SCHEMA_SQL (AFTER_SQL), no mesmo banco e massa
+
+Uso:
+    DATABASE_URL=postgresql://... python -m benchmarks.index_pack [--iterations 300] [--rounds 2]
+
+Gera usuários sintéticos com histórico longo (removidos no final) e /demo
+para parte deles, alterna os dois conjuntos de índices e reporta mediana e
+p95 por caso, o plano escolhido e o tamanho dos índices de users e
+transactions. Escritas rodam em transação desfeita no final. O banco termina
+com o conjunto atual.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import time
+from typing import Dict, List
+
+from db_pool import DatabasePool, PoolSettings
+from demo_data import DemoDataLoader, SyntheticProfile
+
+# Histórico longo por usuário: ~1400 transações cada
+INDEX_PROFILE = SyntheticProfile(users=100, months=24, expenses_per_month=60, installment_plans=3,
+                                 telegram_id_base=8_600_000_000)
+DEMO_USERS = 20
+
+PARAM = re.compile(r'\$(\d+)')
+
+# Índices antes deste pacote
+BEFORE_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_users_telegram_id ON users(telegram_id);
+    CREATE INDEX IF NOT EXISTS idx_users_active ON users(is_active);
+    DROP INDEX IF EXISTS idx_transactions_user_account_cover;
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_account_date
+        ON transactions(user_id, account_key, transaction_date DESC);
+    DROP INDEX IF EXISTS idx_transactions_demo;
+"""
+
+# Índices do SCHEMA_SQL atual
+AFTER_SQL = """
+    DROP INDEX IF EXISTS idx_users_telegram_id;
+    DROP INDEX IF EXISTS idx_users_active;
+    DROP INDEX IF EXISTS idx_transactions_user_account_date;
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_account_cover
+        ON transactions(user_id, account_key, transaction_date DESC) INCLUDE (type, amount);
+    CREATE INDEX IF NOT EXISTS idx_transactions_demo ON transactions(user_id) WHERE notes LIKE '%DEMO%';
+"""
+
+# (nome, SQL antes, SQL depois (None: o mesmo), parâmetros a partir do usuário, escrita?);
+# cada SQL recebe só os primeiros parâmetros, até o maior $n que usa
+CASES = (
+    ('users.by_telegram_id',
+     'SELECT * FROM users WHERE telegram_id = $1 AND is_active = true', None,
+     lambda user: (user['telegram_id'],), False),
+    ('users.insert_100',
+     "INSERT INTO users (telegram_id, telegram_username, full_name, first_name) "
+     "SELECT $1::bigint * 1000 + n, 'idx', 'Idx', 'Idx' FROM generate_series(1, 100) AS n", None,
+     lambda user: (user['telegram_id'],), True),
+    ('categories.lookup',
+     'SELECT id, name, type, icon FROM categories WHERE user_id = $1 AND name = $2',
+     'SELECT id, name, type, icon FROM categories WHERE user_id = $1 AND name = $2 AND type = $3',
+     lambda user: (user['id'], '🛒 Compras Pessoais', 'expense'), False),
+    ('transactions.account_totals',
+     """SELECT account_key,
+               COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN type = 'expense' THEN ABS(amount) ELSE 0 END), 0),
+               COUNT(*)
+        FROM transactions WHERE user_id = $1 AND account_key IS NOT NULL GROUP BY account_key""", None,
+     lambda user: (user['id'],), False),
+    ('transactions.profile_stats',
+     """SELECT COUNT(CASE WHEN type = 'income' THEN 1 END), COUNT(CASE WHEN type = 'expense' THEN 1 END),
+               COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN type = 'expense' THEN ABS(amount) ELSE 0 END), 0)
+        FROM transactions WHERE user_id = $1""", None,
+     lambda user: (user['id'],), False),
+    ('transactions.clear_demo',
+     "DELETE FROM transactions WHERE user_id = $1 AND notes LIKE '%DEMO%'", None,
+     lambda user: (user['id'],), True),
+    ('transactions.insert_100',
+     "INSERT INTO transactions (user_id, title, amount, type, transaction_date, status, tags, account_key) "
+     "SELECT $1, 'Idx ' || n, -n, 'expense', CURRENT_DATE - n, 'paid', ARRAY['shopping', 'nubank_pf'], "
+     "'nubank_pf' FROM generate_series(1, 100) AS n", None,
+     lambda user: (user['id'],), True),
+)
+
+
+async def _execute(conn, sql: str, params, write: bool):
+    if not write:
+        return await conn.fetch(sql, *params)
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        await conn.execute(sql, *params)
+    finally:
+        await transaction.rollback()
+
+
+async def _plan(conn, sql: str, params) -> str:
+    """Nós do plano (com índice) para a primeira execução do caso"""
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        rows = await conn.fetchval(f'EXPLAIN (FORMAT JSON) {sql}', *params)
+    finally:
+        await transaction.rollback()
+    nodes, stack = [], [json.loads(rows)[0]['Plan']]
+    while stack:
+        node = stack.pop(0)
+        if 'Relation Name' in node or 'Index Name' in node:
+            nodes.append(node['Node Type'] + (f" {node['Relation Name']}" if 'Relation Name' in node else '')
+                         + (f" ({node['Index Name']})" if 'Index Name' in node else ''))
+        stack.extend(node.get('Plans', ()))
+    return ' → '.join(nodes) or 'sem tabela'
+
+
+async def measure_state(conn, state: str, users: List[Dict], demo_users: List[Dict], iterations: int) -> Dict:
+    results = {}
+    for name, before_sql, after_sql, make_params, write in CASES:
+        sql = after_sql if (after_sql and state == 'after') else before_sql
+        targets = demo_users if name == 'transactions.clear_demo' else users
+        arity = max(int(n) for n in PARAM.findall(sql))
+        await _execute(conn, sql, make_params(targets[0])[:arity], write)
+        timings = []
+        for n in range(iterations):
+            params = make_params(targets[n % len(targets)])[:arity]
+            started = time.perf_counter()
+            await _execute(conn, sql, params, write)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        results[name] = {
+            'p50_ms': round(statistics.median(timings) * 1000, 3),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1] * 1000, 3),
+            'plan': await _plan(conn, sql, make_params(targets[0])[:arity]),
+        }
+    sizes = await conn.fetchrow(
+        "SELECT pg_indexes_size('users') AS users, pg_indexes_size('transactions') AS transactions"
+    )
+    results['index_bytes'] = dict(sizes)
+    return results
+
+
+async def apply_state(conn, state: str):
+    await conn.execute(BEFORE_SQL if state == 'before' else AFTER_SQL)
+    # Mapa de visibilidade em dia (index-only scan) e estatísticas dos índices novos
+    await conn.execute('VACUUM (ANALYZE) users, transactions, categories')
+
+
+async def run(args) -> Dict:
+    dsn = os.getenv('DATABASE_URL')
+    if not dsn:
+        raise SystemExit('Configure DATABASE_URL (banco de teste local)')
+
+    from main import FinancialBot, SCHEMA_SQL
+
+    pool = await DatabasePool.create(dsn, PoolSettings(min_size=1, max_size=2), name='bench')
+    bot = FinancialBot()
+    bot.db_pool = pool
+    loader = DemoDataLoader(bot)
+    rounds: Dict[str, List[Dict]] = {'before': [], 'after': []}
+    try:
+        async with pool.acquire() as conn:
+            if not await bot.schema_is_current(conn):
+                await conn.execute(SCHEMA_SQL, timeout=pool.timeout_for('migration'))
+        await loader.drop_synthetic(INDEX_PROFILE)
+        generated = await loader.generate(INDEX_PROFILE)
+        users = await loader.synthetic_user_ids(INDEX_PROFILE)
+        for user in users[:DEMO_USERS]:
+            await loader.seed_demo(user['id'])
+
+        async with pool.acquire() as conn:
+            for _ in range(args.rounds):
+                for state in ('before', 'after'):
+                    await apply_state(conn, state)
+                    rounds[state].append(await measure_state(conn, state, users, users[:DEMO_USERS], args.iterations))
+            await apply_state(conn, 'after')
+    finally:
+        if not args.keep_data:
+            await loader.drop_synthetic(INDEX_PROFILE)
+        await pool.close()
+
+    # Melhor rodada de cada caso (a máquina de teste é ruidosa)
+    report = {'data': generated, 'cases': {}}
+    for name, *_ in CASES:
+        before = min((r[name] for r in rounds['before']), key=lambda r: r['p50_ms'])
+        after = min((r[name] for r in rounds['after']), key=lambda r: r['p50_ms'])
+        report['cases'][name] = {
+            'before': before, 'after': after,
+            'speedup': round(before['p50_ms'] / after['p50_ms'], 2) if after['p50_ms'] else None,
+        }
+    report['index_bytes'] = {state: rounds[state][-1]['index_bytes'] for state in rounds}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do conjunto de índices')
+    parser.add_argument('--iterations', type=int, default=300)
+    parser.add_argument('--rounds', type=int, default=2, help='alternâncias antes/depois (vale a melhor)')
+    parser.add_argument('--keep-data', action='store_true', help='manter a massa sintética no banco')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+
+    data = report['data']
+    print(f"Massa: {data['users']} usuários, {data['expenses'] + data['revenues'] + data['installments']} transações\n")
+    for name, case in report['cases'].items():
+        print(f"{name:<30} antes p50 {case['before']['p50_ms']:>8.3f}ms  depois p50 {case['after']['p50_ms']:>8.3f}ms"
+              f"  ({case['speedup']}x)")
+        print(f"    antes:  {case['before']['plan']}")
+        print(f"    depois: {case['after']['plan']}")
+    for state, sizes in report['index_bytes'].items():
+        print(f"Índices ({state}): users {sizes['users'] // 1024} kB, transactions {sizes['transactions'] // 1024} kB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark de ingestão de transações
+Compara INSERTs individuais (modo 'off') com a fila de group commit
+
+Uso:
+    DATABASE_URL=postgresql://... python -m benchmarks.ingest [--transactions 5000] [--users 200]
+
+Grava transações de usuários sintéticos (removidos no final) e reporta
+vazão e latência de confirmação por modo.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import date
+
+from db_pool import DatabasePool, PoolSettings
+from transaction_ingestor import IngestSettings, TransactionIngestor, transaction_record
+
+BENCH_TELEGRAM_ID_BASE = 9_100_000_000
+
+
+async def create_users(pool: DatabasePool, count: int):
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            INSERT INTO users (telegram_id, telegram_username, full_name, first_name)
+            SELECT $1::bigint + n, 'bench_' || n, 'Bench ' || n, 'Bench'
+            FROM generate_series(1, $2) AS n
+            ON CONFLICT (telegram_id) DO UPDATE SET telegram_username = EXCLUDED.telegram_username
+            RETURNING id
+            """,
+            BENCH_TELEGRAM_ID_BASE, count
+        )
+    return [row['id'] for row in rows]
+
+
+async def drop_users(pool: DatabasePool):
+    async with pool.acquire() as conn:
+        await conn.execute(
+            "DELETE FROM users WHERE telegram_id > $1::bigint AND telegram_id <= $1::bigint + 1000000",
+            BENCH_TELEGRAM_ID_BASE
+        )
+
+
+async def run_mode(bot, user_ids, mode: str, transactions: int, concurrency: int, journal_path):
+    bot.ingestor = TransactionIngestor(bot, IngestSettings(mode=mode, journal_path=journal_path))
+    await bot.ingestor.start()
+    run_id = uuid.uuid4().hex[:8]
+    latencies = []
+    counter = iter(range(transactions))
+
+    async def user_session():
+        for n in counter:
+            record = transaction_record(
+                user_id=user_ids[n % len(user_ids)],
+                title=f'Bench {n}',
+                amount=-(n % 500 + 1),
+                type='expense',
+                transaction_date=date.today(),
+                tags=['bench'],
+                idempotency_key=f'bench:{run_id}:{n}',
+            )
+            started = time.perf_counter()
+            await bot.save_transaction(record)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user_session() for _ in range(concurrency)))
+    acked = time.perf_counter() - started
+    await bot.ingestor.close()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'transactions': transactions,
+        'seconds': round(elapsed, 3),
+        'tps': round(transactions / elapsed, 1),
+        'ack_seconds': round(acked, 3),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3),
+        'ingest': bot.ingestor.snapshot() if mode != 'off' else None,
+    }
+
+
+async def run(args):
+    dsn = os.getenv('DATABASE_URL')
+    if not dsn:
+        raise SystemExit('Configure DATABASE_URL (banco de teste local)')
+
+    from main import FinancialBot
+
+    # FinancialBot real (mesmo save_transaction dos handlers) com pool próprio
+    pool = await DatabasePool.create(dsn, PoolSettings(min_size=2, max_size=args.pool_size), name='bench')
+    bot = FinancialBot()
+    bot.db_pool = pool
+    reports = []
+    try:
+        user_ids = await create_users(pool, args.users)
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in args.modes:
+                journal = os.path.join(directory, f'{mode}.journal') if args.journal else None
+                reports.append(await run_mode(bot, user_ids, mode, args.transactions,
+                                              args.concurrency, journal))
+    finally:
+        await drop_users(pool)
+        await pool.close()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de ingestão de transações')
+    parser.add_argument('--transactions', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=200, help='usuários confirmando ao mesmo tempo')
+    parser.add_argument('--pool-size', type=int, default=10)
+    parser.add_argument('--modes', nargs='+', default=['off', 'commit', 'enqueue'],
+                        choices=('off', 'commit', 'enqueue'))
+    parser.add_argument('--no-journal', dest='journal', action='store_false')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    reports = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+
+    for report in reports:
+        line = (f"{report['mode']:<8} {report['tps']:>9} tx/s  ack p50 {report['p50_ms']}ms "
+                f"p99 {report['p99_ms']}ms")
+        if report['ingest']:
+            line += f"  lote médio {report['ingest']['avg_batch']} • fsyncs {report['ingest']['journal_syncs']}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+"""
+Teste de carga do bot
+Gera massa sintética pelo DemoDataLoader e reproduz updates do Telegram pelos
+handlers reais da Application, com a Bot API simulada (nada sai para a rede)
+
+Uso:
+    DATABASE_URL=postgresql://... python -m benchmarks.load_test [--users 1000] [--months 60]
+    DATABASE_URL=postgresql://... python -m benchmarks.load_test --replay updates.jsonl
+
+Sem --replay cada usuário sintético executa uma sessão roteirizada (/start,
+/saldo, /extrato, /buscar e uma despesa completa pelo /gastos). Com --replay
+as updates gravadas (uma por linha, JSON da Bot API) são reproduzidas na
+ordem de cada usuário. Reporta vazão e latência p50/p99 por comando; a massa
+sintética é removida no final (--keep-data mantém para a próxima rodada).
+
+O monitor do event loop roda durante o teste: qualquer handler que segure o
+loop além de --block-threshold-ms tem a pilha registrada e a rodada sai com
+código 1 (--allow-blocking só reporta). --loop-debug liga também o modo debug
+do asyncio (callbacks lentos, corrotinas não aguardadas), que reduz a vazão
+medida pela metade.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import replace
+from typing import Dict, List, Tuple
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+from account_manager import ACCOUNT_ROUTE
+from callback_router import decode_callback, encode_callback
+from demo_data import SyntheticProfile
+from expense_manager import CONFIRM_EXPENSE, EXPENSE_ROUTE
+from handler_registry import build_application
+from loop_monitor import LoopMonitor, LoopMonitorSettings
+
+# Token fictício: a Bot API é respondida pelo StubBotRequest
+DUMMY_TOKEN = '123456:load-test-token'
+STUB_BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'Bot IA Financeiro', 'username': 'bot_ia_financeiro'}
+
+# Sessão de cada usuário sintético: (rótulo, tipo, conteúdo)
+SYNTHETIC_SESSION = (
+    ('/start', 'message', '/start'),
+    ('/saldo', 'message', '/saldo'),
+    ('/extrato', 'message', '/extrato'),
+    ('/buscar', 'message', '/buscar mercado'),
+    ('/gastos', 'message', '/gastos'),
+    ('gastos: tipo', 'callback', encode_callback(EXPENSE_ROUTE, 't', 'food')),
+    ('gastos: descrição', 'message', 'Mercado - teste de carga'),
+    ('gastos: valor', 'message', '87,90'),
+    ('gastos: data', 'message', 'hoje'),
+    ('gastos: conta', 'callback', encode_callback(ACCOUNT_ROUTE, 'nubank_pf')),
+    ('gastos: confirmar', 'callback', CONFIRM_EXPENSE),
+)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentil por posição (valores já ordenados)"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q * len(values)) - 1))]
+
+
+class StubBotRequest(BaseRequest):
+    """Bot API simulada: responde cada método sem rede, com latência opcional
+
+    sendMessage/editMessage* devolvem uma Message plausível; o resto devolve
+    True. As chamadas são contadas por método.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._message_ids = itertools.count(1)
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _message(self, parameters: dict) -> dict:
+        chat_id = parameters.get('chat_id', 0)
+        return {
+            'message_id': parameters.get('message_id') or next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id) if str(chat_id).lstrip('-').isdigit() else 0, 'type': 'private'},
+            'from': STUB_BOT_USER,
+            'text': parameters.get('text', ''),
+        }
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        self.calls[api_method] = self.calls.get(api_method, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        parameters = request_data.parameters if request_data else {}
+        if api_method == 'getMe':
+            result = STUB_BOT_USER
+        elif api_method in ('sendMessage', 'editMessageText', 'editMessageReplyMarkup'):
+            result = self._message(parameters)
+        else:
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+class UpdateFactory:
+    """Updates da Bot API (JSON) para usuários de teste"""
+
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def _user(self, telegram_id: int) -> dict:
+        return {'id': telegram_id, 'is_bot': False, 'first_name': 'Sintético',
+                'username': f'synth_{telegram_id}', 'language_code': 'pt-br'}
+
+    def message(self, telegram_id: int, text: str) -> dict:
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': telegram_id, 'type': 'private'},
+            'from': self._user(telegram_id),
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return {'update_id': next(self._update_ids), 'message': message}
+
+    def callback(self, telegram_id: int, data: str) -> dict:
+        return {
+            'update_id': next(self._update_ids),
+            'callback_query': {
+                'id': str(next(self._message_ids)),
+                'from': self._user(telegram_id),
+                'chat_instance': str(telegram_id),
+                'data': data,
+                'message': {
+                    'message_id': next(self._message_ids),
+                    'date': int(time.time()),
+                    'chat': {'id': telegram_id, 'type': 'private'},
+                    'from': STUB_BOT_USER,
+                    'text': '...',
+                },
+            },
+        }
+
+    def renumber(self, update: dict) -> dict:
+        """Novo update_id para uma update gravada (o filtro de reentrega descartaria repetidas)"""
+        return dict(update, update_id=next(self._update_ids))
+
+
+def label_for(update: dict) -> str:
+    """Rótulo de uma update gravada: comando, rota do callback ou texto livre"""
+    if 'callback_query' in update:
+        route, args = decode_callback(update['callback_query'].get('data') or '')
+        return f"callback {route}:{args[0]}" if args else f"callback {route}"
+    text = (update.get('message') or {}).get('text') or ''
+    if text.startswith('/'):
+        return text.split()[0].split('@')[0]
+    return 'texto'
+
+
+def user_of(update: dict) -> int:
+    body = update.get('callback_query') or update.get('message') or {}
+    return (body.get('from') or {}).get('id', 0)
+
+
+def synthetic_sessions(profile: SyntheticProfile, factory: UpdateFactory) -> List[List[Tuple[str, dict]]]:
+    sessions = []
+    for n in range(1, profile.users + 1):
+        telegram_id = profile.telegram_id_base + n
+        session = []
+        for label, kind, content in SYNTHETIC_SESSION:
+            build = factory.callback if kind == 'callback' else factory.message
+            session.append((label, build(telegram_id, content)))
+        sessions.append(session)
+    return sessions
+
+
+def recorded_sessions(path: str, factory: UpdateFactory) -> List[List[Tuple[str, dict]]]:
+    """Updates gravadas agrupadas por usuário, na ordem do arquivo"""
+    by_user: Dict[int, List[Tuple[str, dict]]] = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                update = json.loads(line)
+                by_user.setdefault(user_of(update), []).append((label_for(update), factory.renumber(update)))
+    return list(by_user.values())
+
+
+class LoadDriver:
+    """Alimenta a Application com sessões de usuários concorrentes"""
+
+    def __init__(self, application, concurrency: int):
+        self.application = application
+        self.concurrency = concurrency
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self._labels: Dict[int, str] = {}
+        application.add_error_handler(self._count_error)
+
+    async def _count_error(self, update, context):
+        label = self._labels.get(getattr(update, 'update_id', None), 'desconhecido')
+        self.errors[label] = self.errors.get(label, 0) + 1
+
+    async def _run_session(self, session):
+        for label, data in session:
+            update = Update.de_json(data, self.application.bot)
+            self._labels[update.update_id] = label
+            started = time.perf_counter()
+            await self.application.process_update(update)
+            self.latencies.setdefault(label, []).append(time.perf_counter() - started)
+
+    async def run(self, sessions) -> float:
+        queue = iter(sessions)
+
+        async def worker():
+            for session in queue:
+                await self._run_session(session)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> dict:
+        commands = {}
+        for label, values in self.latencies.items():
+            values.sort()
+            commands[label] = {
+                'count': len(values),
+                'errors': self.errors.get(label, 0),
+                'p50_ms': round(percentile(values, 0.50) * 1000, 2),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+                'max_ms': round(values[-1] * 1000, 2),
+            }
+        total = sum(item['count'] for item in commands.values())
+        return {
+            'updates': total,
+            'seconds': round(elapsed, 3),
+            'updates_per_second': round(total / elapsed, 1) if elapsed else 0.0,
+            'commands': commands,
+        }
+
+
+async def run(args):
+    if not os.getenv('DATABASE_URL'):
+        raise SystemExit('Configure DATABASE_URL (banco de teste local)')
+
+    from main import FinancialBot
+
+    # Logs por update distorcem a medição; --verbose mantém
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    bot = FinancialBot()
+    stub = StubBotRequest(latency=args.api_latency_ms / 1000)
+    application = build_application(bot, DUMMY_TOKEN, request=stub)
+    monitor = LoopMonitor(LoopMonitorSettings(
+        mode='debug' if args.loop_debug else 'on', block_threshold_ms=args.block_threshold_ms
+    ))
+    application.bot_data['loop_monitor'] = monitor
+    await application.initialize()
+    await application.post_init(application)
+
+    profile = replace(SyntheticProfile(), users=args.users, months=args.months,
+                      expenses_per_month=args.expenses_per_month)
+    factory = UpdateFactory()
+    report = {}
+    try:
+        if not args.replay and not args.reuse_data:
+            report['generate'] = await bot.demo_data.generate(profile)
+
+        sessions = recorded_sessions(args.replay, factory) if args.replay else synthetic_sessions(profile, factory)
+        driver = LoadDriver(application, args.concurrency)
+        elapsed = await driver.run(sessions)
+        report.update(driver.report(elapsed))
+        report['api_calls'] = dict(stub.calls)
+        report['pool'] = bot.db_pool.snapshot()
+        report['event_loop'] = monitor.snapshot()
+    finally:
+        # Fila de ingestão gravada antes de apagar os usuários sintéticos
+        await application.post_shutdown(application)
+        if not args.replay and not args.keep_data:
+            await bot.demo_data.drop_synthetic(profile)
+        await application.shutdown()
+        await bot.db_pool.close()
+        if bot.db_read_pool:
+            await bot.db_read_pool.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga do bot (Bot API simulada)')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--months', type=int, default=12, help='meses de histórico por usuário')
+    parser.add_argument('--expenses-per-month', type=int, default=30)
+    parser.add_argument('--concurrency', type=int, default=50, help='usuários ativos ao mesmo tempo')
+    parser.add_argument('--api-latency-ms', type=float, default=0.0, help='latência simulada da Bot API')
+    parser.add_argument('--replay', help='arquivo JSONL com updates gravadas')
+    parser.add_argument('--reuse-data', action='store_true', help='não gerar a massa (já criada com --keep-data)')
+    parser.add_argument('--keep-data', action='store_true', help='manter a massa sintética no banco')
+    parser.add_argument('--verbose', action='store_true', help='manter os logs do bot')
+    parser.add_argument('--block-threshold-ms', type=float, default=250.0,
+                        help='event loop parado por mais que isso conta como bloqueio')
+    parser.add_argument('--allow-blocking', action='store_true', help='não falhar quando o loop for bloqueado')
+    parser.add_argument('--loop-debug', action='store_true', help='modo debug do asyncio durante o teste')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    blocked = report['event_loop']['blocks'] and not args.allow_blocking
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+        sys.exit(1 if blocked else 0)
+
+    if 'generate' in report:
+        generated = report['generate']
+        print(f"massa: {generated['users']} usuários, {generated['revenues'] + generated['expenses'] + generated['installments']} "
+              f"transações em {generated['seconds']}s")
+    print(f"{report['updates']} updates em {report['seconds']}s ({report['updates_per_second']} updates/s)")
+    for label, item in report['commands'].items():
+        errors = f"  erros {item['errors']}" if item['errors'] else ''
+        print(f"{label:<20} {item['count']:>7}x  p50 {item['p50_ms']:>8}ms  p99 {item['p99_ms']:>8}ms{errors}")
+    print('Bot API: ' + ', '.join(f'{method}={count}' for method, count in sorted(report['api_calls'].items())))
+    loop = report['event_loop']
+    print(f"event loop: lag máx {loop['lag']['max_ms']}ms em {loop['lag']['count']} amostras, "
+          f"{loop['blocks']} bloqueio(s) > {args.block_threshold_ms:g}ms")
+    if loop['last_block']:
+        print(f"último bloqueio ({loop['last_block']['stalled_ms']}ms):\n{loop['last_block']['stack']}")
+    sys.exit(1 if blocked else 0)
+
+
+if __name__ == '__main__':
+    main()
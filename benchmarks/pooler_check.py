@@ -0,0 +1,297 @@
+"""
+Verificação do modo PgBouncer (transaction pooling)
+Executa as queries quentes do bot com várias "réplicas" concorrentes atrás de
+um pooler em modo transação e conta os erros de prepared statement
+
+Uso:
+    python -m benchmarks.pooler_check [--replicas 4] [--server-connections 2]
+    python -m benchmarks.pooler_check --pooler-url postgresql://...@pgbouncer:6432/db
+
+Sem --pooler-url sobe um stand-in local do PgBouncer (proxy que devolve a
+conexão do servidor ao fim de cada transação) na frente da DATABASE_URL.
+Sai com código 1 se o modo 'transaction' tiver erros.
+"""
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+import time
+from urllib.parse import urlparse, parse_qs, quote
+
+from db_pool import DatabasePool, PoolSettings
+
+# Queries quentes (mesmo formato das usadas pelos handlers)
+HOT_QUERIES = (
+    ('SELECT $1::bigint AS telegram_id, now() AS ts', lambda i: (i,)),
+    ('SELECT $1::text || $2::text AS label', lambda i: ('user-', str(i))),
+    ('SELECT count(*) FROM generate_series(1, $1::int)', lambda i: (i % 50 + 1,)),
+    ('SELECT $1::numeric(15,2) * 2 AS total', lambda i: (i,)),
+)
+
+# Modos verificados pelo stand-in ('transaction_prepared' depende do suporte a
+# prepared statements do PgBouncer >= 1.21, que o stand-in não emula)
+STAND_IN_MODES = ('session', 'transaction')
+
+SSL_REQUEST_CODE = 80877103
+CANCEL_REQUEST_CODE = 80877102
+
+
+async def _read_message(reader):
+    """Ler uma mensagem do protocolo (tipo + corpo)"""
+    header = await reader.readexactly(5)
+    length = struct.unpack('!I', header[1:])[0]
+    return header[:1], header + await reader.readexactly(length - 4)
+
+
+class TransactionPoolerStandIn:
+    """Proxy mínimo com a semântica de pool_mode=transaction do PgBouncer
+
+    Cada cliente recebe uma conexão do servidor só enquanto há transação em
+    andamento; no ReadyForQuery ocioso ela volta para o pool e a próxima
+    mensagem do cliente pode cair em outra conexão. Só suporta autenticação
+    trust no upstream (banco local de teste).
+    """
+
+    def __init__(self, upstream_dsn: str, server_connections: int = 2):
+        parsed = urlparse(upstream_dsn)
+        query = parse_qs(parsed.query)
+        self.upstream_host = query.get('host', [parsed.hostname or 'localhost'])[0]
+        self.upstream_port = parsed.port or int(query.get('port', ['5432'])[0])
+        self.user = parsed.username or os.getenv('USER', 'postgres')
+        self.database = parsed.path.lstrip('/') or self.user
+        self.server_connections = server_connections
+        self.idle = asyncio.Queue()
+        self.parameters = []
+        self.server = None
+        self.transactions = 0
+
+    async def _open_upstream(self):
+        if self.upstream_host.startswith('/'):
+            path = os.path.join(self.upstream_host, f'.s.PGSQL.{self.upstream_port}')
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(self.upstream_host, self.upstream_port)
+
+        body = struct.pack('!I', 196608)
+        for key, value in (('user', self.user), ('database', self.database)):
+            body += key.encode() + b'\0' + value.encode() + b'\0'
+        body += b'\0'
+        writer.write(struct.pack('!I', len(body) + 4) + body)
+        await writer.drain()
+
+        parameters = []
+        while True:
+            kind, message = await _read_message(reader)
+            if kind == b'R' and struct.unpack('!I', message[5:9])[0] != 0:
+                raise RuntimeError('Stand-in só suporta autenticação trust no upstream')
+            if kind == b'E':
+                raise RuntimeError(f'Upstream recusou a conexão: {message[5:]!r}')
+            if kind == b'S':
+                parameters.append(message)
+            if kind == b'Z':
+                break
+
+        if not self.parameters:
+            self.parameters = parameters
+        return reader, writer
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0):
+        for _ in range(self.server_connections):
+            self.idle.put_nowait(await self._open_upstream())
+        self.server = await asyncio.start_server(self._serve_client, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        while not self.idle.empty():
+            _, writer = self.idle.get_nowait()
+            writer.close()
+
+    async def _handshake(self, reader, writer) -> bool:
+        while True:
+            length = struct.unpack('!I', await reader.readexactly(4))[0]
+            payload = await reader.readexactly(length - 4)
+            code = struct.unpack('!I', payload[:4])[0]
+            if code == SSL_REQUEST_CODE:
+                writer.write(b'N')
+                continue
+            if code == CANCEL_REQUEST_CODE:
+                return False
+            break
+
+        writer.write(b'R' + struct.pack('!II', 8, 0))
+        for message in self.parameters:
+            writer.write(message)
+        writer.write(b'K' + struct.pack('!III', 12, os.getpid(), id(writer) & 0xFFFFFFFF))
+        writer.write(b'Z' + struct.pack('!I', 5) + b'I')
+        await writer.drain()
+        return True
+
+    async def _serve_client(self, reader, writer):
+        try:
+            if not await self._handshake(reader, writer):
+                return
+            kind, message = await _read_message(reader)
+            while kind != b'X':
+                # Cliente ocioso: anexar uma conexão do servidor até o fim da transação
+                upstream = await self.idle.get()
+                try:
+                    pending = await self._transaction(reader, writer, upstream, message)
+                finally:
+                    self.idle.put_nowait(upstream)
+                kind, message = await pending
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _transaction(self, reader, writer, upstream, message):
+        """Encaminhar mensagens do cliente até o servidor ficar ocioso
+
+        Retorna a leitura (pendente) da próxima mensagem do cliente, que abre
+        a transação seguinte em qualquer conexão livre.
+        """
+        upstream_reader, upstream_writer = upstream
+        relay = asyncio.ensure_future(self._relay(upstream_reader, writer))
+        pending = asyncio.ensure_future(_read_message(reader))
+        upstream_writer.write(message)
+        await upstream_writer.drain()
+        try:
+            while True:
+                await asyncio.wait({relay, pending}, return_when=asyncio.FIRST_COMPLETED)
+                if relay.done():
+                    relay.result()
+                    return pending
+                upstream_writer.write(pending.result()[1])
+                await upstream_writer.drain()
+                pending = asyncio.ensure_future(_read_message(reader))
+        except BaseException:
+            relay.cancel()
+            pending.cancel()
+            raise
+
+    async def _relay(self, upstream_reader, client_writer):
+        """Repassar respostas até o ReadyForQuery fora de transação"""
+        while True:
+            kind, message = await _read_message(upstream_reader)
+            client_writer.write(message)
+            if kind == b'Z' and message[5:6] == b'I':
+                self.transactions += 1
+                await client_writer.drain()
+                return
+
+
+async def run_replica(dsn: str, mode: str, replica: int, iterations: int, concurrency: int):
+    """Uma réplica do bot: pool próprio executando as queries quentes"""
+    settings = PoolSettings(min_size=1, max_size=concurrency, pooler_mode=mode)
+    pool = await DatabasePool.create(dsn, settings, name=f'replica-{replica}')
+    errors = {}
+    completed = 0
+
+    async def worker(worker_id):
+        nonlocal completed
+        for i in range(iterations):
+            query, make_args = HOT_QUERIES[(i + worker_id) % len(HOT_QUERIES)]
+            try:
+                async with pool.acquire() as conn:
+                    if i % 5 == 0:
+                        async with conn.transaction():
+                            await conn.fetchrow(query, *make_args(i))
+                            await conn.fetchval('SELECT $1::int + 1', i)
+                    else:
+                        await conn.fetchrow(query, *make_args(i))
+                completed += 1
+            except Exception as e:
+                name = type(e).__name__
+                errors[name] = errors.get(name, 0) + 1
+
+    try:
+        await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    finally:
+        await pool.close()
+    return completed, errors
+
+
+async def check_mode(dsn: str, mode: str, replicas: int, iterations: int, concurrency: int):
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        run_replica(dsn, mode, r, iterations, concurrency) for r in range(replicas)
+    ), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    completed = 0
+    errors = {}
+    for result in results:
+        if isinstance(result, Exception):
+            name = type(result).__name__
+            errors[name] = errors.get(name, 0) + 1
+            continue
+        done, replica_errors = result
+        completed += done
+        for name, count in replica_errors.items():
+            errors[name] = errors.get(name, 0) + count
+
+    return {
+        'mode': mode,
+        'queries': completed,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'qps': round(completed / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def run(args):
+    stand_in = None
+    if args.pooler_url:
+        dsn = args.pooler_url
+        modes = args.modes or ('session', 'transaction', 'transaction_prepared')
+    else:
+        upstream = os.getenv('DATABASE_URL')
+        if not upstream:
+            raise SystemExit('Configure DATABASE_URL (banco de teste local) ou use --pooler-url')
+        stand_in = TransactionPoolerStandIn(upstream, args.server_connections)
+        host, port = await stand_in.start()
+        dsn = f'postgresql://{quote(stand_in.user)}@{host}:{port}/{quote(stand_in.database)}?sslmode=disable'
+        modes = args.modes or STAND_IN_MODES
+
+    try:
+        reports = []
+        for mode in modes:
+            reports.append(await check_mode(dsn, mode, args.replicas, args.iterations, args.concurrency))
+        return reports, stand_in.transactions if stand_in else None
+    finally:
+        if stand_in:
+            await stand_in.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verificação do modo transaction pooling')
+    parser.add_argument('--pooler-url', help='DSN de um PgBouncer real (padrão: stand-in local)')
+    parser.add_argument('--modes', nargs='+', choices=('session', 'transaction', 'transaction_prepared'))
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=4, help='conexões por réplica')
+    parser.add_argument('--iterations', type=int, default=50, help='queries por conexão')
+    parser.add_argument('--server-connections', type=int, default=2, help='conexões do stand-in ao servidor')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    reports, transactions = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps({'modes': reports, 'pooler_transactions': transactions}, indent=2))
+    else:
+        for report in reports:
+            errors = ', '.join(f'{name}={count}' for name, count in report['errors'].items()) or 'nenhum'
+            print(f"{report['mode']:<22} {report['queries']:>6} queries  {report['qps']:>8} q/s  erros: {errors}")
+        if transactions is not None:
+            print(f"stand-in: {transactions} transações em {args.server_connections} conexões do servidor")
+
+    failed = any(r['errors'] for r in reports if r['mode'] == 'transaction')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
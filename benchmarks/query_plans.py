@@ -0,0 +1,304 @@
+"""
+Regressão de planos de execução
+Extrai todo statement SQL dos módulos do bot, roda EXPLAIN do plano genérico
+(o que o asyncpg usa depois de algumas execuções) contra um banco local com
+massa sintética e falha quando uma query cai em Seq Scan numa tabela grande
+ou passa do orçamento de custo
+
+Uso:
+    DATABASE_URL=postgresql://... python -m benchmarks.query_plans [--filter main.] [--verbose]
+    python -m benchmarks.query_plans --keep-data      # não remove a massa sintética no final
+
+Os statements são as strings (e f-strings de módulo já resolvidas) que
+começam com SELECT/INSERT/UPDATE/DELETE/WITH; SQL montado dentro de funções
+com f-string aparece como "ignorado". Cada statement é identificado por
+módulo.Classe.função (#n quando há mais de um na mesma função). Exceções
+conscientes ficam em BATCH_STATEMENTS e COST_BUDGETS, sempre com o motivo.
+Seq Scan em tabela que a massa deixa pequena sai como observação, não como
+aprovação: o planner ainda não tem como escolher o índice ali.
+Sai com código 1 se houver violação ou statement que o banco não planeja.
+"""
+import argparse
+import ast
+import asyncio
+import importlib
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from db_pool import DatabasePool, PoolSettings
+from demo_data import DemoDataLoader, SyntheticProfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SQL_START = re.compile(r'\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\s')
+SQL_BODY = re.compile(r'\b(FROM|INTO|SET|EXISTS)\b')
+PARAM = re.compile(r'\$(\d+)')
+
+# Massa do plano: muitos usuários (lookups por usuário) e histórico curto
+PLAN_PROFILE = SyntheticProfile(users=2000, months=3, expenses_per_month=10, installment_plans=1,
+                                telegram_id_base=8_500_000_000)
+
+# Seq Scan só é violação a partir deste tamanho de tabela (reltuples)
+DEFAULT_MIN_ROWS = 1000
+# Custo total estimado pelo planner (unidades do Postgres, não ms)
+DEFAULT_COST_BUDGET = 1000.0
+
+# Statements em lote (fora do caminho das updates): sem checagem de Seq Scan nem de custo
+BATCH_STATEMENTS = {
+    'demo_data.SYNTHETIC_USERS_SQL': 'carga da massa sintética',
+    'demo_data.SYNTHETIC_CATEGORIES_SQL': 'carga da massa sintética',
+    'demo_data.SYNTHETIC_REVENUES_SQL': 'carga da massa sintética; custo cresce com o tamanho da massa',
+    'demo_data.SYNTHETIC_EXPENSES_SQL': 'carga da massa sintética; junta todas as categorias de uma vez',
+    'demo_data.SYNTHETIC_INSTALLMENTS_SQL': 'carga da massa sintética; custo cresce com o tamanho da massa',
+}
+
+# Orçamentos próprios: statement -> (custo máximo, motivo)
+COST_BUDGETS = {
+    'main.FinancialBot.backfill_account_keys': (10_000.0, 'lote de até 500 linhas por keyset no id (warmup)'),
+}
+
+
+def _module_paths(root: str = REPO_ROOT) -> List[str]:
+    return sorted(
+        os.path.join(root, name) for name in os.listdir(root)
+        if name.endswith('.py') and not name.startswith('_')
+    )
+
+
+def _is_sql(text: str) -> bool:
+    return bool(SQL_START.match(text)) and (bool(SQL_BODY.search(text)) or len(text.split()) <= 3)
+
+
+def _docstrings(tree: ast.AST) -> set:
+    nodes = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) and node.body:
+            first = node.body[0]
+            if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant):
+                nodes.add(id(first.value))
+    return nodes
+
+
+class _Collector(ast.NodeVisitor):
+    """Strings SQL de um módulo com o escopo (Classe.função) onde aparecem"""
+
+    def __init__(self, module: str, tree: ast.AST):
+        self.module = module
+        self.module_object = None
+        self.docstrings = _docstrings(tree)
+        self.scope: List[str] = []
+        self.statements: List[Dict] = []
+        self.skipped: List[Dict] = []
+        self._seen: Dict[str, int] = {}
+
+    def _key(self, name: Optional[str] = None) -> str:
+        base = '.'.join([self.module] + self.scope + ([name] if name else []))
+        count = self._seen.get(base, 0) + 1
+        self._seen[base] = count
+        return base if count == 1 else f'{base}#{count}'
+
+    def _scoped(self, node):
+        self.scope.append(node.name)
+        self.generic_visit(node)
+        self.scope.pop()
+
+    visit_ClassDef = visit_FunctionDef = visit_AsyncFunctionDef = _scoped
+
+    def visit_Assign(self, node: ast.Assign):
+        # Constante de módulo: vale o valor em tempo de execução (resolve f-strings)
+        if not self.scope and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if isinstance(node.value, (ast.Constant, ast.JoinedStr)):
+                value = self._module_value(name)
+                if isinstance(value, str) and _is_sql(value):
+                    self.statements.append({'key': self._key(name), 'line': node.lineno, 'sql': value})
+                return
+        self.generic_visit(node)
+
+    def visit_Constant(self, node: ast.Constant):
+        if isinstance(node.value, str) and id(node) not in self.docstrings and _is_sql(node.value):
+            self.statements.append({'key': self._key(), 'line': node.lineno, 'sql': node.value})
+
+    def visit_JoinedStr(self, node: ast.JoinedStr):
+        first = node.values[0] if node.values else None
+        if isinstance(first, ast.Constant) and _is_sql(''.join(
+            part.value for part in node.values if isinstance(part, ast.Constant)
+        )):
+            self.skipped.append({'key': self._key(), 'line': node.lineno, 'reason': 'f-string montada em tempo de execução'})
+
+    def _module_value(self, name: str):
+        if self.module_object is None:
+            self.module_object = importlib.import_module(self.module)
+        return getattr(self.module_object, name, None)
+
+
+def extract_statements(root: str = REPO_ROOT):
+    """(statements, ignorados) de todos os módulos do nível principal do repositório"""
+    statements, skipped = [], []
+    for path in _module_paths(root):
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+        collector = _Collector(os.path.splitext(os.path.basename(path))[0], tree)
+        collector.visit(tree)
+        statements.extend(collector.statements)
+        skipped.extend(collector.skipped)
+    return statements, skipped
+
+
+def _walk_plan(node: Dict):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from _walk_plan(child)
+
+
+async def explain(conn, sql: str) -> Dict:
+    """Plano genérico em JSON: PREPARE + force_generic_plan (parâmetros $n sem valor)
+
+    EXPLAIN (GENERIC_PLAN) não serve aqui: o asyncpg usa o protocolo estendido e
+    exigiria os parâmetros; com plan_cache_mode=force_generic_plan o EXECUTE
+    com NULLs mostra o mesmo plano genérico, em qualquer versão do Postgres.
+    """
+    params = max((int(n) for n in PARAM.findall(sql)), default=0)
+    arguments = f"({', '.join(['NULL'] * params)})" if params else ''
+    async with conn.transaction():
+        await conn.execute("SET LOCAL plan_cache_mode = force_generic_plan")
+        await conn.execute(f'PREPARE query_plan_check AS {sql}')
+        try:
+            rows = await conn.fetchval(f'EXPLAIN (FORMAT JSON) EXECUTE query_plan_check{arguments}')
+        finally:
+            await conn.execute('DEALLOCATE query_plan_check')
+    plan = json.loads(rows) if isinstance(rows, str) else rows
+    return plan[0]['Plan']
+
+
+def check_plan(key: str, plan: Dict, table_rows: Dict[str, float], min_rows: int,
+               default_budget: float) -> Tuple[List[str], List[str]]:
+    """(violações, observações) de um plano
+
+    Violação: Seq Scan em tabela com min_rows ou mais linhas, ou custo acima do
+    orçamento. Observação: Seq Scan em tabela pequena demais para avaliar.
+    """
+    violations, notes = [], []
+    if key in BATCH_STATEMENTS:
+        return violations, notes
+    for node in _walk_plan(plan):
+        relation = node.get('Relation Name')
+        if node['Node Type'] != 'Seq Scan' or relation is None:
+            continue
+        rows = max(table_rows.get(relation, 0), 0)
+        if rows >= min_rows:
+            violations.append(f"Seq Scan em {relation} (~{int(rows)} linhas)")
+        else:
+            notes.append(f"Seq Scan em {relation} (~{int(rows)} linhas, pequena demais para avaliar)")
+    budget = COST_BUDGETS.get(key, (default_budget, ''))[0]
+    if plan['Total Cost'] > budget:
+        violations.append(f"custo {plan['Total Cost']:.0f} > orçamento {budget:.0f}")
+    return violations, notes
+
+
+async def _prepare_database(bot, loader: DemoDataLoader, profile: SyntheticProfile):
+    from main import SCHEMA_SQL
+
+    async with bot.db_pool.acquire() as conn:
+        if not await bot.schema_is_current(conn):
+            await conn.execute(SCHEMA_SQL, timeout=bot.db_pool.timeout_for('migration'))
+    if len(await loader.synthetic_user_ids(profile)) < profile.users:
+        await loader.drop_synthetic(profile)
+        await loader.generate(profile)
+    async with bot.db_pool.acquire() as conn:
+        await conn.execute('ANALYZE')
+        rows = await conn.fetch(
+            "SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' "
+            "AND relnamespace = 'public'::regnamespace"
+        )
+    return {row['relname']: row['reltuples'] for row in rows}
+
+
+async def run(args) -> Dict:
+    dsn = os.getenv('DATABASE_URL')
+    if not dsn:
+        raise SystemExit('Configure DATABASE_URL (banco de teste local)')
+
+    from main import FinancialBot
+
+    statements, skipped = extract_statements()
+    statements = [s for s in statements if args.filter in s['key']]
+
+    pool = await DatabasePool.create(dsn, PoolSettings(min_size=1, max_size=2), name='plans')
+    bot = FinancialBot()
+    bot.db_pool = pool
+    loader = DemoDataLoader(bot)
+    results = []
+    try:
+        table_rows = await _prepare_database(bot, loader, PLAN_PROFILE)
+        async with pool.acquire() as conn:
+            for statement in statements:
+                result = {'key': statement['key'], 'line': statement['line']}
+                try:
+                    plan = await explain(conn, statement['sql'])
+                except Exception as e:
+                    result['error'] = f"{type(e).__name__}: {str(e).splitlines()[0]}"
+                else:
+                    result['cost'] = plan['Total Cost']
+                    result['plan'] = [
+                        f"{node['Node Type']}" + (f" {node['Relation Name']}" if 'Relation Name' in node else '')
+                        + (f" ({node['Index Name']})" if 'Index Name' in node else '')
+                        for node in _walk_plan(plan)
+                    ]
+                    result['violations'], result['notes'] = check_plan(
+                        statement['key'], plan, table_rows, args.min_rows, args.cost_budget
+                    )
+                results.append(result)
+    finally:
+        if not args.keep_data:
+            await loader.drop_synthetic(PLAN_PROFILE)
+        await pool.close()
+    return {'statements': results, 'skipped': skipped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regressão de planos de execução das queries do bot')
+    parser.add_argument('--filter', default='', help='só statements cujo identificador contém o texto')
+    parser.add_argument('--min-rows', type=int, default=DEFAULT_MIN_ROWS,
+                        help='tamanho mínimo de tabela para Seq Scan contar como violação')
+    parser.add_argument('--cost-budget', type=float, default=DEFAULT_COST_BUDGET,
+                        help='custo máximo estimado por statement (sem orçamento próprio)')
+    parser.add_argument('--keep-data', action='store_true', help='manter a massa sintética no banco')
+    parser.add_argument('--verbose', action='store_true', help='mostrar o plano de cada statement')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    results = report['statements']
+    failed = [r for r in results if r.get('error') or r.get('violations')]
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        for result in results:
+            if result.get('error'):
+                status = f"❌ não planejado: {result['error']}"
+            elif result['violations']:
+                status = '⚠️ ' + '; '.join(result['violations'])
+            elif result['notes'] and args.verbose:
+                status = 'ok (' + '; '.join(result['notes']) + ')'
+            else:
+                status = 'ok'
+            cost = f"{result['cost']:>10.1f}" if 'cost' in result else ' ' * 10
+            print(f"{result['key']:<52} {cost}  {status}")
+            if args.verbose and result.get('plan'):
+                print('    ' + ' → '.join(result['plan']))
+        for item in report['skipped']:
+            print(f"{item['key']:<52} {'':>10}  ignorado ({item['reason']}, linha {item['line']})")
+        noted = sum(1 for r in results if r.get('notes'))
+        print(f"\n{len(results)} statements, {len(failed)} com problema, {noted} com Seq Scan em tabela "
+              f"pequena (--verbose), {len(report['skipped'])} ignorados")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark de inicialização
+Mede as fases de import e init do bot em processos Python novos (cold start)
+
+Uso:
+    python -m benchmarks.startup [--runs 5] [--budget 1.0] [--json]
+
+Com DATABASE_URL configurada também mede init_database (conexão + verificação
+de schema). Sai com código 1 se o total mediano passar do orçamento.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Token fictício: a aplicação é montada mas nunca conecta ao Telegram
+DUMMY_TOKEN = '123456:benchmark-token'
+
+# Módulos pesados que não devem ser importados no boot
+DEFERRED_MODULES = ('openai',)
+
+
+def measure_phases():
+    """Executar as fases de boot no processo atual e retornar os tempos (s)"""
+    phases = {}
+
+    def phase(name, func):
+        started = time.perf_counter()
+        result = func()
+        phases[name] = time.perf_counter() - started
+        return result
+
+    phase('import telegram', lambda: __import__('telegram.ext'))
+    phase('import asyncpg', lambda: __import__('asyncpg'))
+    main = phase('import main', lambda: __import__('main'))
+    phase('import gerenciadores', lambda: [
+        __import__(name) for name in (
+            'bot_commands', 'revenue_manager', 'expense_manager',
+            'search_manager', 'statement_manager',
+        )
+    ])
+    bot = phase('FinancialBot()', main.FinancialBot)
+
+    from telegram.ext import Application
+    phase('Application.build()', lambda: Application.builder().token(DUMMY_TOKEN).build())
+
+    if os.getenv('DATABASE_URL'):
+        import asyncio
+
+        async def init_database():
+            await bot.init_database()
+            await bot.db_pool.close()
+            if bot.db_read_pool:
+                await bot.db_read_pool.close()
+
+        phase('init_database()', lambda: asyncio.run(init_database()))
+
+    return {
+        'phases': phases,
+        'deferred_loaded': [name for name in DEFERRED_MODULES if name in sys.modules],
+    }
+
+
+def run_child() -> dict:
+    """Medir em um interpretador novo (imports frios)"""
+    env = dict(os.environ)
+    env.setdefault('TELEGRAM_BOT_TOKEN', DUMMY_TOKEN)
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.startup', '--child'],
+        capture_output=True, text=True, check=True, env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process'] = time.perf_counter() - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='processos medidos (mediana)')
+    parser.add_argument('--budget', type=float, default=1.0, help='orçamento do tempo Python total (s)')
+    parser.add_argument('--json', action='store_true', help='saída em JSON')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_phases()))
+        return 0
+
+    runs = [run_child() for _ in range(args.runs)]
+    phase_names = list(runs[0]['phases'])
+    medians = {
+        name: statistics.median(run['phases'][name] for run in runs)
+        for name in phase_names
+    }
+    total = sum(medians.values())
+    process = statistics.median(run['process'] for run in runs)
+    deferred_loaded = sorted({name for run in runs for name in run['deferred_loaded']})
+
+    if args.json:
+        print(json.dumps({
+            'runs': args.runs,
+            'phases_ms': {name: round(value * 1000, 2) for name, value in medians.items()},
+            'total_ms': round(total * 1000, 2),
+            'process_ms': round(process * 1000, 2),
+            'deferred_loaded': deferred_loaded,
+            'budget_ms': args.budget * 1000,
+        }, indent=2))
+    else:
+        print(f"Boot do bot — mediana de {args.runs} processos\n")
+        for name, value in medians.items():
+            print(f"  {name:<24} {value * 1000:9.1f} ms")
+        print(f"  {'-' * 36}")
+        print(f"  {'total (Python)':<24} {total * 1000:9.1f} ms")
+        print(f"  {'processo completo':<24} {process * 1000:9.1f} ms")
+        if deferred_loaded:
+            print(f"\n⚠️ Módulos adiados carregados no boot: {', '.join(deferred_loaded)}")
+
+    if total > args.budget:
+        print(f"\n❌ Total acima do orçamento de {args.budget:.2f}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,6 +7,8 @@ import json
 import bcrypt
 import re
 
+from tracing import tracer
+
 logger = logging.getLogger(__name__)
 
 # Estados da conversa para autenticação
@@ -29,11 +31,13 @@ class BotCommands:
     def hash_password(self, password):
         """Hash da senha com bcrypt"""
         salt = bcrypt.gensalt()
-        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        with tracer.span('auth.bcrypt.hash'):
+            return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
     
     def verify_password(self, password, hashed_password):
         """Verificar senha contra hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+        with tracer.span('auth.bcrypt.check'):
+            return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
     
     # Comandos de autenticação simplificados
     async def start_registration(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -249,7 +253,7 @@ class BotCommands:
                 WHERE user_id = $1
             """
             
-            stats = await self.bot.execute_query_one(stats_query, (user['id'],))
+            stats = await self.bot.execute_read_one(stats_query, (user['id'],), user_id=user['id'])
             
             text = f"""👤 **Seu Perfil**
 
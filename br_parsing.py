@@ -0,0 +1,133 @@
+"""
+Parsing de Valores, Datas e Palavras (pt-BR)
+Valores monetários em Decimal exato (centavos) e datas digitadas pelo usuário,
+cada um com uma única expressão regular compilada, e a normalização de palavras
+usada pelo lançamento rápido e pelo categorizador
+"""
+from calendar import monthrange
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+import re
+import unicodedata
+
+# Valor: "R$ 1.350,50", "1350,5", "5000.00", "1,350.50", "2 500"
+# Grupos de milhar usam o mesmo separador; o separador decimal (1 ou 2
+# dígitos no final) precisa ser diferente dele
+_MONEY_RE = re.compile(r"""
+    \s*(?:r\$)?\s*
+    (?:
+        (?P<grouped>\d{1,3}(?P<sep>[.,\ \u00a0])\d{3}(?:(?P=sep)\d{3})*)
+      | (?P<plain>\d+)
+    )
+    (?:(?P<dec>[.,])(?P<cents>\d{1,2}))?
+    \s*
+""", re.IGNORECASE | re.VERBOSE)
+
+# Data: "15/12/2025", "15-12-25", "15/12", "hoje", "dia 5", "há 3 dias", ...
+_DATE_RE = re.compile(r"""
+    \s*(?:
+        (?P<day>\d{1,2})[/.\-](?P<month>\d{1,2})(?:[/.\-](?P<year>\d{4}|\d{2}))?
+      | (?P<relative>hoje|ontem|anteontem|amanh[ãa]|depois\ de\ amanh[ãa])
+      | dia\ +(?P<month_day>\d{1,2})
+      | (?:h[áa]\ +(?P<days_ago>\d{1,3})\ +dias?|(?P<days_before>\d{1,3})\ +dias?\ +atr[áa]s)
+      | (?P<week>semana\ passada|semana\ que\ vem|pr[óo]xima\ semana)
+      | (?P<month_shift>m[êe]s\ passado|m[êe]s\ que\ vem|pr[óo]ximo\ m[êe]s)
+    )\s*
+""", re.IGNORECASE | re.VERBOSE)
+
+_RELATIVE_DAYS = {
+    'hoje': 0, 'ontem': -1, 'anteontem': -2,
+    'amanhã': 1, 'amanha': 1, 'depois de amanhã': 2, 'depois de amanha': 2,
+}
+
+CENTS = Decimal('0.01')
+
+# Verbos que abrem um lançamento rápido ("gastei 45 ifood", "recebi 3500 salário")
+EXPENSE_VERBS = frozenset({'gastei', 'paguei', 'comprei', 'gasto', 'despesa'})
+INCOME_VERBS = frozenset({'recebi', 'ganhei', 'receita'})
+
+# Palavras que não entram na descrição quando sobram nas pontas
+STOPWORDS = frozenset({'em', 'no', 'na', 'de', 'do', 'da', 'com', 'pelo', 'pela', 'reais', 'r$', 'real'})
+
+# Fora do vocabulário de categorias (verbos de gatilho aparecem nas descrições dos tipos)
+IGNORED_WORDS = STOPWORDS | EXPENSE_VERBS | INCOME_VERBS
+
+
+def parse_money(text: str) -> Decimal:
+    """Converter valor digitado em Decimal com 2 casas (ValueError se inválido)
+
+    Um separador seguido de 3 dígitos é de milhar ("1.350" = 1350); seguido de
+    1 ou 2 dígitos no final é decimal ("5000.00" = 5000, "1,5" = 1,50).
+    """
+    # Caminho rápido: só dígitos ASCII ("150", "2500"); isdigit sozinho aceita "²"
+    if text.isascii() and text.isdigit():
+        return Decimal(text + '.00')
+
+    match = _MONEY_RE.fullmatch(text)
+    if match is None:
+        raise ValueError(f"Valor inválido: {text!r}")
+
+    grouped, sep, plain, dec, cents = match.groups()
+    if grouped:
+        if dec == sep:
+            raise ValueError(f"Separador decimal ambíguo: {text!r}")
+        plain = grouped.replace(sep, '')
+    try:
+        return Decimal(plain + '.' + (cents or '').ljust(2, '0'))
+    except InvalidOperation:
+        raise ValueError(f"Valor inválido: {text!r}") from None
+
+
+def _shift_months(day: date, months: int) -> date:
+    """Mesmo dia em outro mês (limitado ao último dia do mês de destino)"""
+    year, month = divmod(day.month - 1 + months, 12)
+    year += day.year
+    month += 1
+    return date(year, month, min(day.day, monthrange(year, month)[1]))
+
+
+def parse_date(text: str, today: Optional[date] = None) -> date:
+    """Converter data digitada (absoluta ou relativa a hoje); ValueError se inválida"""
+    today = today or date.today()
+
+    # Caminho rápido: "hoje", "ontem", ...
+    shift = _RELATIVE_DAYS.get(text.strip().lower())
+    if shift is not None:
+        return today + timedelta(days=shift)
+
+    match = _DATE_RE.fullmatch(text)
+    if match is None:
+        raise ValueError(f"Data não reconhecida: {text!r}")
+
+    groups = match.groupdict()
+
+    if groups['day']:
+        year = groups['year']
+        if year is None:
+            year = today.year
+        elif len(year) == 2:
+            year = 2000 + int(year)
+        return date(int(year), int(groups['month']), int(groups['day']))
+
+    if groups['relative']:
+        return today + timedelta(days=_RELATIVE_DAYS[groups['relative'].lower()])
+
+    if groups['month_day']:
+        return today.replace(day=int(groups['month_day']))
+
+    days_ago = groups['days_ago'] or groups['days_before']
+    if days_ago:
+        return today - timedelta(days=int(days_ago))
+
+    if groups['week']:
+        return today + timedelta(days=-7 if groups['week'].lower().endswith('passada') else 7)
+
+    return _shift_months(today, -1 if groups['month_shift'].lower().endswith('passado') else 1)
+
+
+def fold(word: str) -> str:
+    """Normalizar palavra para o vocabulário: minúsculas, sem acento, sem plural simples"""
+    word = unicodedata.normalize('NFKD', word.lower())
+    word = ''.join(c for c in word if not unicodedata.combining(c)).strip('.,;:!?()"\'')
+    return word[:-1] if len(word) > 3 and word.endswith('s') else word
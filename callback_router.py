@@ -0,0 +1,140 @@
+"""
+Roteador de Callbacks
+Formato compacto e versionado de callback_data com despacho O(1) por rota
+"""
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato: "<versão>:<rota>:<arg>:<arg>..."
+CALLBACK_VERSION = '1'
+CALLBACK_SEPARATOR = ':'
+_VERSION_PREFIX = CALLBACK_VERSION + CALLBACK_SEPARATOR
+
+# Limite do Telegram para callback_data (bytes)
+CALLBACK_DATA_LIMIT = 64
+
+CallbackHandler = Callable[..., Awaitable]
+
+
+def encode_callback(route: str, *args) -> str:
+    """Montar callback_data versionado para a rota"""
+    data = CALLBACK_SEPARATOR.join((CALLBACK_VERSION, route, *map(str, args)))
+    if len(data.encode('utf-8')) > CALLBACK_DATA_LIMIT:
+        raise ValueError(f"callback_data excede {CALLBACK_DATA_LIMIT} bytes: {data}")
+    return data
+
+
+def decode_callback(data: Optional[str]) -> Tuple[str, Tuple[str, ...]]:
+    """Separar rota e argumentos; dados sem versão (botões antigos) viram rota sem argumentos"""
+    if not data:
+        return '', ()
+    if not data.startswith(_VERSION_PREFIX):
+        return data, ()
+    route, *args = data[len(_VERSION_PREFIX):].split(CALLBACK_SEPARATOR)
+    return route, tuple(args)
+
+
+class RouteStats:
+    """Contadores de latência de uma rota"""
+
+    __slots__ = ('count', 'errors', 'total_seconds', 'max_seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, elapsed: float, failed: bool = False):
+        self.count += 1
+        self.total_seconds += elapsed
+        if elapsed > self.max_seconds:
+            self.max_seconds = elapsed
+        if failed:
+            self.errors += 1
+
+    def as_dict(self) -> Dict:
+        average = self.total_seconds / self.count if self.count else 0.0
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(average * 1000, 3),
+            'max_ms': round(self.max_seconds * 1000, 3),
+        }
+
+
+class CallbackRouter:
+    """Tabela de rotas de callback: um dict rota -> handler
+
+    Handlers recebem (update, context, *args) com os argumentos já
+    decodificados do callback_data.
+    """
+
+    def __init__(self):
+        self._routes: Dict[str, CallbackHandler] = {}
+        self._fallback: Optional[CallbackHandler] = None
+        self.stats: Dict[str, RouteStats] = {}
+
+    def register(self, route: str, handler: Optional[CallbackHandler] = None):
+        """Registrar handler da rota (também funciona como decorator)"""
+        if handler is None:
+            def decorator(func):
+                self.register(route, func)
+                return func
+            return decorator
+
+        if CALLBACK_SEPARATOR in route:
+            raise ValueError(f"Rota não pode conter '{CALLBACK_SEPARATOR}': {route}")
+        if route in self._routes:
+            logger.warning(f"Rota de callback substituída: {route}")
+        self._routes[route] = handler
+        self.stats.setdefault(route, RouteStats())
+        return handler
+
+    def set_fallback(self, handler: CallbackHandler):
+        """Handler para rotas desconhecidas (botões antigos ou inválidos)"""
+        self._fallback = handler
+
+    def matches(self, data) -> bool:
+        """Filtro para CallbackQueryHandler(pattern=...): só rotas registradas"""
+        return isinstance(data, str) and decode_callback(data)[0] in self._routes
+
+    @property
+    def routes(self) -> Tuple[str, ...]:
+        return tuple(self._routes)
+
+    async def dispatch(self, update, context):
+        """Despachar o callback da update para o handler da rota"""
+        route, args = decode_callback(update.callback_query.data)
+        handler = self._routes.get(route)
+
+        if handler is None:
+            if self._fallback is None:
+                await update.callback_query.answer()
+                return None
+            route, handler, args = '<fallback>', self._fallback, ()
+
+        stats = self.stats.get(route)
+        if stats is None:
+            stats = self.stats[route] = RouteStats()
+
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await handler(update, context, *args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            stats.record(time.perf_counter() - started, failed)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Snapshot dos contadores por rota"""
+        return {route: stats.as_dict() for route, stats in self.stats.items() if stats.count}
+
+
+# Roteador global (as rotas são registradas pelos gerenciadores)
+callback_router = CallbackRouter()
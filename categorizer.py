@@ -0,0 +1,284 @@
+"""
+Categorização Automática Local
+Aprende com o histórico de cada usuário (palavra da descrição -> tipo e conta)
+e sugere categoria/conta sem chamada de IA, a partir de um índice em memória
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+import asyncio
+import logging
+import os
+import re
+
+from br_parsing import IGNORED_WORDS, fold
+
+logger = logging.getLogger(__name__)
+
+# Contagens por (usuário, tipo de lançamento, palavra, tipo, conta); hits é somado
+# a cada lançamento salvo e subtraído quando ele é desfeito
+UPSERT_MAPPINGS_SQL = """
+    INSERT INTO category_mappings (user_id, kind, token, type_key, account_key, hits)
+    SELECT $1, kind, token, type_key, account_key, sum(hits)
+    FROM unnest($2::text[], $3::text[], $4::text[], $5::text[], $6::int[])
+        AS m(kind, token, type_key, account_key, hits)
+    GROUP BY kind, token, type_key, account_key
+    ON CONFLICT (user_id, kind, token, type_key, account_key)
+    DO UPDATE SET hits = category_mappings.hits + EXCLUDED.hits, updated_at = CURRENT_TIMESTAMP
+"""
+
+LOAD_MAPPINGS_SQL = """
+    SELECT kind, token, type_key, account_key, hits
+    FROM category_mappings
+    WHERE user_id = $1 AND hits > 0
+"""
+
+# Usuário sem mapeamentos: aprende com os lançamentos já gravados (tags = [tipo, conta])
+HISTORY_SQL = """
+    SELECT type AS kind, title, tags[1] AS type_key, COALESCE(account_key, '') AS account_key
+    FROM transactions
+    WHERE user_id = $1 AND type IN ('income', 'expense') AND title IS NOT NULL
+      AND COALESCE(installment_number, 1) = 1
+    ORDER BY transaction_date DESC
+    LIMIT $2
+"""
+
+_WORD_RE = re.compile(r'[^\W\d_]{3,}')
+MAX_TOKEN_LENGTH = 50
+
+
+def description_tokens(text: str) -> Tuple[str, ...]:
+    """Palavras normalizadas da descrição que entram no índice (sem números e stopwords)"""
+    tokens = []
+    for word in _WORD_RE.findall(text or ''):
+        word = fold(word)[:MAX_TOKEN_LENGTH]
+        if word not in IGNORED_WORDS and word not in tokens:
+            tokens.append(word)
+    return tuple(tokens)
+
+
+@dataclass(frozen=True)
+class CategorizerSettings:
+    """Configuração do categorizador (ver from_env para as variáveis de ambiente)"""
+    cache_users: int = 1000
+    min_confidence: float = 0.6
+    history_limit: int = 1000
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str] = os.environ) -> 'CategorizerSettings':
+        """CATEGORIZER_CACHE_USERS, CATEGORIZER_MIN_CONFIDENCE e CATEGORIZER_HISTORY_LIMIT"""
+        return cls(
+            cache_users=int(env.get('CATEGORIZER_CACHE_USERS', cls.cache_users)),
+            min_confidence=float(env.get('CATEGORIZER_MIN_CONFIDENCE', cls.min_confidence)),
+            history_limit=int(env.get('CATEGORIZER_HISTORY_LIMIT', cls.history_limit)),
+        )
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    """Tipo e conta sugeridos; account_key é None quando a conta varia demais"""
+    type_key: str
+    account_key: Optional[str]
+    confidence: float
+
+
+class UserIndex:
+    """Índice de um usuário: (kind, palavra) -> {(tipo, conta): hits}"""
+
+    __slots__ = ('counts', 'totals')
+
+    def __init__(self):
+        self.counts: Dict[Tuple[str, str], Dict[Tuple[str, str], int]] = {}
+        self.totals: Dict[Tuple[str, str], int] = {}
+
+    def add(self, kind: str, token: str, type_key: str, account_key: str, hits: int):
+        key = (kind, token)
+        pairs = self.counts.setdefault(key, {})
+        value = pairs.get((type_key, account_key), 0) + hits
+        if value > 0:
+            pairs[(type_key, account_key)] = value
+        else:
+            pairs.pop((type_key, account_key), None)
+        total = sum(pairs.values())
+        if total:
+            self.totals[key] = total
+        else:
+            self.counts.pop(key, None)
+            self.totals.pop(key, None)
+
+    def suggest(self, kind: str, tokens: Iterable[str], min_confidence: float) -> Optional[Suggestion]:
+        """Votação por palavra: cada palavra conhecida distribui 1 voto entre os pares vistos"""
+        type_votes: Dict[str, float] = {}
+        pair_votes: Dict[Tuple[str, str], float] = {}
+        matched = 0
+        for token in tokens:
+            pairs = self.counts.get((kind, token))
+            if not pairs:
+                continue
+            matched += 1
+            total = self.totals[(kind, token)]
+            for pair, hits in pairs.items():
+                share = hits / total
+                type_votes[pair[0]] = type_votes.get(pair[0], 0.0) + share
+                pair_votes[pair] = pair_votes.get(pair, 0.0) + share
+        if not matched:
+            return None
+
+        type_key = max(type_votes, key=type_votes.get)
+        confidence = type_votes[type_key] / matched
+        if confidence < min_confidence:
+            return None
+
+        accounts = {account: votes for (type_, account), votes in pair_votes.items() if type_ == type_key and account}
+        account_key = max(accounts, key=accounts.get) if accounts else None
+        if account_key and accounts[account_key] / type_votes[type_key] < min_confidence:
+            account_key = None
+        return Suggestion(type_key, account_key, round(confidence, 3))
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class Categorizer:
+    """Índices por usuário em LRU, carregados do banco no primeiro uso
+
+    learn() atualiza memória e banco de forma incremental; suggest() é só
+    consulta a dicionários (microssegundos) e exige o usuário carregado
+    (await load(user_id) antes).
+    """
+
+    def __init__(self, bot_instance, settings: Optional[CategorizerSettings] = None):
+        self.bot = bot_instance
+        self.settings = settings or CategorizerSettings.from_env()
+        self._indexes: "OrderedDict[int, UserIndex]" = OrderedDict()
+        self._loading: Dict[int, asyncio.Task] = {}
+        self._learning: set = set()
+        self._known_types: Dict[str, frozenset] = {}
+
+    def register_types(self, kind: str, type_keys: Iterable[str]):
+        """Tipos válidos de um kind (o histórico tem tags que não são tipos, ex. dados demo)"""
+        self._known_types[kind] = frozenset(type_keys)
+
+    async def load(self, user_id: int) -> UserIndex:
+        """Índice do usuário (do cache, do banco ou do histórico de transações)"""
+        index = self._indexes.get(user_id)
+        if index is not None:
+            self._indexes.move_to_end(user_id)
+            return index
+
+        task = self._loading.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load(user_id))
+            self._loading[user_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(user_id, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, user_id: int) -> UserIndex:
+        index = UserIndex()
+        rows = await self.bot.execute_query(LOAD_MAPPINGS_SQL, (user_id,))
+        for row in rows:
+            index.add(row['kind'], row['token'], row['type_key'], row['account_key'], row['hits'])
+
+        if not rows:
+            learned = await self._learn_history(user_id, index)
+            if learned:
+                logger.info(f"🏷️ Categorizador: {learned} lançamentos do histórico aprendidos (usuário {user_id})")
+
+        self._indexes[user_id] = index
+        while len(self._indexes) > self.settings.cache_users:
+            self._indexes.popitem(last=False)
+        return index
+
+    async def _learn_history(self, user_id: int, index: UserIndex) -> int:
+        rows = await self.bot.execute_query(
+            HISTORY_SQL, (user_id, self.settings.history_limit), query_class='report'
+        )
+        mappings = []
+        for row in rows:
+            if row['type_key'] in self._known_types.get(row['kind'], ()):
+                mappings.extend(self._mappings(row['kind'], row['title'], row['type_key'], row['account_key'], 1))
+        for mapping in mappings:
+            index.add(*mapping)
+        await self._persist(user_id, mappings, query_class='batch')
+        return len(rows)
+
+    @staticmethod
+    def _mappings(kind, description, type_key, account_key, hits) -> List[Tuple[str, str, str, str, int]]:
+        return [(kind, token, type_key, account_key or '', hits) for token in description_tokens(description)]
+
+    async def _persist(self, user_id: int, mappings, query_class: str = 'interactive'):
+        if not mappings:
+            return
+        kinds, tokens, type_keys, account_keys, hits = (list(column) for column in zip(*mappings))
+        await self.bot.execute_write(
+            UPSERT_MAPPINGS_SQL, (user_id, kinds, tokens, type_keys, account_keys, hits),
+            query_class=query_class
+        )
+        if min(hits) < 0:
+            await self.bot.execute_write(
+                "DELETE FROM category_mappings WHERE user_id = $1 AND hits <= 0", (user_id,)
+            )
+
+    async def learn(self, user_id: int, kind: str, description: str, type_key: str,
+                    account_key: Optional[str], hits: int = 1):
+        """Registrar um lançamento salvo (hits=-1 desfaz); falhas não afetam o salvamento"""
+        mappings = self._mappings(kind, description, type_key, account_key, hits)
+        if not mappings:
+            return
+        try:
+            # Carga em andamento já pode ter lido a linha: espera antes de somar na memória
+            task = self._loading.get(user_id)
+            if task is not None:
+                await asyncio.shield(task)
+            index = self._indexes.get(user_id)
+            if index is not None:
+                for mapping in mappings:
+                    index.add(*mapping)
+            await self._persist(user_id, mappings)
+        except Exception as e:
+            logger.warning(f"⚠️ Categorizador não aprendeu o lançamento do usuário {user_id}: {e}")
+
+    async def learn_saved(self, results: Iterable[Optional[Dict]], user_id: int, kind: str,
+                          description: str, type_key: str, account_key: Optional[str]):
+        """Registrar o lançamento só se o salvamento gravou linha nova
+
+        Confirmação repetida do mesmo fluxo volta com duplicate=True e não soma de
+        novo. Na ingestão 'enqueue' o resultado só existe após o group commit: o
+        aprendizado espera por ele em segundo plano (ver flush).
+        """
+        results = [result for result in results if result]
+        args = (user_id, kind, description, type_key, account_key)
+        committed = [result['committed'] for result in results if result.get('queued')]
+        if committed:
+            task = asyncio.ensure_future(self._learn_committed(committed, *args))
+            self._learning.add(task)
+            task.add_done_callback(self._learning.discard)
+        elif any(not result.get('duplicate') for result in results):
+            await self.learn(*args)
+
+    async def _learn_committed(self, futures, *args):
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        if any(isinstance(result, dict) and not result.get('duplicate') for result in results):
+            await self.learn(*args)
+
+    async def flush(self):
+        """Aguardar os aprendizados que esperam o group commit"""
+        if self._learning:
+            await asyncio.gather(*self._learning, return_exceptions=True)
+
+    def suggest(self, user_id: int, kind: str, description: str = '',
+                tokens: Optional[Iterable[str]] = None) -> Optional[Suggestion]:
+        """Sugestão para a descrição (ou palavras já normalizadas); None se incerta ou usuário não carregado"""
+        index = self._indexes.get(user_id)
+        if index is None:
+            return None
+        if tokens is None:
+            tokens = description_tokens(description)
+        return index.suggest(kind, tokens, self.settings.min_confidence)
+
+    def snapshot(self) -> Dict:
+        """Usuários em cache e total de palavras indexadas"""
+        return {
+            'users': len(self._indexes),
+            'tokens': sum(len(index) for index in self._indexes.values()),
+        }
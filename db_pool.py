@@ -0,0 +1,371 @@
+"""
+Pool de Conexões do Banco
+Dimensionamento configurável, modo adaptativo pela espera de acquire, métricas de saturação
+e janela de read-your-writes para a réplica de leitura
+"""
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
+import asyncio
+import logging
+import os
+import time
+import weakref
+
+import asyncpg
+
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Timeout (s) por classe de query; sobrescreva com DB_TIMEOUT_<CLASSE>
+DEFAULT_QUERY_TIMEOUTS = MappingProxyType({
+    'interactive': 5.0,   # handlers que respondem ao usuário
+    'report': 30.0,       # agregações de relatórios/dashboards
+    'batch': 120.0,       # backfills e cargas em lote
+    'migration': 600.0,   # DDL do schema
+})
+
+# Modos de conexão: direto/pooler de sessão, ou PgBouncer em modo transação
+# (sem cache de statements, ou com cache e nomes únicos por processo, para
+# PgBouncer >= 1.21 com max_prepared_statements)
+POOLER_MODES = ('session', 'transaction', 'transaction_prepared')
+
+# Falhas de conexão (não de SQL): leituras na réplica caem para o primário
+CONNECTION_ERRORS = (OSError, asyncpg.PostgresConnectionError, asyncpg.InterfaceError)
+
+# Pools ativos no processo (métricas exportadas pelo health server)
+_pools: "weakref.WeakSet[DatabasePool]" = weakref.WeakSet()
+
+
+def _env_float(env: Mapping[str, str], name: str, default: float) -> float:
+    value = env.get(name)
+    return float(value) if value else default
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    """Configuração do pool (ver from_env para as variáveis de ambiente)"""
+    min_size: int = 2
+    max_size: int = 10
+    command_timeout: float = 15.0
+    # Espera máxima por uma conexão quando o chamador não informa (None: sem limite)
+    acquire_timeout: Optional[float] = 10.0
+    adaptive: bool = False
+    target_wait_ms: float = 20.0
+    adjust_interval: float = 5.0
+    warmup_size: int = 0
+    max_inactive_lifetime: float = 300.0
+    pooler_mode: str = 'session'
+    query_timeouts: Mapping[str, float] = field(default_factory=lambda: DEFAULT_QUERY_TIMEOUTS)
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str] = os.environ) -> 'PoolSettings':
+        """DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_COMMAND_TIMEOUT, DB_POOL_ACQUIRE_TIMEOUT (0 desliga),
+        DB_POOL_ADAPTIVE, DB_POOL_TARGET_WAIT_MS, DB_POOL_WARMUP, DB_POOLER_MODE e DB_TIMEOUT_<CLASSE>"""
+        min_size = int(env.get('DB_POOL_MIN_SIZE', cls.min_size))
+        pooler_mode = env.get('DB_POOLER_MODE', cls.pooler_mode).lower()
+        if pooler_mode not in POOLER_MODES:
+            raise ValueError(f"DB_POOLER_MODE inválido: {pooler_mode} (use {', '.join(POOLER_MODES)})")
+        max_size = max(int(env.get('DB_POOL_MAX_SIZE', cls.max_size)), min_size)
+        timeouts = {
+            name: _env_float(env, f'DB_TIMEOUT_{name.upper()}', default)
+            for name, default in DEFAULT_QUERY_TIMEOUTS.items()
+        }
+        acquire_timeout = _env_float(env, 'DB_POOL_ACQUIRE_TIMEOUT', cls.acquire_timeout)
+        return cls(
+            min_size=min_size,
+            max_size=max_size,
+            command_timeout=float(env.get('DB_COMMAND_TIMEOUT', cls.command_timeout)),
+            acquire_timeout=acquire_timeout or None,
+            adaptive=env.get('DB_POOL_ADAPTIVE', '').lower() in ('1', 'true', 'yes'),
+            target_wait_ms=float(env.get('DB_POOL_TARGET_WAIT_MS', cls.target_wait_ms)),
+            warmup_size=min(int(env.get('DB_POOL_WARMUP', min_size)), max_size),
+            pooler_mode=pooler_mode,
+            query_timeouts=MappingProxyType(timeouts),
+        )
+
+
+class TransactionPoolerConnection(asyncpg.Connection):
+    """Conexão para PgBouncer em modo transação
+
+    Atrás do pooler cada transação pode cair em outra conexão do servidor,
+    compartilhada com outros clientes. Por isso não há reset de sessão ao
+    devolver a conexão ao pool (pg_advisory_unlock_all/RESET ALL afetariam a
+    sessão de outro cliente) e os nomes de prepared statements levam um
+    prefixo único do processo para não colidir entre réplicas.
+    """
+
+    _namespace = f"{os.getpid():x}_{os.urandom(3).hex()}"
+
+    def _get_reset_query(self):
+        return ''
+
+    def _get_unique_id(self, prefix):
+        return super()._get_unique_id(f"{prefix}_{self._namespace}")
+
+
+def pooler_connect_kwargs(pooler_mode: str) -> Dict:
+    """Argumentos do asyncpg para o modo de pooler"""
+    if pooler_mode == 'transaction':
+        return {'connection_class': TransactionPoolerConnection, 'statement_cache_size': 0}
+    if pooler_mode == 'transaction_prepared':
+        return {'connection_class': TransactionPoolerConnection}
+    return {}
+
+
+class RecentWrites:
+    """Janela de read-your-writes
+
+    Usuários que escreveram há menos de `window` segundos leem do primário,
+    para não ver dados antigos enquanto a réplica ainda não aplicou a escrita.
+    """
+
+    __slots__ = ('window', '_writes')
+
+    # Acima disso as marcas expiradas são descartadas
+    PRUNE_THRESHOLD = 10000
+
+    def __init__(self, window: float = 5.0):
+        self.window = window
+        self._writes: Dict[object, float] = {}
+
+    def mark(self, key):
+        now = time.monotonic()
+        self._writes[key] = now
+        if len(self._writes) > self.PRUNE_THRESHOLD:
+            self._writes = {k: t for k, t in self._writes.items() if now - t < self.window}
+
+    def is_recent(self, key) -> bool:
+        written_at = self._writes.get(key)
+        if written_at is None:
+            return False
+        if time.monotonic() - written_at < self.window:
+            return True
+        del self._writes[key]
+        return False
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+
+class PoolMetrics:
+    """Contadores de acquire e saturação do pool"""
+
+    __slots__ = ('acquires', 'total_wait', 'max_wait', 'waiting', 'peak_waiting',
+                 'in_use', 'peak_in_use', 'timeouts', 'errors', 'resizes')
+
+    def __init__(self):
+        self.acquires = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.timeouts: Dict[str, int] = {}
+        self.errors = 0
+        self.resizes = 0
+
+    def record_wait(self, wait: float):
+        self.acquires += 1
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+
+
+class DatabasePool:
+    """Wrapper do asyncpg.Pool com limite adaptativo e métricas
+
+    O asyncpg não redimensiona pools, então o pool é criado com max_size como
+    teto e um limite lógico (entre min_size e max_size) controla quantas
+    conexões podem estar em uso. No modo adaptativo o limite cresce quando a
+    espera média de acquire passa do alvo e encolhe quando sobra folga; as
+    conexões acima do limite ficam ociosas e o asyncpg as fecha após
+    max_inactive_lifetime.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, settings: PoolSettings, name: str = 'primary'):
+        self.pool = pool
+        self.settings = settings
+        self.name = name
+        self.metrics = PoolMetrics()
+        self.limit = settings.min_size if settings.adaptive else settings.max_size
+        self._condition = asyncio.Condition()
+        self._window_started = time.monotonic()
+        self._window_acquires = 0
+        self._window_wait = 0.0
+        self._window_peak = 0
+        _pools.add(self)
+
+    @classmethod
+    async def create(cls, dsn: str, settings: Optional[PoolSettings] = None,
+                     name: str = 'primary', **connect_kwargs) -> 'DatabasePool':
+        """Criar o pool (as min_size conexões abrem já na criação)"""
+        settings = settings or PoolSettings.from_env()
+        connect_kwargs = {**pooler_connect_kwargs(settings.pooler_mode), **connect_kwargs}
+        pool = await asyncpg.create_pool(
+            dsn,
+            min_size=settings.min_size,
+            max_size=settings.max_size,
+            command_timeout=settings.command_timeout,
+            max_inactive_connection_lifetime=settings.max_inactive_lifetime,
+            **connect_kwargs
+        )
+        return cls(pool, settings, name)
+
+    def timeout_for(self, query_class: str) -> float:
+        """Timeout do statement para a classe de query"""
+        return self.settings.query_timeouts.get(query_class, self.settings.command_timeout)
+
+    @asynccontextmanager
+    async def acquire(self, timeout: Optional[float] = None):
+        """Obter conexão respeitando o limite lógico e medindo a espera
+
+        Sem timeout vale settings.acquire_timeout; esgotado, levanta asyncio.TimeoutError.
+        """
+        if timeout is None:
+            timeout = self.settings.acquire_timeout
+        metrics = self.metrics
+        started = time.perf_counter()
+        metrics.waiting += 1
+        if metrics.waiting > metrics.peak_waiting:
+            metrics.peak_waiting = metrics.waiting
+
+        try:
+            # No modo adaptativo a vaga é reservada antes (limite < max_size,
+            # então o acquire do asyncpg não espera); o timeout vale para as duas esperas
+            if self.settings.adaptive:
+                async with self._condition:
+                    try:
+                        await asyncio.wait_for(
+                            self._condition.wait_for(lambda: metrics.in_use < self.limit), timeout
+                        )
+                    except asyncio.TimeoutError:
+                        metrics.errors += 1
+                        raise
+                    metrics.in_use += 1
+                if timeout is not None:
+                    timeout = max(0.0, timeout - (time.perf_counter() - started))
+
+            try:
+                connection = await self.pool.acquire(timeout=timeout)
+            except BaseException:
+                metrics.errors += 1
+                if self.settings.adaptive:
+                    await self._release_slot()
+                raise
+
+            if not self.settings.adaptive:
+                metrics.in_use += 1
+        finally:
+            metrics.waiting -= 1
+
+        wait = time.perf_counter() - started
+        metrics.record_wait(wait)
+        tracer.record('db.acquire', wait, **{'db.pool': self.name})
+        if metrics.in_use > metrics.peak_in_use:
+            metrics.peak_in_use = metrics.in_use
+        self._observe(wait)
+
+        try:
+            yield connection
+        finally:
+            await self.pool.release(connection)
+            await self._release_slot()
+
+    async def _release_slot(self):
+        self.metrics.in_use -= 1
+        if self.settings.adaptive:
+            async with self._condition:
+                self._condition.notify()
+
+    def _observe(self, wait: float):
+        """Acumular a janela de medição e ajustar o limite periodicamente"""
+        self._window_acquires += 1
+        self._window_wait += wait
+        if self.metrics.in_use > self._window_peak:
+            self._window_peak = self.metrics.in_use
+
+        now = time.monotonic()
+        if not self.settings.adaptive or now - self._window_started < self.settings.adjust_interval:
+            return
+
+        average_ms = self._window_wait / self._window_acquires * 1000
+        previous = self.limit
+        if average_ms > self.settings.target_wait_ms and self.limit < self.settings.max_size:
+            # Crescer ~25% de uma vez para absorver rajadas
+            self.limit = min(self.settings.max_size, self.limit + max(1, self.limit // 4))
+        elif (average_ms < self.settings.target_wait_ms / 4
+              and self._window_peak < self.limit - 1
+              and self.limit > self.settings.min_size):
+            self.limit -= 1
+
+        if self.limit != previous:
+            self.metrics.resizes += 1
+            logger.info(f"🔧 Pool {self.name}: limite {previous} → {self.limit} (espera média {average_ms:.1f}ms)")
+            if self.limit > previous:
+                asyncio.ensure_future(self._wake_waiters())
+
+        self._window_started = now
+        self._window_acquires = 0
+        self._window_wait = 0.0
+        self._window_peak = self.metrics.in_use
+
+    async def _wake_waiters(self):
+        async with self._condition:
+            self._condition.notify_all()
+
+    def record_timeout(self, query_class: str):
+        self.metrics.timeouts[query_class] = self.metrics.timeouts.get(query_class, 0) + 1
+
+    async def warm(self, size: Optional[int] = None):
+        """Abrir conexões em paralelo até `size` para evitar conexões frias na primeira rajada"""
+        size = min(size if size is not None else self.settings.warmup_size, self.limit)
+        if size <= 0:
+            return
+
+        async def ping():
+            async with self.acquire() as conn:
+                await conn.execute('SELECT 1')
+
+        await asyncio.gather(*(ping() for _ in range(size)))
+
+    def snapshot(self) -> Dict:
+        """Métricas atuais do pool (JSON-serializável)"""
+        metrics = self.metrics
+        average = metrics.total_wait / metrics.acquires if metrics.acquires else 0.0
+        return {
+            'name': self.name,
+            'adaptive': self.settings.adaptive,
+            'pooler_mode': self.settings.pooler_mode,
+            'limit': self.limit,
+            'min_size': self.settings.min_size,
+            'max_size': self.settings.max_size,
+            'open_connections': self.pool.get_size(),
+            'idle_connections': self.pool.get_idle_size(),
+            'in_use': metrics.in_use,
+            'peak_in_use': metrics.peak_in_use,
+            'waiting': metrics.waiting,
+            'peak_waiting': metrics.peak_waiting,
+            'saturation': round(metrics.in_use / self.limit, 3) if self.limit else 0.0,
+            'acquires': metrics.acquires,
+            'avg_wait_ms': round(average * 1000, 3),
+            'max_wait_ms': round(metrics.max_wait * 1000, 3),
+            'timeouts': dict(metrics.timeouts),
+            'errors': metrics.errors,
+            'resizes': metrics.resizes,
+        }
+
+    def get_size(self) -> int:
+        return self.pool.get_size()
+
+    async def close(self):
+        _pools.discard(self)
+        await self.pool.close()
+
+
+def pool_metrics() -> List[Dict]:
+    """Métricas de todos os pools ativos no processo"""
+    return [pool.snapshot() for pool in list(_pools)]
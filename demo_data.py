@@ -0,0 +1,350 @@
+"""
+Dados de Demonstração e Sintéticos
+Carga set-based (CTEs com INSERT ... RETURNING) do /demo e gerador de massas
+grandes de usuários/transações para testes de carga
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Dados do /demo -----------------------------------------------------------
+
+DEMO_ACCOUNTS = (
+    {'bank_name': 'Nubank', 'account_type': 'Conta Corrente', 'account_number': '****1234',
+     'balance': 2450.00, 'item_id': 'demo_nubank', 'account_id': 'demo_acc_1'},
+    {'bank_name': 'Banco Inter', 'account_type': 'Conta Corrente', 'account_number': '****5678',
+     'balance': 1800.00, 'item_id': 'demo_inter', 'account_id': 'demo_acc_2'},
+    {'bank_name': 'Itaú', 'account_type': 'Conta Poupança', 'account_number': '****9012',
+     'balance': 5200.00, 'item_id': 'demo_itau', 'account_id': 'demo_acc_3'},
+)
+
+DEMO_CARDS = (
+    {'bank_name': 'Nubank', 'card_name': 'Nubank Mastercard', 'last4': '1234', 'credit_limit': 3000.00,
+     'available_limit': 2850.00, 'current_balance': 150.00, 'due_date': 15, 'closing_date': 8,
+     'account_id': 'demo_nu_card'},
+    {'bank_name': 'Banco Inter', 'card_name': 'Inter Gold Visa', 'last4': '5678', 'credit_limit': 5000.00,
+     'available_limit': 4200.00, 'current_balance': 800.00, 'due_date': 10, 'closing_date': 3,
+     'account_id': 'demo_inter_card'},
+)
+
+DEMO_CATEGORIES = (
+    {'name': 'Alimentação', 'type': 'expense', 'icon': '🍽️'},
+    {'name': 'Transporte', 'type': 'expense', 'icon': '🚗'},
+    {'name': 'Lazer', 'type': 'expense', 'icon': '🎮'},
+    {'name': 'Salário', 'type': 'income', 'icon': '💰'},
+    {'name': 'Freelance', 'type': 'income', 'icon': '💻'},
+)
+
+DEMO_GOAL = {
+    'title': 'Reserva de Emergência - Demo',
+    'description': 'Meta de exemplo: construir reserva de emergência equivalente a 6 meses de gastos',
+    'goal_type': 'emergency_fund',
+    'target_amount': 10000.00,
+    'current_amount': 3200.00,
+    'target_date': date(2025, 12, 31),
+    'priority': 1,
+}
+
+DEMO_TRANSACTIONS = (
+    {'title': 'Supermercado', 'description': 'Compras semanais', 'amount': 125.50,
+     'type': 'expense', 'category': 'Alimentação', 'transaction_date': date(2025, 11, 3)},
+    {'title': 'Uber', 'description': 'Corrida para trabalho', 'amount': 25.00,
+     'type': 'expense', 'category': 'Transporte', 'transaction_date': date(2025, 11, 2)},
+    {'title': 'Salário Novembro', 'description': 'Pagamento mensal', 'amount': 4500.00,
+     'type': 'income', 'category': 'Salário', 'transaction_date': date(2025, 11, 1)},
+    {'title': 'Restaurante', 'description': 'Almoço executivo', 'amount': 45.00,
+     'type': 'expense', 'category': 'Alimentação', 'transaction_date': date(2025, 10, 30)},
+    {'title': 'Combustível', 'description': 'Abastecimento', 'amount': 180.00,
+     'type': 'expense', 'category': 'Transporte', 'transaction_date': date(2025, 10, 28)},
+)
+
+# Remove apenas dados marcados como demo
+CLEAR_DEMO_SQL = """
+    WITH accounts AS (
+        DELETE FROM bank_accounts WHERE user_id = $1 AND pluggy_item_id LIKE 'demo_%' RETURNING 1
+    ), cards AS (
+        DELETE FROM credit_cards WHERE user_id = $1 AND pluggy_account_id LIKE 'demo_%' RETURNING 1
+    ), goals AS (
+        DELETE FROM goals WHERE user_id = $1 AND title LIKE '%Demo%' RETURNING 1
+    ), transactions AS (
+        DELETE FROM transactions WHERE user_id = $1 AND notes LIKE '%DEMO%' RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM accounts) + (SELECT count(*) FROM cards)
+         + (SELECT count(*) FROM goals) + (SELECT count(*) FROM transactions) AS removed
+"""
+
+# Contas, cartões, categorias, meta e transações em um único statement
+SEED_DEMO_SQL = """
+    WITH accounts AS (
+        INSERT INTO bank_accounts (
+            user_id, bank_name, account_type, account_number, balance,
+            currency_code, is_active, pluggy_item_id, pluggy_account_id, last_sync
+        )
+        SELECT $1, a.bank_name, a.account_type, a.account_number, a.balance,
+               'BRL', true, a.item_id, a.account_id, CURRENT_TIMESTAMP
+        FROM jsonb_to_recordset($2::jsonb) AS a(
+            bank_name text, account_type text, account_number text,
+            balance numeric, item_id text, account_id text)
+        RETURNING id
+    ), cards AS (
+        INSERT INTO credit_cards (
+            user_id, bank_name, card_name, card_number_last4, credit_limit, available_limit,
+            current_balance, due_date, closing_date, is_active, pluggy_account_id, last_sync
+        )
+        SELECT $1, c.bank_name, c.card_name, c.last4, c.credit_limit, c.available_limit,
+               c.current_balance, c.due_date, c.closing_date, true, c.account_id, CURRENT_TIMESTAMP
+        FROM jsonb_to_recordset($3::jsonb) AS c(
+            bank_name text, card_name text, last4 text, credit_limit numeric, available_limit numeric,
+            current_balance numeric, due_date integer, closing_date integer, account_id text)
+        RETURNING id
+    ), wanted AS (
+        SELECT * FROM jsonb_to_recordset($4::jsonb) AS w(name text, type text, icon text)
+    ), new_categories AS (
+        INSERT INTO categories (user_id, name, type, icon, is_active)
+        SELECT $1, w.name, w.type, w.icon, true FROM wanted w
+        ON CONFLICT (user_id, name, type) DO NOTHING
+        RETURNING id, name
+    ), user_categories AS (
+        -- Categorias novas não são visíveis no snapshot do statement: unir com as existentes
+        SELECT id, name FROM new_categories
+        UNION ALL
+        SELECT c.id, c.name FROM categories c
+        JOIN wanted w ON w.name = c.name AND w.type = c.type
+        WHERE c.user_id = $1
+    ), goal AS (
+        INSERT INTO goals (
+            user_id, title, description, goal_type, target_amount,
+            current_amount, target_date, priority, is_active
+        )
+        SELECT $1, g.title, g.description, g.goal_type, g.target_amount,
+               g.current_amount, g.target_date, g.priority, true
+        FROM jsonb_to_record($5::jsonb) AS g(
+            title text, description text, goal_type text, target_amount numeric,
+            current_amount numeric, target_date date, priority integer)
+        RETURNING id
+    ), demo_transactions AS (
+        INSERT INTO transactions (
+            user_id, title, description, amount, type, category_id,
+            transaction_date, status, notes
+        )
+        SELECT $1, t.title, t.description, t.amount, t.type,
+               (SELECT uc.id FROM user_categories uc WHERE uc.name = t.category LIMIT 1),
+               t.transaction_date, 'paid', 'DEMO - Dados de exemplo'
+        FROM jsonb_to_recordset($6::jsonb) AS t(
+            title text, description text, amount numeric, type text,
+            category text, transaction_date date)
+        RETURNING id
+    )
+    SELECT (SELECT count(*) FROM accounts) AS accounts,
+           (SELECT count(*) FROM cards) AS cards,
+           (SELECT count(*) FROM new_categories) AS categories,
+           (SELECT count(*) FROM goal) AS goals,
+           (SELECT count(*) FROM demo_transactions) AS transactions
+"""
+
+# Massa sintética ------------------------------------------------------------
+
+# Categorias com os mesmos nomes criados pelos fluxos /receitas e /gastos; key é a
+# chave do tipo (revenue_types / expense_types), gravada em tags[1] como nos fluxos
+SYNTHETIC_CATEGORIES = (
+    {'name': '💰 Salário', 'type': 'income', 'icon': '💰', 'key': 'salary'},
+    {'name': '💻 Freelance', 'type': 'income', 'icon': '💻', 'key': 'freelance'},
+    {'name': '🍽️ Alimentação', 'type': 'expense', 'icon': '🍽️', 'key': 'food'},
+    {'name': '🚗 Transporte', 'type': 'expense', 'icon': '🚗', 'key': 'transport'},
+    {'name': '🛒 Compras Pessoais', 'type': 'expense', 'icon': '🛒', 'key': 'shopping'},
+    {'name': '🏥 Saúde', 'type': 'expense', 'icon': '🏥', 'key': 'health'},
+    {'name': '📚 Educação', 'type': 'expense', 'icon': '📚', 'key': 'education'},
+    {'name': '🏠 Contas Fixas', 'type': 'expense', 'icon': '🏠', 'key': 'bills'},
+    {'name': '🎮 Lazer', 'type': 'expense', 'icon': '🎮', 'key': 'entertainment'},
+)
+
+SYNTHETIC_EXPENSE_ACCOUNTS = ('c6_pf', 'nubank_pf', 'santander_pf', 'nubank_pj')
+SYNTHETIC_NOTE = 'SYNTH - Dados sintéticos'
+
+SYNTHETIC_USERS_SQL = """
+    INSERT INTO users (telegram_id, telegram_username, full_name, first_name)
+    SELECT $1::bigint + n, 'synth_' || n, 'Usuário Sintético ' || n, 'Sintético'
+    FROM generate_series($2::int, $3::int) AS n
+    ON CONFLICT (telegram_id) DO UPDATE SET updated_at = CURRENT_TIMESTAMP
+    RETURNING id
+"""
+
+SYNTHETIC_CATEGORIES_SQL = """
+    INSERT INTO categories (user_id, name, type, icon, is_active)
+    SELECT u.id, c.name, c.type, c.icon, true
+    FROM unnest($1::int[]) AS u(id)
+    CROSS JOIN jsonb_to_recordset($2::jsonb) AS c(name text, type text, icon text)
+    ON CONFLICT (user_id, name, type) DO NOTHING
+"""
+
+# Pseudo-aleatório determinístico: hash de (semente, usuário, sequência)
+SYNTHETIC_REVENUES_SQL = """
+    INSERT INTO transactions (
+        user_id, title, description, amount, type, category_id,
+        transaction_date, status, notes, tags, account_key
+    )
+    SELECT g.user_id, 'Salário', 'Receita: Salário mensal',
+           round(2500 + (g.h % 750000) / 100.0, 2), 'income', c.id,
+           (date_trunc('month', CURRENT_DATE) - make_interval(months => g.m))::date + 4,
+           'paid', $4, ARRAY['salary', 'inter_pf'], 'inter_pf'
+    FROM (
+        SELECT u.id AS user_id, m, abs(hashtext($3 || ':rv:' || u.id || ':' || m)::bigint) AS h
+        FROM unnest($1::int[]) AS u(id), generate_series(0, $2::int - 1) AS m
+    ) g
+    JOIN categories c ON c.user_id = g.user_id AND c.name = '💰 Salário' AND c.type = 'income'
+"""
+
+SYNTHETIC_EXPENSES_SQL = """
+    INSERT INTO transactions (
+        user_id, title, description, amount, type, category_id,
+        transaction_date, status, notes, tags, account_key
+    )
+    SELECT g.user_id, c.name, 'Despesa sintética', -round(5 + (g.h % 40000) / 100.0, 2),
+           'expense', c.id, CURRENT_DATE - (g.h % $3::int)::int, 'paid', $7,
+           ARRAY[g.type_key, g.account_key], g.account_key
+    FROM (
+        SELECT u.id AS user_id, n, h,
+               ($5::text[])[1 + h % cardinality($5::text[])] AS category,
+               ($8::text[])[1 + h % cardinality($5::text[])] AS type_key,
+               ($6::text[])[1 + (h / 7) % cardinality($6::text[])] AS account_key
+        FROM unnest($1::int[]) AS u(id), generate_series(1, $2::int) AS n,
+             LATERAL (SELECT abs(hashtext($4 || ':xp:' || u.id || ':' || n)::bigint) AS h) AS r
+    ) g
+    JOIN categories c ON c.user_id = g.user_id AND c.name = g.category AND c.type = 'expense'
+"""
+
+SYNTHETIC_INSTALLMENTS_SQL = """
+    INSERT INTO transactions (
+        user_id, title, description, amount, type, category_id, transaction_date, status,
+        notes, tags, account_key, is_installment, installment_number, total_installments
+    )
+    SELECT p.user_id, 'Compra parcelada (' || i || '/' || p.total || ')',
+           'Parcela ' || i || ' de ' || p.total, -round(p.total_value / p.total, 2), 'expense', c.id,
+           (p.start_date + make_interval(months => i - 1))::date,
+           CASE WHEN (p.start_date + make_interval(months => i - 1))::date <= CURRENT_DATE
+                THEN 'paid' ELSE 'pending' END,
+           $5, ARRAY['shopping', 'nubank_pf', 'installment'], 'nubank_pf', true, i, p.total
+    FROM (
+        SELECT u.id AS user_id, plan, (2 + h % 11)::int AS total, 300 + (h % 500000) / 100.0 AS total_value,
+               CURRENT_DATE - (h % $3::int)::int AS start_date
+        FROM unnest($1::int[]) AS u(id), generate_series(1, $2::int) AS plan,
+             LATERAL (SELECT abs(hashtext($4 || ':pl:' || u.id || ':' || plan)::bigint) AS h) AS r
+    ) p
+    CROSS JOIN LATERAL generate_series(1, p.total) AS i
+    JOIN categories c ON c.user_id = p.user_id AND c.name = '🛒 Compras Pessoais' AND c.type = 'expense'
+"""
+
+
+def _json(value) -> str:
+    return json.dumps(value, default=str)
+
+
+@dataclass(frozen=True)
+class SyntheticProfile:
+    """Tamanho da massa sintética"""
+    users: int = 100
+    months: int = 12
+    expenses_per_month: int = 30
+    installment_plans: int = 3
+    telegram_id_base: int = 8_000_000_000
+    seed: str = 'bot-ia-financeiro'
+    chunk_users: int = 250
+
+
+class DemoDataLoader:
+    """Carga de dados demo e sintéticos direto no pool do bot"""
+
+    def __init__(self, bot_instance):
+        self.bot = bot_instance
+
+    async def clear_demo(self, user_id: int) -> int:
+        """Remover os dados demo do usuário (um statement)"""
+        async with self.bot.db_pool.acquire() as conn:
+            return await conn.fetchval(CLEAR_DEMO_SQL, user_id)
+
+    async def seed_demo(self, user_id: int) -> Dict[str, int]:
+        """Recriar os dados do /demo em uma transação (limpeza + carga)"""
+        async with self.bot.db_pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(CLEAR_DEMO_SQL, user_id)
+                counts = await conn.fetchrow(
+                    SEED_DEMO_SQL, user_id, _json(DEMO_ACCOUNTS), _json(DEMO_CARDS),
+                    _json(DEMO_CATEGORIES), _json(DEMO_GOAL), _json(DEMO_TRANSACTIONS)
+                )
+        self.bot.recent_writes.mark(user_id)
+        return dict(counts)
+
+    async def generate(self, profile: SyntheticProfile = SyntheticProfile()) -> Dict[str, float]:
+        """Gerar usuários, categorias, salários, despesas e parcelamentos sintéticos
+
+        Cada bloco de chunk_users usuários é gravado em uma transação com
+        statements set-based; a massa é reprodutível pela semente.
+        """
+        days = max(profile.months * 30, 1)
+        expense_names = [c['name'] for c in SYNTHETIC_CATEGORIES if c['type'] == 'expense']
+        expense_keys = [c['key'] for c in SYNTHETIC_CATEGORIES if c['type'] == 'expense']
+        totals = {'users': 0, 'revenues': 0, 'expenses': 0, 'installments': 0}
+        timeout = self.bot.db_pool.timeout_for('batch')
+        started = time.perf_counter()
+
+        for first in range(1, profile.users + 1, profile.chunk_users):
+            last = min(first + profile.chunk_users - 1, profile.users)
+            async with self.bot.db_pool.acquire() as conn:
+                async with conn.transaction():
+                    rows = await conn.fetch(SYNTHETIC_USERS_SQL, profile.telegram_id_base, first, last)
+                    user_ids = [row['id'] for row in rows]
+                    await conn.execute(SYNTHETIC_CATEGORIES_SQL, user_ids, _json(SYNTHETIC_CATEGORIES))
+                    revenues = await conn.execute(
+                        SYNTHETIC_REVENUES_SQL, user_ids, profile.months, profile.seed, SYNTHETIC_NOTE,
+                        timeout=timeout
+                    )
+                    expenses = await conn.execute(
+                        SYNTHETIC_EXPENSES_SQL, user_ids, profile.months * profile.expenses_per_month,
+                        days, profile.seed, expense_names, list(SYNTHETIC_EXPENSE_ACCOUNTS), SYNTHETIC_NOTE,
+                        expense_keys, timeout=timeout
+                    )
+                    installments = await conn.execute(
+                        SYNTHETIC_INSTALLMENTS_SQL, user_ids, profile.installment_plans, days,
+                        profile.seed, SYNTHETIC_NOTE, timeout=timeout
+                    )
+
+            totals['users'] += len(user_ids)
+            totals['revenues'] += int(revenues.split()[-1])
+            totals['expenses'] += int(expenses.split()[-1])
+            totals['installments'] += int(installments.split()[-1])
+            logger.info(f"Massa sintética: {last}/{profile.users} usuários")
+
+        totals['seconds'] = round(time.perf_counter() - started, 3)
+        return totals
+
+    async def synthetic_user_ids(self, profile: SyntheticProfile = SyntheticProfile()) -> List[Dict]:
+        """Usuários sintéticos existentes (id interno e telegram_id)"""
+        async with self.bot.db_pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT id, telegram_id FROM users WHERE telegram_id > $1::bigint AND telegram_id <= $1::bigint + $2 "
+                "ORDER BY telegram_id",
+                profile.telegram_id_base, profile.users
+            )
+        return [dict(row) for row in rows]
+
+    async def drop_synthetic(self, profile: SyntheticProfile = SyntheticProfile()) -> int:
+        """Remover os usuários sintéticos (transações e categorias saem em cascata)"""
+        timeout = self.bot.db_pool.timeout_for('batch')
+        async with self.bot.db_pool.acquire() as conn:
+            async with conn.transaction():
+                # Transações primeiro: category_id não tem ON DELETE CASCADE
+                await conn.execute(
+                    "DELETE FROM transactions t USING users u WHERE t.user_id = u.id "
+                    "AND u.telegram_id > $1::bigint AND u.telegram_id <= $1::bigint + $2",
+                    profile.telegram_id_base, profile.users, timeout=timeout
+                )
+                result = await conn.execute(
+                    "DELETE FROM users WHERE telegram_id > $1::bigint AND telegram_id <= $1::bigint + $2",
+                    profile.telegram_id_base, profile.users, timeout=timeout
+                )
+        return int(result.split()[-1])
@@ -4,11 +4,18 @@ Interface estruturada para cadastro de despesas
 """
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime, date, timedelta
 import logging
 import calendar
 
+from message_templates import MessageTemplate
+from br_parsing import parse_date, parse_money
+from account_manager import account_manager, ACCOUNT_ROUTE, ACCOUNT_SEPARATOR_CALLBACK
+from callback_router import encode_callback, decode_callback
+from idempotency import idempotency_key, new_flow_id
+from transaction_ingestor import transaction_record
+
 logger = logging.getLogger(__name__)
 
 # Estados da conversa
@@ -22,6 +29,64 @@ WAITING_INSTALLMENT_COUNT = 'waiting_installment_count'
 WAITING_INSTALLMENT_START = 'waiting_installment_start'
 WAITING_EXPENSE_CONFIRMATION = 'waiting_expense_confirmation'
 
+# callback_data compacto do fluxo de despesas (xp:<ação>[:<valor>])
+EXPENSE_ROUTE = 'xp'
+CANCEL_EXPENSE = encode_callback(EXPENSE_ROUTE, 'x')
+CONFIRM_EXPENSE = encode_callback(EXPENSE_ROUTE, 'ok')
+EDIT_EXPENSE = encode_callback(EXPENSE_ROUTE, 'ed')
+PAY_ONCE = encode_callback(EXPENSE_ROUTE, 'i1')
+PAY_INSTALLMENTS = encode_callback(EXPENSE_ROUTE, 'in')
+CUSTOM_INSTALLMENTS = encode_callback(EXPENSE_ROUTE, 'nc')
+CUSTOM_START_DATE = encode_callback(EXPENSE_ROUTE, 'sc')
+
+# Templates das respostas que exibem texto digitado pelo usuário
+DESCRIPTION_SAVED = MessageTemplate("""✅ **Descrição salva:** {description}
+
+💵 **Agora digite o valor da despesa:**
+
+💡 **Formatos aceitos:**
+• 150 ou 150,00
+• 1.350,50 (com pontos e vírgulas)
+• 2500.00 (formato americano)
+
+**Qual o valor desta despesa?**""")
+
+EXPENSE_CONFIRMATION = MessageTemplate("""📋 **Confirme os dados da despesa:**
+
+**Categoria:** {type_name}
+**Descrição:** {description}
+**Valor total:** R$ {value:,.2f}
+**Data:** {expense_date:%d/%m/%Y}
+**Conta:** {account_color} {account_name}
+{payment_text!r}
+
+**Tudo correto?**""")
+
+INSTALLMENT_PAYMENT = MessageTemplate("""**Parcelamento:** {installments}x R$ {installment_value:.2f}
+**Primeira parcela:** {start_date:%d/%m/%Y}
+**Última parcela:** {last_date:%d/%m/%Y}""")
+
+EXPENSE_SAVED = MessageTemplate("""✅ **Despesa cadastrada com sucesso!**
+
+💳 **{description}**
+💵 **R$ {value:,.2f}**
+📅 **{expense_date:%d/%m/%Y}**{commands!r}""")
+
+INSTALLMENT_EXPENSE_SAVED = MessageTemplate("""✅ **Despesa parcelada cadastrada!**
+
+💳 **{description}**
+💵 **{installments}x R$ {installment_value:.2f} = R$ {value:,.2f}**
+📅 **Primeira parcela: {installment_start_date:%d/%m/%Y}**
+
+**Todas as {installments} parcelas foram agendadas automaticamente!**{commands!r}""")
+
+EXPENSE_COMMANDS_TEXT = """
+
+**Comandos úteis:**
+• /saldo - Ver saldos atualizados
+• /gastos - Adicionar nova despesa
+• /resumo - Dashboard financeiro"""
+
 class ExpenseManager:
     """Gerenciador de despesas com UX guiada e parcelamento"""
     
@@ -91,6 +156,16 @@ class ExpenseManager:
                 'allow_installments': True
             }
         }
+        
+        # Teclados de seleção de conta por tipo (montados uma única vez)
+        self.account_keyboards = {
+            key: account_manager.get_expense_keyboard(tuple(expense_type['common_accounts']), CANCEL_EXPENSE)
+            for key, expense_type in self.expense_types.items()
+        }
+        
+        # Categorizador aprende só tipos conhecidos
+        if bot_instance is not None:
+            bot_instance.categorizer.register_types('expense', self.expense_types)
     
     async def start_add_expense(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Iniciar processo de adição de despesa"""
@@ -99,6 +174,7 @@ class ExpenseManager:
         # Limpar dados anteriores
         context.user_data.clear()
         context.user_data['user_id'] = user['id']
+        context.user_data['flow_id'] = new_flow_id()
         
         text = """💳 **Adicionar Nova Despesa**
 
@@ -114,7 +190,7 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         for key, expense_type in self.expense_types.items():
             row.append(InlineKeyboardButton(
                 expense_type['name'],
-                callback_data=f"expense_type_{key}"
+                callback_data=encode_callback(EXPENSE_ROUTE, 't', key)
             ))
             if len(row) == 2:
                 keyboard.append(row)
@@ -123,7 +199,7 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         if row:  # Adicionar linha incompleta
             keyboard.append(row)
         
-        keyboard.append([InlineKeyboardButton("❌ Cancelar", callback_data="cancel_expense")])
+        keyboard.append([InlineKeyboardButton("❌ Cancelar", callback_data=CANCEL_EXPENSE)])
         reply_markup = InlineKeyboardMarkup(keyboard)
         
         await update.message.reply_text(text, parse_mode='Markdown', reply_markup=reply_markup)
@@ -134,11 +210,12 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         query = update.callback_query
         await query.answer()
         
-        if query.data == "cancel_expense":
+        if query.data == CANCEL_EXPENSE:
             await query.edit_message_text("❌ Cadastro de despesa cancelado.")
             return ConversationHandler.END
         
-        expense_type_key = query.data.replace("expense_type_", "")
+        route, args = decode_callback(query.data)
+        expense_type_key = args[-1] if route == EXPENSE_ROUTE and args else None
         expense_type = self.expense_types.get(expense_type_key)
         
         if not expense_type:
@@ -183,16 +260,7 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         
         context.user_data['description'] = description
         
-        text = f"""✅ **Descrição salva:** {description}
-
-💵 **Agora digite o valor da despesa:**
-
-💡 **Formatos aceitos:**
-• 150 ou 150,00
-• 1.350,50 (com pontos e vírgulas)
-• 2500.00 (formato americano)
-
-**Qual o valor desta despesa?**"""
+        text = DESCRIPTION_SAVED.render(description=description)
         
         await update.message.reply_text(text, parse_mode='Markdown')
         return WAITING_EXPENSE_VALUE
@@ -202,10 +270,8 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         value_text = update.message.text.strip()
         
         try:
-            # Limpar e converter valor
-            value_clean = value_text.replace('R$', '').replace(' ', '')
-            value_clean = value_clean.replace('.', '').replace(',', '.')
-            value = float(value_clean)
+            # Decimal exato (centavos), aceita formatos BR e americano
+            value = parse_money(value_text)
             
             if value <= 0:
                 raise ValueError("Valor deve ser positivo")
@@ -231,6 +297,7 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
 • 15/12 (assumirá ano atual)
 • hoje (data de hoje)
 • ontem (data de ontem)
+• dia 5, há 3 dias, semana passada
 
 **Qual a data desta despesa?**"""
         
@@ -242,23 +309,7 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         date_text = update.message.text.strip().lower()
         
         try:
-            if date_text == "hoje":
-                expense_date = date.today()
-            elif date_text == "ontem":
-                expense_date = date.today() - timedelta(days=1)
-            elif "/" in date_text:
-                parts = date_text.split("/")
-                if len(parts) == 2:  # dd/mm
-                    day, month = int(parts[0]), int(parts[1])
-                    year = date.today().year
-                elif len(parts) == 3:  # dd/mm/yyyy
-                    day, month, year = int(parts[0]), int(parts[1]), int(parts[2])
-                else:
-                    raise ValueError("Formato inválido")
-                
-                expense_date = date(year, month, day)
-            else:
-                raise ValueError("Formato não reconhecido")
+            expense_date = parse_date(date_text)
                 
         except (ValueError, TypeError):
             await update.message.reply_text(
@@ -267,7 +318,8 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
                 "• 15/12/2025\n"
                 "• 15/12 (ano atual)\n"
                 "• hoje\n"
-                "• ontem\n\n"
+                "• ontem\n"
+                "• dia 5, há 3 dias, semana passada\n\n"
                 "**Digite novamente a data:**"
             )
             return WAITING_EXPENSE_DATE
@@ -275,48 +327,16 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         context.user_data['expense_date'] = expense_date
         
         # Prosseguir para seleção de conta baseada no tipo de despesa
-        from account_manager import account_manager
         expense_type_info = context.user_data['expense_type_info']
         
-        # Filtrar contas sugeridas
-        all_expense_accounts = account_manager.get_expense_accounts()
-        suggested_accounts = []
-        other_accounts = []
-        
-        for account in all_expense_accounts:
-            if account['key'] in expense_type_info['common_accounts']:
-                suggested_accounts.append(account)
-            else:
-                other_accounts.append(account)
-        
         text = f"""✅ **Data salva:** {expense_date.strftime('%d/%m/%Y')}
 
 🏦 **Escolha a conta que será debitada:**
 
 **💡 Contas sugeridas para {expense_type_info['name']}:**"""
         
-        keyboard = []
-        
-        # Contas sugeridas primeiro
-        for account in suggested_accounts:
-            keyboard.append([InlineKeyboardButton(
-                f"⭐ {account['color']} {account['name']}",
-                callback_data=f"select_account_{account['key']}"
-            )])
-        
-        # Separador
-        if suggested_accounts and other_accounts:
-            keyboard.append([InlineKeyboardButton("➖ Outras contas ➖", callback_data="separator")])
-        
-        # Outras contas
-        for account in other_accounts:
-            keyboard.append([InlineKeyboardButton(
-                f"{account['color']} {account['name']}",
-                callback_data=f"select_account_{account['key']}"
-            )])
-        
-        keyboard.append([InlineKeyboardButton("❌ Cancelar", callback_data="cancel_expense")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        # Teclado pronto com as contas sugeridas do tipo primeiro
+        reply_markup = self.account_keyboards[context.user_data['expense_type']]
         
         await update.message.reply_text(text, parse_mode='Markdown', reply_markup=reply_markup)
         return WAITING_EXPENSE_ACCOUNT
@@ -326,15 +346,15 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         query = update.callback_query
         await query.answer()
         
-        if query.data == "cancel_expense":
+        if query.data == CANCEL_EXPENSE:
             await query.edit_message_text("❌ Cadastro de despesa cancelado.")
             return ConversationHandler.END
-        elif query.data == "separator":
+        elif query.data == ACCOUNT_SEPARATOR_CALLBACK:
             await query.answer("Selecione uma conta válida")
             return WAITING_EXPENSE_ACCOUNT
         
-        account_key = query.data.replace("select_account_", "")
-        from account_manager import account_manager
+        route, args = decode_callback(query.data)
+        account_key = args[0] if route == ACCOUNT_ROUTE and args else None
         account = account_manager.get_account_by_key(account_key)
         
         if not account:
@@ -348,7 +368,7 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         expense_type_info = context.user_data['expense_type_info']
         
         if expense_type_info['allow_installments'] and context.user_data['value'] >= 100:
-            text = f"""✅ **Conta selecionada:** {account['color']} {account['name']}
+            text = f"""✅ **Conta selecionada:** {account.color} {account.name}
 
 💳 **Esta despesa pode ser parcelada!**
 
@@ -357,9 +377,9 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
 **Escolha uma opção:**"""
             
             keyboard = [
-                [InlineKeyboardButton("💰 À vista", callback_data="install_once")],
-                [InlineKeyboardButton("💳 Parcelar", callback_data="install_multiple")],
-                [InlineKeyboardButton("❌ Cancelar", callback_data="cancel_expense")]
+                [InlineKeyboardButton("💰 À vista", callback_data=PAY_ONCE)],
+                [InlineKeyboardButton("💳 Parcelar", callback_data=PAY_INSTALLMENTS)],
+                [InlineKeyboardButton("❌ Cancelar", callback_data=CANCEL_EXPENSE)]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
@@ -376,14 +396,14 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         query = update.callback_query
         await query.answer()
         
-        if query.data == "cancel_expense":
+        if query.data == CANCEL_EXPENSE:
             await query.edit_message_text("❌ Cadastro de despesa cancelado.")
             return ConversationHandler.END
-        elif query.data == "install_once":
+        elif query.data == PAY_ONCE:
             context.user_data['installments'] = 1
             context.user_data['installment_value'] = context.user_data['value']
             return await self.show_confirmation(query, context)
-        elif query.data == "install_multiple":
+        elif query.data == PAY_INSTALLMENTS:
             # Mostrar opções de parcelamento
             total_value = context.user_data['value']
             
@@ -405,7 +425,7 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
                 if installment_value >= 10:  # Parcela mínima de R$ 10
                     row.append(InlineKeyboardButton(
                         f"{installments}x R$ {installment_value:.2f}",
-                        callback_data=f"install_{installments}"
+                        callback_data=encode_callback(EXPENSE_ROUTE, 'n', installments)
                     ))
                     if len(row) == 2:
                         keyboard.append(row)
@@ -414,8 +434,8 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
             if row:
                 keyboard.append(row)
             
-            keyboard.append([InlineKeyboardButton("✏️ Outro valor", callback_data="install_custom")])
-            keyboard.append([InlineKeyboardButton("❌ Cancelar", callback_data="cancel_expense")])
+            keyboard.append([InlineKeyboardButton("✏️ Outro valor", callback_data=CUSTOM_INSTALLMENTS)])
+            keyboard.append([InlineKeyboardButton("❌ Cancelar", callback_data=CANCEL_EXPENSE)])
             reply_markup = InlineKeyboardMarkup(keyboard)
             
             await query.edit_message_text(text, parse_mode='Markdown', reply_markup=reply_markup)
@@ -428,10 +448,10 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         query = update.callback_query
         await query.answer()
         
-        if query.data == "cancel_expense":
+        if query.data == CANCEL_EXPENSE:
             await query.edit_message_text("❌ Cadastro de despesa cancelado.")
             return ConversationHandler.END
-        elif query.data == "install_custom":
+        elif query.data == CUSTOM_INSTALLMENTS:
             text = """✏️ **Parcelas personalizadas**
 
 **Digite o número de parcelas desejado:**
@@ -444,8 +464,10 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
             await query.edit_message_text(text, parse_mode='Markdown')
             context.user_data['waiting_custom_installments'] = True
             return WAITING_INSTALLMENT_COUNT
-        elif query.data.startswith("install_"):
-            installments = int(query.data.replace("install_", ""))
+        
+        route, args = decode_callback(query.data)
+        if route == EXPENSE_ROUTE and len(args) == 2 and args[0] == 'n':
+            installments = int(args[1])
             context.user_data['installments'] = installments
             context.user_data['installment_value'] = context.user_data['value'] / installments
             
@@ -521,11 +543,11 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         for date_option, label in suggestions:
             keyboard.append([InlineKeyboardButton(
                 f"{label} ({date_option.strftime('%d/%m')})",
-                callback_data=f"start_{date_option.strftime('%Y-%m-%d')}"
+                callback_data=encode_callback(EXPENSE_ROUTE, 's', date_option.isoformat())
             )])
         
-        keyboard.append([InlineKeyboardButton("✏️ Outra data", callback_data="start_custom")])
-        keyboard.append([InlineKeyboardButton("❌ Cancelar", callback_data="cancel_expense")])
+        keyboard.append([InlineKeyboardButton("✏️ Outra data", callback_data=CUSTOM_START_DATE)])
+        keyboard.append([InlineKeyboardButton("❌ Cancelar", callback_data=CANCEL_EXPENSE)])
         reply_markup = InlineKeyboardMarkup(keyboard)
         
         await query.edit_message_text(text, parse_mode='Markdown', reply_markup=reply_markup)
@@ -559,10 +581,10 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         query = update.callback_query
         await query.answer()
         
-        if query.data == "cancel_expense":
+        if query.data == CANCEL_EXPENSE:
             await query.edit_message_text("❌ Cadastro de despesa cancelado.")
             return ConversationHandler.END
-        elif query.data == "start_custom":
+        elif query.data == CUSTOM_START_DATE:
             text = """📅 **Data personalizada**
 
 **Digite a data da primeira parcela:**
@@ -576,9 +598,10 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
             await query.edit_message_text(text, parse_mode='Markdown')
             context.user_data['waiting_custom_start_date'] = True
             return WAITING_INSTALLMENT_START
-        elif query.data.startswith("start_"):
-            date_str = query.data.replace("start_", "")
-            start_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        
+        route, args = decode_callback(query.data)
+        if route == EXPENSE_ROUTE and len(args) == 2 and args[0] == 's':
+            start_date = date.fromisoformat(args[1])
             context.user_data['installment_start_date'] = start_date
             
             return await self.show_confirmation(query, context)
@@ -593,28 +616,15 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         date_text = update.message.text.strip()
         
         try:
-            if "/" in date_text:
-                parts = date_text.split("/")
-                if len(parts) == 2:  # dd/mm
-                    day, month = int(parts[0]), int(parts[1])
-                    year = date.today().year
-                elif len(parts) == 3:  # dd/mm/yyyy
-                    day, month, year = int(parts[0]), int(parts[1]), int(parts[2])
-                else:
-                    raise ValueError("Formato inválido")
-                
-                start_date = date(year, month, day)
-                
-                # Verificar se não é muito no passado
-                if start_date < date.today() - timedelta(days=30):
-                    await update.message.reply_text(
-                        "❌ **Data muito antiga!**\n\n"
-                        "Escolha uma data mais recente."
-                    )
-                    return WAITING_INSTALLMENT_START
-                
-            else:
-                raise ValueError("Formato não reconhecido")
+            start_date = parse_date(date_text)
+            
+            # Verificar se não é muito no passado
+            if start_date < date.today() - timedelta(days=30):
+                await update.message.reply_text(
+                    "❌ **Data muito antiga!**\n\n"
+                    "Escolha uma data mais recente."
+                )
+                return WAITING_INSTALLMENT_START
             
             context.user_data['installment_start_date'] = start_date
             context.user_data['waiting_custom_start_date'] = False
@@ -632,7 +642,8 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
                 "❌ **Data inválida!**\n\n"
                 "Use o formato:\n"
                 "• 15/01/2025\n"
-                "• 15/01 (ano atual)\n\n"
+                "• 15/01 (ano atual)\n"
+                "• dia 5, próxima semana\n\n"
                 "**Digite novamente:**"
             )
             return WAITING_INSTALLMENT_START
@@ -643,34 +654,33 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         expense_type_info = data['expense_type_info']
         account = data['account']
         
-        # Texto básico
-        text = f"""📋 **Confirme os dados da despesa:**
-
-**Categoria:** {expense_type_info['name']}
-**Descrição:** {data['description']}
-**Valor total:** R$ {data['value']:,.2f}
-**Data:** {data['expense_date'].strftime('%d/%m/%Y')}
-**Conta:** {account['color']} {account['name']}"""
-        
         # Informações de parcelamento
         installments = data.get('installments', 1)
         if installments > 1:
-            installment_value = data['installment_value']
             start_date = data['installment_start_date']
-            
-            text += f"""
-**Parcelamento:** {installments}x R$ {installment_value:.2f}
-**Primeira parcela:** {start_date.strftime('%d/%m/%Y')}
-**Última parcela:** {self.calculate_last_installment(start_date, installments).strftime('%d/%m/%Y')}"""
+            payment_text = INSTALLMENT_PAYMENT.render(
+                installments=installments,
+                installment_value=data['installment_value'],
+                start_date=start_date,
+                last_date=self.calculate_last_installment(start_date, installments)
+            )
         else:
-            text += f"\n**Pagamento:** À vista"
-        
-        text += "\n\n**Tudo correto?**"
+            payment_text = "**Pagamento:** À vista"
+        
+        text = EXPENSE_CONFIRMATION.render(
+            type_name=expense_type_info['name'],
+            description=data['description'],
+            value=data['value'],
+            expense_date=data['expense_date'],
+            account_color=account.color,
+            account_name=account.name,
+            payment_text=payment_text
+        )
         
         keyboard = [
-            [InlineKeyboardButton("✅ Confirmar", callback_data="confirm_expense")],
-            [InlineKeyboardButton("✏️ Editar", callback_data="edit_expense")],
-            [InlineKeyboardButton("❌ Cancelar", callback_data="cancel_expense")]
+            [InlineKeyboardButton("✅ Confirmar", callback_data=CONFIRM_EXPENSE)],
+            [InlineKeyboardButton("✏️ Editar", callback_data=EDIT_EXPENSE)],
+            [InlineKeyboardButton("❌ Cancelar", callback_data=CANCEL_EXPENSE)]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
@@ -701,44 +711,23 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
         query = update.callback_query
         await query.answer()
         
-        if query.data == "cancel_expense":
+        if query.data == CANCEL_EXPENSE:
             await query.edit_message_text("❌ Cadastro de despesa cancelado.")
             return ConversationHandler.END
-        elif query.data == "edit_expense":
+        elif query.data == EDIT_EXPENSE:
             await query.edit_message_text(
                 "✏️ **Para editar, inicie novamente com /gastos**\n\n"
                 "Em breve teremos opção de edição durante o cadastro!"
             )
             return ConversationHandler.END
-        elif query.data == "confirm_expense":
+        elif query.data == CONFIRM_EXPENSE:
             # Salvar despesa(s) no banco
             success = await self.save_expense(context.user_data)
             
             if success:
                 data = context.user_data
-                installments = data.get('installments', 1)
-                
-                if installments > 1:
-                    text = f"""✅ **Despesa parcelada cadastrada!**
-
-💳 **{data['description']}**
-💵 **{installments}x R$ {data['installment_value']:.2f} = R$ {data['value']:,.2f}**
-📅 **Primeira parcela: {data['installment_start_date'].strftime('%d/%m/%Y')}**
-
-**Todas as {installments} parcelas foram agendadas automaticamente!**"""
-                else:
-                    text = f"""✅ **Despesa cadastrada com sucesso!**
-
-💳 **{data['description']}**
-💵 **R$ {data['value']:,.2f}**
-📅 **{data['expense_date'].strftime('%d/%m/%Y')}**"""
-                
-                text += f"""
-
-**Comandos úteis:**
-• /saldo - Ver saldos atualizados
-• /gastos - Adicionar nova despesa
-• /resumo - Dashboard financeiro"""
+                template = INSTALLMENT_EXPENSE_SAVED if data.get('installments', 1) > 1 else EXPENSE_SAVED
+                text = template.render_map({**data, 'commands': EXPENSE_COMMANDS_TEXT})
                 
                 await query.edit_message_text(text, parse_mode='Markdown')
             else:
@@ -762,99 +751,82 @@ Cada categoria tem contas sugeridas e opções de parcelamento específicas."""
             )
             
             installments = data.get('installments', 1)
+            data.setdefault('flow_id', new_flow_id())
             
             if installments == 1:
                 # Despesa única
-                return await self.save_single_expense(data, category)
+                results = [await self.save_single_expense(data, category)]
             else:
                 # Despesa parcelada
-                return await self.save_installment_expenses(data, category)
+                results = await self.save_installment_expenses(data, category)
+            
+            saved = all(results)
+            if saved:
+                # Confirmação repetida (duplicate) não reforça o mapeamento de novo
+                await self.bot.categorizer.learn_saved(
+                    results, data['user_id'], 'expense', data['description'], data['expense_type'], data['account_key']
+                )
+            return saved
                 
         except Exception as e:
             logger.error(f"Erro ao salvar despesa: {e}")
             return False
     
-    async def save_single_expense(self, data: Dict, category: Dict) -> bool:
-        """Salvar despesa única"""
-        query = """
-            INSERT INTO transactions (
-                user_id, title, description, amount, type, category_id,
-                transaction_date, status, notes, tags
-            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
-            RETURNING id
-        """
-        
-        transaction_data = (
-            data['user_id'],
-            data['description'],
-            f"Despesa: {data['expense_type_info']['description']}",
-            -abs(data['value']),  # Negativo para despesa
-            'expense',
-            category['id'] if category else None,
-            data['expense_date'],
-            'paid',
-            f"Conta: {data['account']['name']}",
-            [data['expense_type'], data['account_key']]
+    async def save_single_expense(self, data: Dict, category: Dict) -> Optional[Dict]:
+        """Salvar despesa única; retorna o resultado de save_transaction"""
+        record = transaction_record(
+            user_id=data['user_id'],
+            title=data['description'],
+            description=f"Despesa: {data['expense_type_info']['description']}",
+            amount=-abs(data['value']),  # Negativo para despesa
+            type='expense',
+            category_id=category['id'] if category else None,
+            transaction_date=data['expense_date'],
+            status='paid',
+            notes=f"Conta: {data['account'].name}",
+            tags=[data['expense_type'], data['account_key']],
+            account_key=data['account_key'],
+            idempotency_key=idempotency_key(data['user_id'], data['flow_id'])
         )
         
-        result = await self.bot.execute_query_one(query, transaction_data)
-        return result is not None
+        return await self.bot.save_transaction(record)
     
-    async def save_installment_expenses(self, data: Dict, category: Dict) -> bool:
-        """Salvar despesas parceladas"""
+    async def save_installment_expenses(self, data: Dict, category: Dict) -> List[Optional[Dict]]:
+        """Salvar despesas parceladas; retorna os resultados de save_transactions"""
         installments = data['installments']
         installment_value = data['installment_value']
         start_date = data['installment_start_date']
         
-        success_count = 0
+        records = []
         
         for i in range(installments):
             # Calcular data da parcela
             installment_date = self.calculate_installment_date(start_date, i)
             
-            # Determinar status baseado na data
-            today = date.today()
-            if installment_date <= today:
-                status = 'paid'
-            elif installment_date <= today + timedelta(days=7):
-                status = 'pending'
-            else:
-                status = 'scheduled'
-            
-            query = """
-                INSERT INTO transactions (
-                    user_id, title, description, amount, type, category_id,
-                    transaction_date, status, notes, tags, installment_info
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-                RETURNING id
-            """
-            
-            installment_info = {
-                'current_installment': i + 1,
-                'total_installments': installments,
-                'total_value': data['value']
-            }
-            
-            transaction_data = (
-                data['user_id'],
-                f"{data['description']} ({i+1}/{installments})",
-                f"Parcela {i+1} de {installments} - {data['expense_type_info']['description']}",
-                -abs(installment_value),  # Negativo para despesa
-                'expense',
-                category['id'] if category else None,
-                installment_date,
-                status,
-                f"Conta: {data['account']['name']}, Parcela {i+1}/{installments}",
-                [data['expense_type'], data['account_key'], 'installment'],
-                installment_info
-            )
-            
-            result = await self.bot.execute_query_one(query, transaction_data)
-            if result:
-                success_count += 1
+            # Parcelas futuras ficam pendentes (o CHECK de status não tem 'scheduled')
+            status = 'paid' if installment_date <= date.today() else 'pending'
+            
+            # Uma chave por parcela: repetir a confirmação só completa as que faltam
+            records.append(transaction_record(
+                user_id=data['user_id'],
+                title=f"{data['description']} ({i+1}/{installments})",
+                description=f"Parcela {i+1} de {installments} - {data['expense_type_info']['description']}",
+                amount=-abs(installment_value),  # Negativo para despesa
+                type='expense',
+                category_id=category['id'] if category else None,
+                transaction_date=installment_date,
+                status=status,
+                notes=f"Conta: {data['account'].name}, Parcela {i+1}/{installments}",
+                tags=[data['expense_type'], data['account_key'], 'installment'],
+                account_key=data['account_key'],
+                is_installment=True,
+                installment_number=i + 1,
+                total_installments=installments,
+                idempotency_key=idempotency_key(data['user_id'], data['flow_id'], i + 1)
+            ))
         
-        # Considerar sucesso se pelo menos 80% das parcelas foram salvas
-        return success_count >= (installments * 0.8)
+        # Um único INSERT: ou todas as parcelas são gravadas ou nenhuma
+        return await self.bot.save_transactions(records)
     
     def calculate_installment_date(self, start_date, installment_number):
         """Calcular data de uma parcela específica"""
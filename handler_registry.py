@@ -0,0 +1,480 @@
+"""
+Registro Declarativo de Handlers
+Comandos, conversas e callbacks do bot declarados uma única vez, com feature flags
+"""
+from dataclasses import dataclass
+from functools import cached_property, wraps
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+import logging
+import os
+import time
+
+from telegram import Update
+from telegram.ext import (Application, BaseHandler, CallbackQueryHandler, CommandHandler,
+                          ContextTypes, ConversationHandler, MessageHandler, TypeHandler, filters)
+from telegram.request import BaseRequest, HTTPXRequest
+
+from callback_router import callback_router, RouteStats
+from idempotency import update_deduplicator
+from loop_monitor import LoopMonitor
+from quick_entry import QUICK_ENTRY_PATTERN
+from tracing import TracedRequest, tracer, update_label
+
+logger = logging.getLogger(__name__)
+
+# Feature flags (todas ativas por padrão); desative com BOT_DISABLED_FEATURES=debug,legacy
+DEFAULT_FEATURES = MappingProxyType({
+    'core': True,       # /start, callbacks e fallbacks
+    'auth': True,       # cadastro, login, senha e perfil
+    'finance': True,    # receitas, despesas, saldo e demo
+    'search': True,     # /buscar
+    'statement': True,  # /extrato
+    'legacy': True,     # conversas antigas do bot_commands (/despesas, /metas, ...)
+    'support': True,    # /reset_senha e /debug_user
+    'debug': True,      # /debug_*
+})
+
+# Texto digitado fora de comandos (entrada das conversas)
+TEXT_INPUT = filters.TEXT & ~filters.COMMAND
+
+
+def load_features(env: Mapping[str, str] = os.environ) -> Dict[str, bool]:
+    """Feature flags a partir do ambiente"""
+    features = dict(DEFAULT_FEATURES)
+    for name in env.get('BOT_DISABLED_FEATURES', '').split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in features:
+            logger.warning(f"Feature desconhecida em BOT_DISABLED_FEATURES: {name}")
+            continue
+        features[name] = False
+    return features
+
+
+def profiling_enabled(env: Mapping[str, str] = os.environ) -> bool:
+    """PROFILE_HANDLERS=1 mede o tempo de todos os handlers"""
+    return env.get('PROFILE_HANDLERS', '').lower() in ('1', 'true', 'yes')
+
+
+class BotComponents:
+    """Gerenciadores usados pelos handlers, criados sob demanda
+
+    Só os gerenciadores de features ativas chegam a ser instanciados.
+    """
+
+    def __init__(self, bot, registry: Optional['HandlerRegistry'] = None):
+        self.bot = bot
+        self.registry = registry
+
+    @cached_property
+    def bot_commands(self):
+        from bot_commands import BotCommands
+        return BotCommands(self.bot)
+
+    @cached_property
+    def system_commands(self):
+        from system_commands import SystemCommands
+        return SystemCommands(self.bot)
+
+    @cached_property
+    def revenue_manager(self):
+        from revenue_manager import RevenueManager
+        return RevenueManager(self.bot)
+
+    @cached_property
+    def expense_manager(self):
+        from expense_manager import ExpenseManager
+        return ExpenseManager(self.bot)
+
+    @cached_property
+    def quick_entry(self):
+        from quick_entry import QuickEntryManager
+        return QuickEntryManager(self.bot, self.expense_manager, self.revenue_manager)
+
+    @cached_property
+    def search_manager(self):
+        from search_manager import SearchManager
+        return SearchManager(self.bot)
+
+    @cached_property
+    def statement_manager(self):
+        from statement_manager import StatementManager
+        return StatementManager(self.bot)
+
+
+@dataclass(frozen=True)
+class HandlerSpec:
+    """Declaração de um handler: nome, feature flag e fábrica"""
+    name: str
+    feature: str
+    build: Callable[[BotComponents], BaseHandler]
+    group: int = 0
+
+
+def command(name: str, feature: str, callback: Callable[[BotComponents], Callable]) -> HandlerSpec:
+    """Atalho para um CommandHandler simples"""
+    return HandlerSpec(name, feature, lambda c: CommandHandler(name, callback(c)))
+
+
+# Conversas ---------------------------------------------------------------
+
+def _registration_conversation(c: BotComponents) -> ConversationHandler:
+    from bot_commands import WAITING_FULL_NAME, WAITING_EMAIL, WAITING_PASSWORD
+    commands = c.bot_commands
+    return ConversationHandler(
+        entry_points=[CommandHandler('cadastro', commands.start_registration)],
+        states={
+            WAITING_FULL_NAME: [MessageHandler(TEXT_INPUT, commands.receive_full_name)],
+            WAITING_EMAIL: [MessageHandler(TEXT_INPUT, commands.receive_email)],
+            WAITING_PASSWORD: [MessageHandler(TEXT_INPUT, commands.receive_password)],
+        },
+        fallbacks=[CommandHandler('cancelar', commands.cancel_operation)],
+    )
+
+
+def _login_conversation(c: BotComponents) -> ConversationHandler:
+    from bot_commands import WAITING_LOGIN_PASSWORD
+    commands = c.bot_commands
+    return ConversationHandler(
+        entry_points=[CommandHandler('login', commands.login_command)],
+        states={
+            WAITING_LOGIN_PASSWORD: [MessageHandler(TEXT_INPUT, commands.receive_login_password)],
+        },
+        fallbacks=[CommandHandler('cancelar', commands.cancel_operation)],
+    )
+
+
+def _change_password_conversation(c: BotComponents) -> ConversationHandler:
+    from bot_commands import WAITING_OLD_PASSWORD, WAITING_NEW_PASSWORD
+    commands = c.bot_commands
+    return ConversationHandler(
+        entry_points=[CommandHandler('trocar_senha', commands.change_password_command)],
+        states={
+            WAITING_OLD_PASSWORD: [MessageHandler(TEXT_INPUT, commands.receive_old_password)],
+            WAITING_NEW_PASSWORD: [MessageHandler(TEXT_INPUT, commands.receive_new_password)],
+        },
+        fallbacks=[CommandHandler('cancelar', commands.cancel_operation)],
+    )
+
+
+def _revenue_conversation(c: BotComponents) -> ConversationHandler:
+    from revenue_manager import (WAITING_REVENUE_TYPE, WAITING_REVENUE_DESCRIPTION,
+                                 WAITING_REVENUE_VALUE, WAITING_REVENUE_DATE,
+                                 WAITING_REVENUE_ACCOUNT, WAITING_REVENUE_FREQUENCY,
+                                 WAITING_REVENUE_CONFIRMATION)
+    manager = c.revenue_manager
+    return ConversationHandler(
+        entry_points=[CommandHandler('receitas', manager.start_add_revenue)],
+        states={
+            WAITING_REVENUE_TYPE: [CallbackQueryHandler(manager.process_revenue_type)],
+            WAITING_REVENUE_DESCRIPTION: [MessageHandler(TEXT_INPUT, manager.receive_revenue_description)],
+            WAITING_REVENUE_VALUE: [MessageHandler(TEXT_INPUT, manager.receive_revenue_value)],
+            WAITING_REVENUE_DATE: [MessageHandler(TEXT_INPUT, manager.receive_revenue_date)],
+            WAITING_REVENUE_ACCOUNT: [CallbackQueryHandler(manager.process_revenue_account)],
+            WAITING_REVENUE_FREQUENCY: [CallbackQueryHandler(manager.process_revenue_frequency)],
+            WAITING_REVENUE_CONFIRMATION: [CallbackQueryHandler(manager.process_confirmation)],
+        },
+        fallbacks=[CommandHandler('cancelar', manager.cancel_operation)],
+        per_message=False
+    )
+
+
+def _expense_conversation(c: BotComponents) -> ConversationHandler:
+    from expense_manager import (WAITING_EXPENSE_TYPE, WAITING_EXPENSE_DESCRIPTION,
+                                 WAITING_EXPENSE_VALUE, WAITING_EXPENSE_DATE,
+                                 WAITING_EXPENSE_ACCOUNT, WAITING_INSTALLMENT_OPTION,
+                                 WAITING_INSTALLMENT_COUNT, WAITING_INSTALLMENT_START,
+                                 WAITING_EXPENSE_CONFIRMATION)
+    manager = c.expense_manager
+    return ConversationHandler(
+        entry_points=[CommandHandler('gastos', manager.start_add_expense)],
+        states={
+            WAITING_EXPENSE_TYPE: [CallbackQueryHandler(manager.process_expense_type)],
+            WAITING_EXPENSE_DESCRIPTION: [MessageHandler(TEXT_INPUT, manager.receive_expense_description)],
+            WAITING_EXPENSE_VALUE: [MessageHandler(TEXT_INPUT, manager.receive_expense_value)],
+            WAITING_EXPENSE_DATE: [MessageHandler(TEXT_INPUT, manager.receive_expense_date)],
+            WAITING_EXPENSE_ACCOUNT: [CallbackQueryHandler(manager.process_expense_account)],
+            WAITING_INSTALLMENT_OPTION: [CallbackQueryHandler(manager.process_installment_option)],
+            WAITING_INSTALLMENT_COUNT: [
+                CallbackQueryHandler(manager.process_installment_count),
+                MessageHandler(TEXT_INPUT, manager.receive_custom_installments)
+            ],
+            WAITING_INSTALLMENT_START: [
+                CallbackQueryHandler(manager.process_installment_start),
+                MessageHandler(TEXT_INPUT, manager.receive_custom_start_date)
+            ],
+            WAITING_EXPENSE_CONFIRMATION: [CallbackQueryHandler(manager.process_confirmation)],
+        },
+        fallbacks=[CommandHandler('cancelar', manager.cancel_operation)],
+        per_message=False
+    )
+
+
+def _legacy_expense_conversation(c: BotComponents) -> ConversationHandler:
+    from bot_commands import WAITING_EXPENSE_TITLE, WAITING_EXPENSE_AMOUNT, WAITING_EXPENSE_CATEGORY
+    commands = c.bot_commands
+    return ConversationHandler(
+        entry_points=[CommandHandler('despesas', commands.expenses_command)],
+        states={
+            WAITING_EXPENSE_TITLE: [MessageHandler(TEXT_INPUT, commands.receive_expense_title)],
+            WAITING_EXPENSE_AMOUNT: [MessageHandler(TEXT_INPUT, commands.receive_expense_amount)],
+            WAITING_EXPENSE_CATEGORY: [CallbackQueryHandler(commands.process_expense_category)],
+        },
+        fallbacks=[CommandHandler('cancelar', commands.cancel_operation)],
+    )
+
+
+def _legacy_goal_conversation(c: BotComponents) -> ConversationHandler:
+    from bot_commands import WAITING_GOAL_TITLE, WAITING_GOAL_AMOUNT, WAITING_GOAL_TYPE
+    commands = c.bot_commands
+    return ConversationHandler(
+        entry_points=[CommandHandler('metas', commands.goals_command)],
+        states={
+            WAITING_GOAL_TITLE: [MessageHandler(TEXT_INPUT, commands.receive_goal_title)],
+            WAITING_GOAL_AMOUNT: [MessageHandler(TEXT_INPUT, commands.receive_goal_amount)],
+            WAITING_GOAL_TYPE: [CallbackQueryHandler(commands.process_goal_type)],
+        },
+        fallbacks=[CommandHandler('cancelar', commands.cancel_operation)],
+    )
+
+
+# Ordem importa: dentro do mesmo grupo o primeiro handler que aceita a update vence
+HANDLER_SPECS: Tuple[HandlerSpec, ...] = (
+    # Updates reentregues pelo Telegram param aqui, antes de qualquer grupo
+    HandlerSpec('dedup', 'core', lambda c: TypeHandler(Update, update_deduplicator), group=-1),
+
+    command('start', 'core', lambda c: c.bot.start_command),
+    command('buscar', 'search', lambda c: c.search_manager.search_command),
+    command('extrato', 'statement', lambda c: c.statement_manager.statement_command),
+
+    # Só rotas registradas no callback_router; callbacks das conversas passam adiante
+    HandlerSpec('callbacks', 'core', lambda c: CallbackQueryHandler(
+        c.bot.callback_handler, pattern=callback_router.matches
+    )),
+
+    # Autenticação
+    HandlerSpec('cadastro', 'auth', _registration_conversation),
+    HandlerSpec('login', 'auth', _login_conversation),
+    HandlerSpec('trocar_senha', 'auth', _change_password_conversation),
+    command('perfil', 'auth', lambda c: c.bot_commands.profile_command),
+    command('logout', 'auth', lambda c: c.bot_commands.logout_command),
+    command('entrar', 'auth', lambda c: c.system_commands.enter_command),
+
+    # Sistema financeiro manual
+    command('saldo', 'finance', lambda c: c.system_commands.balance_command),
+    command('conectar', 'finance', lambda c: c.system_commands.connect_command),
+    command('status', 'finance', lambda c: c.system_commands.status_command),
+    command('demo', 'finance', lambda c: c.system_commands.demo_command),
+    command('teste', 'finance', lambda c: c.system_commands.test_command),
+    HandlerSpec('receitas', 'finance', _revenue_conversation),
+    HandlerSpec('gastos', 'finance', _expense_conversation),
+    command('cartoes', 'finance', lambda c: c.bot_commands.cards_callback),
+    command('analise', 'finance', lambda c: c.bot_commands.ai_analysis_callback),
+
+    # Compatibilidade com o fluxo antigo do bot_commands
+    HandlerSpec('despesas', 'legacy', _legacy_expense_conversation),
+    HandlerSpec('metas', 'legacy', _legacy_goal_conversation),
+    command('relatorio', 'legacy', lambda c: c.bot_commands.expense_report_command),
+    command('resumo', 'legacy', lambda c: c.bot_commands.financial_summary_command),
+    command('nova_despesa', 'legacy', lambda c: c.bot_commands.start_add_expense),
+    command('nova_meta', 'legacy', lambda c: c.bot_commands.start_add_goal),
+
+    # Suporte e debug
+    command('reset_senha', 'support', lambda c: c.bot_commands.reset_password_command),
+    command('debug_user', 'support', lambda c: c.bot_commands.debug_user_command),
+    command('debug_receitas', 'debug', lambda c: c.system_commands.debug_receitas_command),
+    command('debug_gastos', 'debug', lambda c: c.system_commands.debug_gastos_command),
+    command('debug_perfil', 'debug', lambda c: c.system_commands.debug_perfil_command),
+    command('debug_callbacks', 'debug', lambda c: c.system_commands.debug_callbacks_command),
+    command('debug_pool', 'debug', lambda c: c.system_commands.debug_pool_command),
+    command('debug_handlers', 'debug', lambda c: c.registry.debug_handlers_command),
+
+    # Callbacks restantes (botões antigos ou de conversas encerradas) e texto
+    # fora de conversa, depois de todas as conversas do grupo (texto digitado
+    # dentro de uma conversa não pode cair no lançamento rápido)
+    HandlerSpec('quick_entry', 'finance', lambda c: MessageHandler(
+        TEXT_INPUT & filters.UpdateType.MESSAGE & filters.Regex(QUICK_ENTRY_PATTERN),
+        c.quick_entry.quick_entry_handler
+    )),
+    HandlerSpec('callbacks_fallback', 'core', lambda c: CallbackQueryHandler(c.bot.callback_handler)),
+    HandlerSpec('fallback', 'core', lambda c: MessageHandler(filters.TEXT, c.system_commands.fallback_handler)),
+)
+
+
+class HandlerRegistry:
+    """Handlers ativos do bot, construídos uma única vez a partir das specs"""
+
+    def __init__(self, specs: Iterable[HandlerSpec] = HANDLER_SPECS,
+                 features: Optional[Mapping[str, bool]] = None,
+                 profile: Optional[bool] = None):
+        self.specs = tuple(specs)
+        self.features = MappingProxyType(dict(features if features is not None else load_features()))
+        self.profile = profiling_enabled() if profile is None else profile
+        self.handler_stats: Dict[str, RouteStats] = {}
+        self.entries: Tuple[Tuple[HandlerSpec, BaseHandler], ...] = ()
+
+    def is_enabled(self, spec: HandlerSpec) -> bool:
+        return self.features.get(spec.feature, False)
+
+    def build(self, components: BotComponents) -> Tuple[Tuple[HandlerSpec, BaseHandler], ...]:
+        """Construir os handlers das features ativas"""
+        if components.registry is None:
+            components.registry = self
+
+        entries = []
+        for spec in self.specs:
+            if not self.is_enabled(spec):
+                continue
+            handler = spec.build(components)
+            if self.profile or tracer.enabled:
+                self._instrument(spec.name, handler)
+            entries.append((spec, handler))
+
+        self.entries = tuple(entries)
+        return self.entries
+
+    def register(self, application: Application, components: BotComponents):
+        """Construir (se necessário) e adicionar os handlers à aplicação"""
+        if not self.entries:
+            self.build(components)
+        for spec, handler in self.entries:
+            application.add_handler(handler, group=spec.group)
+        application.add_error_handler(components.system_commands.error_handler)
+
+        disabled = [name for name, enabled in self.features.items() if not enabled]
+        logger.info(
+            f"🧩 {len(self.entries)} handlers registrados"
+            + (f" (features desativadas: {', '.join(disabled)})" if disabled else "")
+            + (" com profiling" if self.profile else "")
+        )
+
+    # Profiling -----------------------------------------------------------
+
+    def _instrument(self, name: str, handler: BaseHandler):
+        """Envolver os callbacks do handler (e das conversas) com medição de tempo e span"""
+        if isinstance(handler, ConversationHandler):
+            inner = list(handler.entry_points) + list(handler.fallbacks)
+            for state_handlers in handler.states.values():
+                inner.extend(state_handlers)
+            for child in inner:
+                self._instrument(f"{name}.{getattr(child.callback, '__name__', 'handler')}", child)
+            return
+
+        stats = self.handler_stats.setdefault(name, RouteStats())
+        callback = handler.callback
+
+        @wraps(callback)
+        async def timed_callback(update, context):
+            started = time.perf_counter()
+            failed = False
+            try:
+                with tracer.span(f'handler {name}'):
+                    return await callback(update, context)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                stats.record(time.perf_counter() - started, failed)
+
+        handler.callback = timed_callback
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Snapshot dos tempos por handler (apenas com profiling ativo)"""
+        return {name: stats.as_dict() for name, stats in self.handler_stats.items() if stats.count}
+
+    # Introspecção --------------------------------------------------------
+
+    def describe(self, application: Optional[Application] = None) -> str:
+        """Resumo textual dos handlers ativos"""
+        by_feature: Dict[str, List[str]] = {}
+        for spec, _ in self.entries:
+            by_feature.setdefault(spec.feature, []).append(spec.name)
+
+        lines = ["🔧 HANDLERS REGISTRADOS:", ""]
+        for feature, names in by_feature.items():
+            lines.append(f"[{feature}] {', '.join(names)}")
+
+        disabled = [name for name, enabled in self.features.items() if not enabled]
+        if disabled:
+            lines.append(f"\nFeatures desativadas: {', '.join(disabled)}")
+
+        if application is not None:
+            lines.append("")
+            for group_id, group_handlers in sorted(application.handlers.items()):
+                lines.append(f"Grupo {group_id}: {len(group_handlers)} handlers")
+            total = sum(len(group_handlers) for group_handlers in application.handlers.values())
+            lines.append(f"Total de handlers: {total}")
+
+        if self.profile:
+            stats = self.get_stats()
+            lines.append("\n⏱️ PROFILING:" if stats else "\n⏱️ Profiling ativo, sem chamadas ainda.")
+            for name, values in sorted(stats.items(), key=lambda item: -item[1]['avg_ms']):
+                lines.append(f"{name}: {values['count']}x • média {values['avg_ms']}ms • máx {values['max_ms']}ms")
+
+        return "\n".join(lines)
+
+    async def debug_handlers_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Debug dos handlers registrados"""
+        try:
+            await update.message.reply_text(self.describe(context.application))
+        except Exception as e:
+            await update.message.reply_text(f"❌ Erro no debug: {str(e)}")
+
+
+class TracedApplication(Application):
+    """Application que abre o trace de cada update (TRACING_SAMPLE_RATE)"""
+
+    async def process_update(self, update: object):
+        if not isinstance(update, Update):
+            return await super().process_update(update)
+        user = update.effective_user
+        with tracer.trace('update', **{
+            'telegram.update_id': update.update_id,
+            'telegram.update': update_label(update),
+            'telegram.user_id': user.id if user else 0,
+        }):
+            return await super().process_update(update)
+
+
+def build_application(bot, token: str, registry: Optional[HandlerRegistry] = None,
+                      request: Optional[BaseRequest] = None) -> Application:
+    """Montar a Application com todos os handlers do registro
+
+    request substitui o cliente HTTP da Bot API (teste de carga sem Telegram).
+    O monitor do event loop (LOOP_MONITOR) fica em bot_data['loop_monitor'];
+    com tracing ligado as updates e as chamadas da Bot API viram spans.
+    """
+    registry = registry or HandlerRegistry()
+
+    # Banco inicializado no loop da aplicação, logo antes do polling;
+    # aquecimento não crítico fica em segundo plano
+    async def post_init(application: Application):
+        application.bot_data['loop_monitor'].start()
+        await bot.init_database()
+        await bot.ingestor.start()
+        bot.start_warmup()
+
+    # Transações ainda na fila de ingestão são gravadas antes de encerrar
+    async def post_shutdown(application: Application):
+        await bot.ingestor.close()
+        await application.bot_data['loop_monitor'].stop()
+        tracer.close()
+
+    builder = (
+        Application.builder().token(token)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if tracer.enabled:
+        # Mesmo cliente padrão do ApplicationBuilder, envolvido para medir cada chamada
+        builder = builder.application_class(TracedApplication)
+        request = TracedRequest(request or HTTPXRequest(connection_pool_size=256))
+    if request is not None:
+        builder = builder.request(request)
+    application = builder.build()
+    registry.register(application, BotComponents(bot))
+    application.bot_data['handler_registry'] = registry
+    application.bot_data['loop_monitor'] = LoopMonitor()
+    return application
@@ -15,6 +15,16 @@ class HealthHandler(http.server.BaseHTTPRequestHandler):
             self.end_headers()
             response = {"status": "OK", "service": "telegram-bot"}
             self.wfile.write(json.dumps(response).encode())
+        elif parsed_path.path == '/metrics':
+            # Saturação dos pools do banco, lag do event loop e fila de logs
+            from db_pool import pool_metrics
+            from loop_monitor import loop_metrics
+            from logging_setup import logging_metrics
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            response = {"pools": pool_metrics(), "event_loop": loop_metrics(), "logging": logging_metrics()}
+            self.wfile.write(json.dumps(response).encode())
         elif parsed_path.path == '/':
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
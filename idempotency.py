@@ -0,0 +1,65 @@
+"""
+Idempotência
+Chaves de deduplicação para inserts de transações e filtro de updates reentregues
+"""
+from collections import OrderedDict
+from typing import Optional
+import logging
+import uuid
+
+from telegram.ext import ApplicationHandlerStop
+
+logger = logging.getLogger(__name__)
+
+# Quantos update_id recentes lembrar (reentregas chegam logo em seguida)
+RECENT_UPDATES_CAPACITY = 2048
+
+
+def new_flow_id() -> str:
+    """Identificador de um fluxo de cadastro (/receitas, /gastos)"""
+    return uuid.uuid4().hex[:16]
+
+
+def update_flow_id(update_id: int) -> str:
+    """Fluxo de um passo (lançamento rápido) preso à update: a reentrega reusa a chave"""
+    return f"u{update_id}"
+
+
+def idempotency_key(user_id: int, flow_id: str, part: Optional[object] = None) -> str:
+    """Chave única da transação: usuário + fluxo (+ parcela)"""
+    key = f"{user_id}:{flow_id}"
+    return f"{key}:{part}" if part is not None else key
+
+
+class UpdateDeduplicator:
+    """Descarta updates com update_id já processado neste processo
+
+    Registrado no grupo -1, antes de todos os handlers: uma reentrega do
+    Telegram interrompe o processamento com ApplicationHandlerStop.
+    """
+
+    def __init__(self, capacity: int = RECENT_UPDATES_CAPACITY):
+        self.capacity = capacity
+        self.duplicates = 0
+        self._seen: "OrderedDict[int, None]" = OrderedDict()
+
+    def seen(self, update_id: int) -> bool:
+        """Registrar o update_id; True se ele já tinha sido visto"""
+        if update_id in self._seen:
+            return True
+        self._seen[update_id] = None
+        if len(self._seen) > self.capacity:
+            self._seen.popitem(last=False)
+        return False
+
+    async def __call__(self, update, context):
+        update_id = getattr(update, 'update_id', None)
+        if update_id is None or not self.seen(update_id):
+            return
+        self.duplicates += 1
+        logger.info(f"Update {update_id} reentregue, ignorada")
+        raise ApplicationHandlerStop
+
+
+# Filtro global usado pelo registro de handlers
+update_deduplicator = UpdateDeduplicator()
@@ -0,0 +1,212 @@
+"""
+Configuração de Logging
+Handlers do event loop só enfileiram o registro; uma thread escreve no stderr
+(JSON estruturado ou texto) e o excesso de mensagens repetidas é descartado
+por ponto de chamada, com a contagem do que foi suprimido
+"""
+from dataclasses import dataclass
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Mapping, Optional, Tuple
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+from tracing import tracer
+
+LOG_FORMATS = ('json', 'text')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Bibliotecas que logam uma linha por requisição em INFO (httpx: cada chamada da Bot API)
+NOISY_LOGGERS = ('httpx', 'httpcore', 'apscheduler')
+
+# Atributos padrão do LogRecord (o resto vem de extra= e vai para o JSON)
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+
+@dataclass(frozen=True)
+class LoggingSettings:
+    """Configuração do logging (ver from_env para as variáveis de ambiente)"""
+    level: str = 'INFO'
+    format: str = 'json'
+    rate_per_second: float = 10.0
+    burst: int = 20
+    queue_size: int = 10000
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str] = os.environ) -> 'LoggingSettings':
+        """LOG_LEVEL, LOG_FORMAT, LOG_RATE_PER_SECOND (0 desliga o limite), LOG_BURST e LOG_QUEUE_SIZE"""
+        log_format = env.get('LOG_FORMAT', cls.format).lower()
+        if log_format not in LOG_FORMATS:
+            raise ValueError(f"LOG_FORMAT inválido: {log_format} (use {', '.join(LOG_FORMATS)})")
+        return cls(
+            level=env.get('LOG_LEVEL', cls.level).upper(),
+            format=log_format,
+            rate_per_second=float(env.get('LOG_RATE_PER_SECOND', cls.rate_per_second)),
+            burst=int(env.get('LOG_BURST', cls.burst)),
+            queue_size=int(env.get('LOG_QUEUE_SIZE', cls.queue_size)),
+        )
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket por ponto de chamada (arquivo:linha) para registros abaixo de WARNING
+
+    As mensagens são f-strings, então o texto não identifica o tipo; a linha
+    que loga, sim. O primeiro registro aceito depois de um descarte leva
+    suppressed=N.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int):
+        super().__init__()
+        self.rate = rate_per_second
+        self.burst = burst
+        self.suppressed_total = 0
+        self._buckets: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # [fichas, último refill, suprimidos desde o último aceito]
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                self.suppressed_total += 1
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class ContextFilter(logging.Filter):
+    """Anexa o trace_id da update atual (lido na thread do loop, antes da fila)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace_id = tracer.current_trace_id()
+        if trace_id:
+            record.trace_id = trace_id
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro: ts, level, logger, msg, campos extra e exceção"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler que descarta (e conta) quando a fila está cheia, sem bloquear o loop
+
+    SimpleQueue (em C, sem lock em Python) com limite aproximado pelo qsize.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Mensagem resolvida e traceback em exc_text (a thread escritora formata o resto)
+
+        Sem a cópia do QueueHandler padrão: este é o único handler do logger raiz.
+        """
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+class LoggingPipeline:
+    """Fila + thread escritora instaladas no logger raiz"""
+
+    def __init__(self, settings: LoggingSettings):
+        self.settings = settings
+        self.rate_limit = RateLimitFilter(settings.rate_per_second, settings.burst)
+        self.queue_handler = DroppingQueueHandler(queue.SimpleQueue(), settings.queue_size)
+        self.queue_handler.addFilter(self.rate_limit)
+        self.queue_handler.addFilter(ContextFilter())
+
+        writer = logging.StreamHandler(sys.stderr)
+        writer.setFormatter(JsonFormatter() if settings.format == 'json' else logging.Formatter(TEXT_FORMAT))
+        self.listener = QueueListener(self.queue_handler.queue, writer, respect_handler_level=False)
+        self.running = False
+
+    def start(self):
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.queue_handler)
+        root.setLevel(self.settings.level)
+        for name in NOISY_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+        self.listener.start()
+        self.running = True
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Escrever o que ainda está na fila (chamado também no encerramento do processo)"""
+        if self.running:
+            self.running = False
+            self.listener.stop()
+
+    def stats(self) -> Dict:
+        return {
+            'queued': self.queue_handler.queue.qsize(),
+            'dropped': self.queue_handler.dropped,
+            'suppressed': self.rate_limit.suppressed_total,
+        }
+
+
+_pipeline: Optional[LoggingPipeline] = None
+
+
+def configure_logging(settings: Optional[LoggingSettings] = None) -> LoggingPipeline:
+    """Instalar o pipeline no logger raiz (uma vez por processo; substitui o basicConfig)"""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LoggingPipeline(settings or LoggingSettings.from_env())
+        _pipeline.start()
+    return _pipeline
+
+
+def logging_metrics() -> Dict:
+    """Fila, descartes e supressões do pipeline (para /metrics)"""
+    return _pipeline.stats() if _pipeline is not None else {}
@@ -0,0 +1,196 @@
+"""
+Monitor do Event Loop
+Mede o atraso (lag) do loop do asyncio em histograma e registra a pilha de
+quem está segurando o loop além do limite (bcrypt, cliente OpenAI síncrono,
+montagem de textos grandes, ...)
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Tuple
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# Modos: 'off', 'on' (histograma + pilhas de bloqueio) e 'debug' (também o
+# modo debug do asyncio, que aponta callbacks lentos e corrotinas não aguardadas)
+LOOP_MONITOR_MODES = ('off', 'on', 'debug')
+
+# Limites superiores (ms) dos buckets do histograma de lag
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Pilhas guardadas para /metrics e relatórios (as mais recentes)
+MAX_BLOCKS_KEPT = 20
+
+# Monitores ativos no processo (métricas exportadas pelo health server)
+_monitors: "weakref.WeakSet[LoopMonitor]" = weakref.WeakSet()
+
+
+@dataclass(frozen=True)
+class LoopMonitorSettings:
+    """Configuração do monitor (ver from_env para as variáveis de ambiente)"""
+    mode: str = 'off'
+    interval_ms: float = 100.0
+    block_threshold_ms: float = 250.0
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str] = os.environ) -> 'LoopMonitorSettings':
+        """LOOP_MONITOR, LOOP_MONITOR_INTERVAL_MS e LOOP_BLOCK_THRESHOLD_MS"""
+        mode = env.get('LOOP_MONITOR', cls.mode).lower()
+        if mode not in LOOP_MONITOR_MODES:
+            raise ValueError(f"LOOP_MONITOR inválido: {mode} (use {', '.join(LOOP_MONITOR_MODES)})")
+        return cls(
+            mode=mode,
+            interval_ms=float(env.get('LOOP_MONITOR_INTERVAL_MS', cls.interval_ms)),
+            block_threshold_ms=float(env.get('LOOP_BLOCK_THRESHOLD_MS', cls.block_threshold_ms)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off'
+
+
+class LagHistogram:
+    """Histograma cumulativo do lag (ms), no formato dos buckets do Prometheus"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LAG_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, lag_ms: float):
+        for i, bound in enumerate(self.buckets):
+            if lag_ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total_ms += lag_ms
+        self.max_ms = max(self.max_ms, lag_ms)
+
+    def snapshot(self) -> Dict:
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            'count': self.count,
+            'sum_ms': round(self.total_ms, 3),
+            'max_ms': round(self.max_ms, 3),
+            'buckets': buckets,
+        }
+
+
+class LoopMonitor:
+    """Sentinela do loop: uma tarefa mede o lag e uma thread vigia os bloqueios
+
+    A tarefa dorme interval_ms e registra o atraso com que acorda. A thread
+    confere o último batimento da tarefa; se o loop ficou parado mais que
+    block_threshold_ms, captura a pilha da thread do loop naquele instante
+    (é o código que está bloqueando) e registra em log uma vez por bloqueio.
+    """
+
+    def __init__(self, settings: Optional[LoopMonitorSettings] = None):
+        self.settings = settings or LoopMonitorSettings.from_env()
+        self.histogram = LagHistogram()
+        self.blocks: List[Dict] = []
+        self.blocks_total = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._heartbeat = 0.0
+        self._lock = threading.Lock()
+        _monitors.add(self)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Iniciar no loop atual (chamar de dentro de uma corrotina)"""
+        if not self.settings.enabled or self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        if self.settings.mode == 'debug':
+            self._loop.set_debug(True)
+            self._loop.slow_callback_duration = self.settings.block_threshold_ms / 1000
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = self._loop.create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-monitor', daemon=True)
+        self._watchdog.start()
+        logger.info(
+            f"🩺 Monitor do event loop ligado ({self.settings.mode}, "
+            f"amostra {self.settings.interval_ms:g}ms, bloqueio > {self.settings.block_threshold_ms:g}ms)"
+        )
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _sample(self):
+        interval = self.settings.interval_ms / 1000
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            self.histogram.observe(max(0.0, (now - started - interval) * 1000))
+
+    def _watch(self):
+        threshold = self.settings.block_threshold_ms / 1000
+        # Confere várias vezes por limite para pegar a pilha ainda dentro do bloqueio
+        check_every = max(threshold / 4, 0.005)
+        reported_heartbeat = None
+        while not self._stopped.wait(check_every):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat
+            if stalled < threshold + self.settings.interval_ms / 1000 or heartbeat == reported_heartbeat:
+                continue
+            reported_heartbeat = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame is not None else ''
+            self._record_block(stalled * 1000, stack)
+
+    def _record_block(self, stalled_ms: float, stack: str):
+        with self._lock:
+            self.blocks_total += 1
+            self.blocks.append({'stalled_ms': round(stalled_ms, 1), 'at': time.time(), 'stack': stack})
+            del self.blocks[:-MAX_BLOCKS_KEPT]
+        logger.warning(f"🐢 Event loop bloqueado há {stalled_ms:.0f}ms; pilha da thread do loop:\n{stack}")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            last_block = self.blocks[-1] if self.blocks else None
+        return {
+            'mode': self.settings.mode,
+            'running': self.running,
+            'lag': self.histogram.snapshot(),
+            'blocks': self.blocks_total,
+            'last_block': last_block,
+        }
+
+
+def loop_metrics() -> List[Dict]:
+    """Snapshot de todos os monitores ativos (para /metrics)"""
+    return [monitor.snapshot() for monitor in list(_monitors) if monitor.settings.enabled]
@@ -1,366 +1,40 @@
 import os
 import asyncio
+import hashlib
 import logging
 import threading
 from datetime import datetime
 
-import asyncpg
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
-import openai
-from health_server import start_health_server
-
-# Configurar logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+from callback_router import callback_router, encode_callback
+from db_pool import CONNECTION_ERRORS, DatabasePool, RecentWrites
+from transaction_ingestor import (
+    BATCH_INSERT_SQL, EXISTING_KEYS_SQL, SINGLE_INSERT_SQL, TransactionIngestor, batch_payload, record_params
 )
+from demo_data import DemoDataLoader
+from logging_setup import configure_logging
+from tracing import tracer
+from categorizer import Categorizer
+
+# Configurar logging: fila + thread escritora, JSON e limite por ponto de chamada (LOG_*)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Configurações (todas vêm das variáveis de ambiente do Railway)
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 DATABASE_URL = os.getenv('DATABASE_URL')
+# Réplica somente leitura opcional para relatórios (sem ela tudo vai ao primário)
+DATABASE_READ_URL = os.getenv('DATABASE_READ_URL')
+# Segundos após uma escrita em que as leituras do usuário ficam no primário
+READ_YOUR_WRITES_WINDOW = float(os.getenv('DB_READ_YOUR_WRITES_SECONDS', '5'))
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-class FinancialBot:
-    def __init__(self):
-        self.openai_client = openai.OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
-        self.db_pool = None
-    
-    async def init_database(self):
-        """Inicializar pool de conexões do banco PostgreSQL do Railway"""
-        if not DATABASE_URL:
-            raise ValueError("DATABASE_URL não configurada! Configure no Railway.")
-            
-        self.db_pool = await asyncpg.create_pool(
-            DATABASE_URL,
-            min_size=1,
-            max_size=10,
-            command_timeout=60
-        )
-        
-        logger.info("🗄️ Conectado ao PostgreSQL do Railway")
-        
-        # Executar migrações automaticamente - Schema limpo e corrigido
-        async with self.db_pool.acquire() as conn:
-            await conn.execute('''
-                -- Tabela de usuários
-                CREATE TABLE IF NOT EXISTS users (
-                    id SERIAL PRIMARY KEY,
-                    telegram_id BIGINT UNIQUE NOT NULL,
-                    telegram_username VARCHAR(255),
-                    full_name VARCHAR(500) NOT NULL,
-                    first_name VARCHAR(255) NOT NULL,
-                    last_name VARCHAR(255),
-                    email VARCHAR(320),
-                    phone VARCHAR(20),
-                    password_hash VARCHAR(255),
-                    password_salt VARCHAR(255),
-                    is_active BOOLEAN DEFAULT true,
-                    is_verified BOOLEAN DEFAULT false,
-                    is_premium BOOLEAN DEFAULT false,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login TIMESTAMP,
-                    password_changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    failed_login_attempts INTEGER DEFAULT 0,
-                    account_locked_until TIMESTAMP,
-                    two_factor_enabled BOOLEAN DEFAULT false,
-                    two_factor_secret VARCHAR(32),
-                    registration_ip INET,
-                    last_login_ip INET,
-                    preferred_language VARCHAR(10) DEFAULT 'pt-BR',
-                    timezone VARCHAR(50) DEFAULT 'America/Sao_Paulo'
-                );
-                
-                -- Função para atualizar updated_at automaticamente
-                CREATE OR REPLACE FUNCTION update_updated_at_column()
-                RETURNS TRIGGER AS $$
-                BEGIN
-                    NEW.updated_at = CURRENT_TIMESTAMP;
-                    RETURN NEW;
-                END;
-                $$ language 'plpgsql';
-                
-                -- Trigger para updated_at automático
-                DROP TRIGGER IF EXISTS update_users_updated_at ON users;
-                CREATE TRIGGER update_users_updated_at
-                    BEFORE UPDATE ON users
-                    FOR EACH ROW
-                    EXECUTE FUNCTION update_updated_at_column();
-                
-                -- Tabela de categorias (DEVE vir ANTES de transactions)
-                CREATE TABLE IF NOT EXISTS categories (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                    name VARCHAR(100) NOT NULL,
-                    type VARCHAR(20) NOT NULL CHECK (type IN ('expense', 'income')),
-                    color VARCHAR(7),
-                    icon VARCHAR(50),
-                    is_active BOOLEAN DEFAULT true,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, name, type)
-                );
-
-                -- Tabela de metas financeiras (DEVE vir ANTES de transactions)
-                CREATE TABLE IF NOT EXISTS goals (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                    title VARCHAR(200) NOT NULL,
-                    description TEXT,
-                    goal_type VARCHAR(30) NOT NULL CHECK (goal_type IN ('saving', 'spending_limit', 'investment', 'debt_payment', 'emergency_fund', 'vacation', 'purchase')),
-                    target_amount DECIMAL(15,2) NOT NULL,
-                    current_amount DECIMAL(15,2) DEFAULT 0,
-                    target_date DATE,
-                    priority INTEGER DEFAULT 1 CHECK (priority BETWEEN 1 AND 5),
-                    is_active BOOLEAN DEFAULT true,
-                    is_completed BOOLEAN DEFAULT false,
-                    completed_at TIMESTAMP,
-                    category_id INTEGER REFERENCES categories(id),
-                    auto_calculate BOOLEAN DEFAULT false,
-                    notification_enabled BOOLEAN DEFAULT true,
-                    notification_threshold INTEGER DEFAULT 80,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-
-                -- Tabela de transações (agora categories e goals já existem)
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                    title VARCHAR(200) NOT NULL,
-                    description TEXT,
-                    amount DECIMAL(15,2) NOT NULL,
-                    type VARCHAR(20) NOT NULL CHECK (type IN ('expense', 'income')),
-                    category_id INTEGER REFERENCES categories(id),
-                    goal_id INTEGER REFERENCES goals(id),
-                    transaction_date DATE NOT NULL DEFAULT CURRENT_DATE,
-                    due_date DATE,
-                    is_installment BOOLEAN DEFAULT false,
-                    installment_number INTEGER,
-                    total_installments INTEGER,
-                    parent_transaction_id INTEGER REFERENCES transactions(id),
-                    is_recurring BOOLEAN DEFAULT false,
-                    recurrence_type VARCHAR(20) CHECK (recurrence_type IN ('daily', 'weekly', 'monthly', 'yearly')),
-                    recurrence_interval INTEGER DEFAULT 1,
-                    recurrence_end_date DATE,
-                    status VARCHAR(20) DEFAULT 'pending' CHECK (status IN ('pending', 'paid', 'overdue', 'cancelled')),
-                    paid_at TIMESTAMP,
-                    bank_account_id VARCHAR(100),
-                    bank_transaction_id VARCHAR(100),
-                    tags TEXT[],
-                    location VARCHAR(200),
-                    receipt_url VARCHAR(500),
-                    notes TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-
-                -- Tabela de orçamentos
-                CREATE TABLE IF NOT EXISTS budgets (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                    category_id INTEGER REFERENCES categories(id) ON DELETE CASCADE,
-                    month_year DATE NOT NULL,
-                    budget_limit DECIMAL(15,2) NOT NULL,
-                    spent_amount DECIMAL(15,2) DEFAULT 0,
-                    is_active BOOLEAN DEFAULT true,
-                    alert_at_percent INTEGER DEFAULT 80,
-                    alert_sent BOOLEAN DEFAULT false,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, category_id, month_year)
-                );
-
-                -- Tabela de alertas
-                CREATE TABLE IF NOT EXISTS alerts (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                    alert_type VARCHAR(30) NOT NULL CHECK (alert_type IN ('goal_progress', 'budget_exceeded', 'bill_due', 'goal_completed', 'overspending')),
-                    title VARCHAR(200) NOT NULL,
-                    message TEXT NOT NULL,
-                    related_id INTEGER,
-                    related_type VARCHAR(20),
-                    is_read BOOLEAN DEFAULT false,
-                    is_sent BOOLEAN DEFAULT false,
-                    priority INTEGER DEFAULT 1 CHECK (priority BETWEEN 1 AND 5),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    expires_at TIMESTAMP
-                );
-
-                -- Tabela de contas bancárias (Pluggy)
-                CREATE TABLE IF NOT EXISTS bank_accounts (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                    bank_name VARCHAR(100) NOT NULL,
-                    account_type VARCHAR(50) NOT NULL,
-                    account_number VARCHAR(50),
-                    balance DECIMAL(15,2) DEFAULT 0,
-                    currency_code VARCHAR(10) DEFAULT 'BRL',
-                    is_active BOOLEAN DEFAULT true,
-                    pluggy_item_id VARCHAR(100),
-                    pluggy_account_id VARCHAR(100),
-                    last_sync TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, pluggy_account_id)
-                );
-
-                -- Tabela de cartões de crédito
-                CREATE TABLE IF NOT EXISTS credit_cards (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                    bank_name VARCHAR(100) NOT NULL,
-                    card_name VARCHAR(100) NOT NULL,
-                    card_number_last4 VARCHAR(4),
-                    credit_limit DECIMAL(15,2),
-                    available_limit DECIMAL(15,2),
-                    current_balance DECIMAL(15,2) DEFAULT 0,
-                    due_date INTEGER, -- dia do mês
-                    closing_date INTEGER, -- dia do mês
-                    is_active BOOLEAN DEFAULT true,
-                    pluggy_item_id VARCHAR(100),
-                    pluggy_account_id VARCHAR(100),
-                    last_sync TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, pluggy_account_id)
-                );
-                
-                -- Índices para performance
-                CREATE INDEX IF NOT EXISTS idx_users_telegram_id ON users(telegram_id);
-                CREATE INDEX IF NOT EXISTS idx_users_email ON users(email) WHERE email IS NOT NULL;
-                CREATE INDEX IF NOT EXISTS idx_users_active ON users(is_active);
-                CREATE INDEX IF NOT EXISTS idx_categories_user_type ON categories(user_id, type);
-                CREATE INDEX IF NOT EXISTS idx_goals_user_id ON goals(user_id);
-                CREATE INDEX IF NOT EXISTS idx_goals_active ON goals(user_id, is_active, is_completed);
-                CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions(user_id, transaction_date DESC);
-                CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions(category_id);
-                CREATE INDEX IF NOT EXISTS idx_transactions_goal ON transactions(goal_id);
-                CREATE INDEX IF NOT EXISTS idx_budgets_user_month ON budgets(user_id, month_year);
-                CREATE INDEX IF NOT EXISTS idx_alerts_user_unread ON alerts(user_id, is_read, created_at DESC);
-                CREATE INDEX IF NOT EXISTS idx_bank_accounts_user ON bank_accounts(user_id, is_active);
-                CREATE INDEX IF NOT EXISTS idx_bank_accounts_pluggy ON bank_accounts(pluggy_item_id, pluggy_account_id);
-                CREATE INDEX IF NOT EXISTS idx_credit_cards_user ON credit_cards(user_id, is_active);
-                CREATE INDEX IF NOT EXISTS idx_credit_cards_pluggy ON credit_cards(pluggy_item_id, pluggy_account_id);
-
-                -- Triggers para updated_at
-                DROP TRIGGER IF EXISTS update_goals_updated_at ON goals;
-                CREATE TRIGGER update_goals_updated_at BEFORE UPDATE ON goals FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
-                
-                DROP TRIGGER IF EXISTS update_transactions_updated_at ON transactions;
-                CREATE TRIGGER update_transactions_updated_at BEFORE UPDATE ON transactions FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
-                
-                DROP TRIGGER IF EXISTS update_budgets_updated_at ON budgets;
-                CREATE TRIGGER update_budgets_updated_at BEFORE UPDATE ON budgets FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
-            ''')
-            
-            logger.info("✅ Schema do banco criado/atualizado com sucesso")
-    
-    async def start_command(self, update: Update, context):
-        """Comando /start com autenticação"""
-        telegram_user = update.effective_user
-        
-        # Verificar se usuário está cadastrado
-        async with self.db_pool.acquire() as conn:
-            existing_user = await conn.fetchrow(
-                "SELECT id, full_name, is_active FROM users WHERE telegram_id = $1",
-                telegram_user.id
-            )
-        
-        if existing_user:
-            if existing_user['is_active']:
-                # Usuário já cadastrado
-                is_authenticated = context.user_data.get('authenticated', False)
-                
-                if is_authenticated:
-                    welcome_text = f"""🤖 *Bem-vindo de volta, {existing_user['full_name']}!* 
-
-✅ *Sistema ativo e funcionando*
-💰 Análise de gastos inteligente
-📊 Integração com +200 bancos
-🎯 Metas financeiras personalizadas
-💡 Conselhos de investimento com IA
-
-*Sistema manual ativo! Funcionalidades:*
-💰 Receitas com contas predefinidas
-💸 Despesas com parcelamento automático
-🏦 8 contas bancárias configuradas
-📊 Análises inteligentes com IA
-
-*Use os botões abaixo ou comandos diretos:*"""
-                    
-                    keyboard = [
-                        [InlineKeyboardButton("💰 Receitas", callback_data="add_revenue"),
-                         InlineKeyboardButton("💸 Despesas", callback_data="add_expense")],
-                        [InlineKeyboardButton("💰 Saldo", callback_data="check_balance"),
-                         InlineKeyboardButton("� Perfil", callback_data="view_profile")],
-                        [InlineKeyboardButton("� Dashboard", callback_data="financial_summary")]
-                    ]
-                else:
-                    welcome_text = f"""🤖 *Olá {telegram_user.first_name}!* 
+# Rota do callback_router para os botões do menu principal
+MENU_ROUTE = 'm'
 
-✅ *Você já possui cadastro no sistema*
-🔐 Faça login para acessar suas funcionalidades
-
-*Após o login:*
-💰 Análise de gastos inteligente
-📊 Integração com +200 bancos
-🎯 Metas financeiras personalizadas
-💡 Conselhos de investimento com IA"""
-                    
-                    keyboard = [
-                        [InlineKeyboardButton("🔐 Fazer Login", callback_data="start_login")],
-                        [InlineKeyboardButton("ℹ️ Sobre o Sistema", callback_data="about_system")]
-                    ]
-            else:
-                welcome_text = f"""🤖 *Olá {telegram_user.first_name}!* 
-
-⚠️ *Sua conta está inativa*
-Entre em contato com o suporte para reativar.
-
-📧 Suporte disponível através do comando /ajuda"""
-                
-                keyboard = [
-                    [InlineKeyboardButton("📧 Solicitar Suporte", callback_data="contact_support")]
-                ]
-        else:
-            # Novo usuário - precisa se cadastrar
-            welcome_text = f"""🤖 *Bem-vindo {telegram_user.first_name}!* 
-
-🚀 *Bot IA Financeiro - Sistema Completo*
-💰 Análise de gastos inteligente
-📊 Integração com +200 bancos brasileiros
-🎯 Metas financeiras personalizadas
-💡 Conselhos de investimento com IA
-🔒 Total segurança com criptografia
-
-📝 *Para começar, você precisa se cadastrar:*"""
-            
-            keyboard = [
-                [InlineKeyboardButton("📝 Criar Conta", callback_data="start_registration")],
-                [InlineKeyboardButton("ℹ️ Sobre o Sistema", callback_data="about_system")],
-                [InlineKeyboardButton("🔒 Segurança", callback_data="security_info")]
-            ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(
-            welcome_text, 
-            parse_mode='Markdown',
-            reply_markup=reply_markup
-        )
-    
-    async def callback_handler(self, update: Update, context):
-        """Handler para callbacks dos botões"""
-        query = update.callback_query
-        data = query.data
-        
-        await query.answer()
-        
-        if data == "start_login":
-            await query.edit_message_text(
-                """🔐 **Sistema de Login**
+# Textos dos botões do menu principal
+MENU_TEXTS = {
+    'login': """🔐 **Sistema de Login**
 
 **Comandos disponíveis:**
 
@@ -373,11 +47,8 @@ Entre em contato com o suporte para reativar.
 • `/debug_user` - Ver dados da sua conta
 
 **💡 Dica:** Use `/entrar` - é mais rápido e seguro!""",
-                parse_mode='Markdown'
-            )
-        elif data == "start_registration":
-            await query.edit_message_text(
-                """📝 **Criar Nova Conta**
+
+    'registration': """📝 **Criar Nova Conta**
 
 **Processo rápido:**
 1️⃣ Digite `/cadastro`
@@ -390,11 +61,8 @@ Entre em contato com o suporte para reativar.
 • `/gastos` - Registrar despesas
 
 **Digite `/cadastro` para criar sua conta!**""",
-                parse_mode='Markdown'
-            )
-        elif data == "add_revenue":
-            await query.edit_message_text(
-                """💰 **Sistema de Receitas**
+
+    'revenue': """💰 **Sistema de Receitas**
 
 Para adicionar uma receita, use:
 **`/receitas`** 
@@ -411,11 +79,8 @@ Para adicionar uma receita, use:
 • 🔵 Inter PJ (empresarial)
 
 Digite `/receitas` para começar!""",
-                parse_mode='Markdown'
-            )
-        elif data == "add_expense":
-            await query.edit_message_text(
-                """💸 **Sistema de Despesas**
+
+    'expense': """💸 **Sistema de Despesas**
 
 Para registrar uma despesa, use:
 **`/gastos`**
@@ -430,11 +95,8 @@ Para registrar uma despesa, use:
 🟣 C6 Bank • 🟡 Nubank • 🔴 Santander
 
 Digite `/gastos` para registrar!""",
-                parse_mode='Markdown'
-            )
-        elif data == "check_balance":
-            await query.edit_message_text(
-                """💰 **Consultar Saldo**
+
+    'balance': """💰 **Consultar Saldo**
 
 Para ver seus saldos, use:
 **`/saldo`**
@@ -449,11 +111,8 @@ Para ver seus saldos, use:
 • `/demo` - Carregar dados de exemplo
 
 Digite `/saldo` para consultar!""",
-                parse_mode='Markdown'  
-            )
-        elif data == "view_profile":
-            await query.edit_message_text(
-                """👤 **Seu Perfil**
+
+    'profile': """👤 **Seu Perfil**
 
 Para ver suas informações, use:
 **`/perfil`**
@@ -469,11 +128,8 @@ Para ver suas informações, use:
 • `/trocar_senha` - Alterar senha
 
 Digite `/perfil` para ver!""",
-                parse_mode='Markdown'
-            )
-        elif data == "financial_summary":
-            await query.edit_message_text(
-                """📊 **Dashboard Financeiro**
+
+    'summary': """📊 **Dashboard Financeiro**
 
 Para ver seu resumo completo, use:
 **`/resumo`**
@@ -489,11 +145,8 @@ Para ver seu resumo completo, use:
 • `/relatorio` - Relatório detalhado
 
 Digite `/resumo` para ver seu dashboard!""",
-                parse_mode='Markdown'
-            )
-        elif data == "about_system":
-            await query.edit_message_text(
-                """ℹ️ **Bot IA Financeiro - Sistema Manual**
+
+    'about': """ℹ️ **Bot IA Financeiro - Sistema Manual**
 
 🤖 **Sistema Atual:**
 • 100% manual - controle total dos dados
@@ -511,12 +164,9 @@ Digite `/resumo` para ver seu dashboard!""",
 • Dados exclusivamente seus
 • Sem integração bancária externa
 • Conformidade com LGPD""",
-                parse_mode='Markdown'
-            )
-        else:
-            # Callback não reconhecido - mostrar ajuda
-            await query.edit_message_text(
-                """❌ **Opção não reconhecida**
+}
+
+MENU_FALLBACK_TEXT = """❌ **Opção não reconhecida**
 
 **Comandos disponíveis:**
 • `/receitas` - Adicionar receitas
@@ -530,33 +180,584 @@ Digite `/resumo` para ver seu dashboard!""",
 • `/entrar` - Login automático
 • `/start` - Voltar ao menu
 
-Digite um comando para continuar!""",
-                parse_mode='Markdown'
+Digite um comando para continuar!"""
+
+# callback_data antigos (antes do formato versionado) ainda presentes em mensagens enviadas
+LEGACY_MENU_CALLBACKS = {
+    'start_login': 'login',
+    'start_registration': 'registration',
+    'add_revenue': 'revenue',
+    'add_expense': 'expense',
+    'check_balance': 'balance',
+    'view_profile': 'profile',
+    'financial_summary': 'summary',
+    'about_system': 'about',
+}
+
+# Schema do banco; a versão é o hash do DDL e só é reaplicada quando muda
+SCHEMA_SQL = '''
+    -- Tabela de controle de migrações
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(64) PRIMARY KEY,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Tabela de usuários
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        telegram_id BIGINT UNIQUE NOT NULL,
+        telegram_username VARCHAR(255),
+        full_name VARCHAR(500) NOT NULL,
+        first_name VARCHAR(255) NOT NULL,
+        last_name VARCHAR(255),
+        email VARCHAR(320),
+        phone VARCHAR(20),
+        password_hash VARCHAR(255),
+        password_salt VARCHAR(255),
+        is_active BOOLEAN DEFAULT true,
+        is_verified BOOLEAN DEFAULT false,
+        is_premium BOOLEAN DEFAULT false,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_login TIMESTAMP,
+        password_changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        failed_login_attempts INTEGER DEFAULT 0,
+        account_locked_until TIMESTAMP,
+        two_factor_enabled BOOLEAN DEFAULT false,
+        two_factor_secret VARCHAR(32),
+        registration_ip INET,
+        last_login_ip INET,
+        preferred_language VARCHAR(10) DEFAULT 'pt-BR',
+        timezone VARCHAR(50) DEFAULT 'America/Sao_Paulo'
+    );
+
+    -- Função para atualizar updated_at automaticamente
+    CREATE OR REPLACE FUNCTION update_updated_at_column()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        NEW.updated_at = CURRENT_TIMESTAMP;
+        RETURN NEW;
+    END;
+    $$ language 'plpgsql';
+
+    -- Trigger para updated_at automático
+    DROP TRIGGER IF EXISTS update_users_updated_at ON users;
+    CREATE TRIGGER update_users_updated_at
+        BEFORE UPDATE ON users
+        FOR EACH ROW
+        EXECUTE FUNCTION update_updated_at_column();
+
+    -- Tabela de categorias (DEVE vir ANTES de transactions)
+    CREATE TABLE IF NOT EXISTS categories (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        name VARCHAR(100) NOT NULL,
+        type VARCHAR(20) NOT NULL CHECK (type IN ('expense', 'income')),
+        color VARCHAR(7),
+        icon VARCHAR(50),
+        is_active BOOLEAN DEFAULT true,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, name, type)
+    );
+
+    -- Tabela de metas financeiras (DEVE vir ANTES de transactions)
+    CREATE TABLE IF NOT EXISTS goals (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        title VARCHAR(200) NOT NULL,
+        description TEXT,
+        goal_type VARCHAR(30) NOT NULL CHECK (goal_type IN ('saving', 'spending_limit', 'investment', 'debt_payment', 'emergency_fund', 'vacation', 'purchase')),
+        target_amount DECIMAL(15,2) NOT NULL,
+        current_amount DECIMAL(15,2) DEFAULT 0,
+        target_date DATE,
+        priority INTEGER DEFAULT 1 CHECK (priority BETWEEN 1 AND 5),
+        is_active BOOLEAN DEFAULT true,
+        is_completed BOOLEAN DEFAULT false,
+        completed_at TIMESTAMP,
+        category_id INTEGER REFERENCES categories(id),
+        auto_calculate BOOLEAN DEFAULT false,
+        notification_enabled BOOLEAN DEFAULT true,
+        notification_threshold INTEGER DEFAULT 80,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Tabela de transações (agora categories e goals já existem)
+    CREATE TABLE IF NOT EXISTS transactions (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        title VARCHAR(200) NOT NULL,
+        description TEXT,
+        amount DECIMAL(15,2) NOT NULL,
+        type VARCHAR(20) NOT NULL CHECK (type IN ('expense', 'income')),
+        category_id INTEGER REFERENCES categories(id),
+        goal_id INTEGER REFERENCES goals(id),
+        transaction_date DATE NOT NULL DEFAULT CURRENT_DATE,
+        due_date DATE,
+        is_installment BOOLEAN DEFAULT false,
+        installment_number INTEGER,
+        total_installments INTEGER,
+        parent_transaction_id INTEGER REFERENCES transactions(id),
+        is_recurring BOOLEAN DEFAULT false,
+        recurrence_type VARCHAR(20) CHECK (recurrence_type IN ('daily', 'weekly', 'monthly', 'yearly')),
+        recurrence_interval INTEGER DEFAULT 1,
+        recurrence_end_date DATE,
+        status VARCHAR(20) DEFAULT 'pending' CHECK (status IN ('pending', 'paid', 'overdue', 'cancelled')),
+        paid_at TIMESTAMP,
+        bank_account_id VARCHAR(100),
+        bank_transaction_id VARCHAR(100),
+        tags TEXT[],
+        location VARCHAR(200),
+        receipt_url VARCHAR(500),
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Conta predefinida (chave do account_manager) como dimensão própria
+    ALTER TABLE transactions ADD COLUMN IF NOT EXISTS account_key VARCHAR(50);
+
+    -- Chave de idempotência (usuário + fluxo): reentregas e confirmações duplas não duplicam
+    ALTER TABLE transactions ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(100);
+
+    -- Texto pesquisável (português) para /buscar
+    ALTER TABLE transactions ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector('portuguese',
+                coalesce(title, '') || ' ' || coalesce(description, '') || ' ' || coalesce(notes, ''))
+        ) STORED;
+
+    -- Tabela de orçamentos
+    CREATE TABLE IF NOT EXISTS budgets (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        category_id INTEGER REFERENCES categories(id) ON DELETE CASCADE,
+        month_year DATE NOT NULL,
+        budget_limit DECIMAL(15,2) NOT NULL,
+        spent_amount DECIMAL(15,2) DEFAULT 0,
+        is_active BOOLEAN DEFAULT true,
+        alert_at_percent INTEGER DEFAULT 80,
+        alert_sent BOOLEAN DEFAULT false,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, category_id, month_year)
+    );
+
+    -- Tabela de alertas
+    CREATE TABLE IF NOT EXISTS alerts (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        alert_type VARCHAR(30) NOT NULL CHECK (alert_type IN ('goal_progress', 'budget_exceeded', 'bill_due', 'goal_completed', 'overspending')),
+        title VARCHAR(200) NOT NULL,
+        message TEXT NOT NULL,
+        related_id INTEGER,
+        related_type VARCHAR(20),
+        is_read BOOLEAN DEFAULT false,
+        is_sent BOOLEAN DEFAULT false,
+        priority INTEGER DEFAULT 1 CHECK (priority BETWEEN 1 AND 5),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP
+    );
+
+    -- Tabela de contas bancárias (Pluggy)
+    CREATE TABLE IF NOT EXISTS bank_accounts (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        bank_name VARCHAR(100) NOT NULL,
+        account_type VARCHAR(50) NOT NULL,
+        account_number VARCHAR(50),
+        balance DECIMAL(15,2) DEFAULT 0,
+        currency_code VARCHAR(10) DEFAULT 'BRL',
+        is_active BOOLEAN DEFAULT true,
+        pluggy_item_id VARCHAR(100),
+        pluggy_account_id VARCHAR(100),
+        last_sync TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, pluggy_account_id)
+    );
+
+    -- Tabela de cartões de crédito
+    CREATE TABLE IF NOT EXISTS credit_cards (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        bank_name VARCHAR(100) NOT NULL,
+        card_name VARCHAR(100) NOT NULL,
+        card_number_last4 VARCHAR(4),
+        credit_limit DECIMAL(15,2),
+        available_limit DECIMAL(15,2),
+        current_balance DECIMAL(15,2) DEFAULT 0,
+        due_date INTEGER, -- dia do mês
+        closing_date INTEGER, -- dia do mês
+        is_active BOOLEAN DEFAULT true,
+        pluggy_item_id VARCHAR(100),
+        pluggy_account_id VARCHAR(100),
+        last_sync TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, pluggy_account_id)
+    );
+
+    -- Categorização aprendida: palavra da descrição -> tipo e conta (categorizer.py)
+    CREATE TABLE IF NOT EXISTS category_mappings (
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        kind VARCHAR(10) NOT NULL,
+        token VARCHAR(50) NOT NULL,
+        type_key VARCHAR(30) NOT NULL,
+        account_key VARCHAR(30) NOT NULL DEFAULT '',
+        hits INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, kind, token, type_key, account_key)
+    );
+
+    -- Índices para performance (medidos com benchmarks.index_pack)
+    -- telegram_id já tem o índice da UNIQUE; is_active sozinho não filtra nada
+    DROP INDEX IF EXISTS idx_users_telegram_id;
+    DROP INDEX IF EXISTS idx_users_active;
+    CREATE INDEX IF NOT EXISTS idx_users_email ON users(email) WHERE email IS NOT NULL;
+    CREATE INDEX IF NOT EXISTS idx_categories_user_type ON categories(user_id, type);
+    CREATE INDEX IF NOT EXISTS idx_goals_user_id ON goals(user_id);
+    CREATE INDEX IF NOT EXISTS idx_goals_active ON goals(user_id, is_active, is_completed);
+    -- Extrato e busca paginam por (transaction_date, id): o id no índice faz da âncora um limite do scan
+    DROP INDEX IF EXISTS idx_transactions_user_date;
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_date_id ON transactions(user_id, transaction_date DESC, id DESC);
+    -- Totais por conta e do perfil saem só do índice (index-only scan com type e amount)
+    DROP INDEX IF EXISTS idx_transactions_user_account_date;
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_account_cover
+        ON transactions(user_id, account_key, transaction_date DESC) INCLUDE (type, amount);
+    CREATE INDEX IF NOT EXISTS idx_transactions_search ON transactions USING GIN (search_vector);
+    CREATE INDEX IF NOT EXISTS idx_transactions_tags ON transactions USING GIN (tags);
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_idempotency
+        ON transactions(idempotency_key) WHERE idempotency_key IS NOT NULL;
+    CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions(category_id);
+    CREATE INDEX IF NOT EXISTS idx_transactions_goal ON transactions(goal_id);
+    -- FK auto-referenciada: sem índice, cada DELETE varre a tabela inteira
+    CREATE INDEX IF NOT EXISTS idx_transactions_parent
+        ON transactions(parent_transaction_id) WHERE parent_transaction_id IS NOT NULL;
+    -- Limpeza do /demo sem percorrer o histórico inteiro do usuário (mesmo predicado do CLEAR_DEMO_SQL)
+    CREATE INDEX IF NOT EXISTS idx_transactions_demo ON transactions(user_id) WHERE notes LIKE '%DEMO%';
+    CREATE INDEX IF NOT EXISTS idx_budgets_user_month ON budgets(user_id, month_year);
+    CREATE INDEX IF NOT EXISTS idx_alerts_user_unread ON alerts(user_id, is_read, created_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_bank_accounts_user ON bank_accounts(user_id, is_active);
+    CREATE INDEX IF NOT EXISTS idx_bank_accounts_pluggy ON bank_accounts(pluggy_item_id, pluggy_account_id);
+    CREATE INDEX IF NOT EXISTS idx_credit_cards_user ON credit_cards(user_id, is_active);
+    CREATE INDEX IF NOT EXISTS idx_credit_cards_pluggy ON credit_cards(pluggy_item_id, pluggy_account_id);
+
+    -- Triggers para updated_at
+    DROP TRIGGER IF EXISTS update_goals_updated_at ON goals;
+    CREATE TRIGGER update_goals_updated_at BEFORE UPDATE ON goals FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+    DROP TRIGGER IF EXISTS update_transactions_updated_at ON transactions;
+    CREATE TRIGGER update_transactions_updated_at BEFORE UPDATE ON transactions FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+    DROP TRIGGER IF EXISTS update_budgets_updated_at ON budgets;
+    CREATE TRIGGER update_budgets_updated_at BEFORE UPDATE ON budgets FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+'''
+SCHEMA_VERSION = hashlib.sha256(SCHEMA_SQL.encode('utf-8')).hexdigest()[:16]
+
+# Colunas do usuário usadas pelos handlers (nada de SELECT *: hash de senha fica no banco)
+USER_COLUMNS = 'id, telegram_id, telegram_username, full_name, email, is_active, created_at'
+
+GET_USER_SQL = f"SELECT {USER_COLUMNS} FROM users WHERE telegram_id = $1 AND is_active = true"
+
+# Busca e criação em um round trip: usuário existente não gera escrita; no primeiro
+# contato, mensagens simultâneas do mesmo usuário se resolvem no ON CONFLICT
+GET_OR_CREATE_USER_SQL = f"""
+    WITH found AS (
+        SELECT {USER_COLUMNS}, false AS created FROM users WHERE telegram_id = $1
+    ), inserted AS (
+        INSERT INTO users (telegram_id, telegram_username, first_name, last_name, full_name)
+        SELECT $1, $2::text, $3::text, $4::text, $5::text
+        WHERE NOT EXISTS (SELECT 1 FROM found)
+        ON CONFLICT (telegram_id) DO UPDATE SET telegram_username = EXCLUDED.telegram_username
+        RETURNING {USER_COLUMNS}, (xmax = 0) AS created
+    )
+    SELECT * FROM found
+    UNION ALL
+    SELECT * FROM inserted
+"""
+
+# Chave do advisory lock que serializa migrações entre réplicas
+SCHEMA_LOCK_ID = 802410001
+
+class FinancialBot:
+    def __init__(self):
+        self._openai_client = None
+        self._warmup_task = None
+        self.schema_migrated = False
+        self.db_pool = None
+        self.db_read_pool = None
+        self.recent_writes = RecentWrites(READ_YOUR_WRITES_WINDOW)
+        # Fila de group commit das transações (TRANSACTION_INGEST_MODE, desligada por padrão)
+        self.ingestor = TransactionIngestor(self)
+        self.demo_data = DemoDataLoader(self)
+        # Sugestão de categoria/conta aprendida com o histórico de cada usuário
+        self.categorizer = Categorizer(self)
+        self.register_callbacks()
+    
+    @property
+    def openai_client(self):
+        """Cliente OpenAI criado no primeiro uso (import adiado para acelerar o boot)"""
+        if self._openai_client is None and OPENAI_API_KEY:
+            import openai
+            self._openai_client = openai.OpenAI(api_key=OPENAI_API_KEY)
+        return self._openai_client
+    
+    async def init_database(self):
+        """Inicializar pool de conexões do banco PostgreSQL do Railway"""
+        if not DATABASE_URL:
+            raise ValueError("DATABASE_URL não configurada! Configure no Railway.")
+            
+        # Tamanho, timeouts e modo adaptativo via DB_POOL_* (ver db_pool.PoolSettings)
+        self.db_pool = await DatabasePool.create(DATABASE_URL)
+        
+        settings = self.db_pool.settings
+        logger.info(
+            f"🗄️ Conectado ao PostgreSQL do Railway "
+            f"(pool {settings.min_size}-{settings.max_size}{', adaptativo' if settings.adaptive else ''}, "
+            f"pooler {settings.pooler_mode})"
+        )
+        
+        # Réplica de leitura: indisponível no boot não impede o bot de subir
+        if DATABASE_READ_URL:
+            try:
+                self.db_read_pool = await DatabasePool.create(DATABASE_READ_URL, name='replica')
+                logger.info(f"📖 Réplica de leitura conectada (read-your-writes {READ_YOUR_WRITES_WINDOW:g}s)")
+            except Exception as e:
+                logger.warning(f"⚠️ Réplica de leitura indisponível, relatórios no primário: {e}")
+        
+        # Executar migrações apenas quando o schema mudou (várias réplicas: advisory lock)
+        async with self.db_pool.acquire() as conn:
+            if await self.schema_is_current(conn):
+                logger.info(f"✅ Schema do banco já atualizado (versão {SCHEMA_VERSION})")
+                return
+            
+            migration_timeout = self.db_pool.timeout_for('migration')
+            async with conn.transaction():
+                # Outra réplica pode estar criando índices: esperar o lock tanto quanto a própria migração
+                await conn.execute('SELECT pg_advisory_xact_lock($1)', SCHEMA_LOCK_ID, timeout=migration_timeout)
+                if await self.schema_is_current(conn):
+                    return
+                
+                await conn.execute(SCHEMA_SQL, timeout=migration_timeout)
+                await conn.execute(
+                    'INSERT INTO schema_migrations (version) VALUES ($1) ON CONFLICT DO NOTHING',
+                    SCHEMA_VERSION
+                )
+            
+            self.schema_migrated = True
+            logger.info(f"✅ Schema do banco criado/atualizado com sucesso (versão {SCHEMA_VERSION})")
+    
+    async def schema_is_current(self, conn) -> bool:
+        """Verificar se a versão atual do schema já foi aplicada"""
+        if await conn.fetchval("SELECT to_regclass('schema_migrations')") is None:
+            return False
+        return await conn.fetchval(
+            'SELECT EXISTS (SELECT 1 FROM schema_migrations WHERE version = $1)', SCHEMA_VERSION
+        )
+    
+    def start_warmup(self):
+        """Agendar tarefas não críticas para depois que o bot começar a receber updates"""
+        if self._warmup_task is None:
+            self._warmup_task = asyncio.create_task(self.warmup())
+        return self._warmup_task
+    
+    async def warmup(self):
+        """Aquecimento em segundo plano (não bloqueia o início do polling)"""
+        try:
+            # Preencher account_key de transações antigas (notes/tags) após migrações
+            if self.schema_migrated:
+                await self.backfill_account_keys()
+            
+            # Abrir conexões do pool antes da primeira rajada de updates
+            await self.db_pool.warm()
+            if self.db_read_pool:
+                await self.db_read_pool.warm()
+            
+            logger.info("🔥 Aquecimento concluído")
+        except Exception as e:
+            logger.warning(f"Aquecimento incompleto: {e}")
+    
+    async def backfill_account_keys(self, batch_size: int = 500):
+        """Migrar conta de notes/tags para a coluna account_key em lotes"""
+        from account_manager import account_manager
+        
+        keys = list(account_manager.account_keys)
+        names = list(account_manager.account_names)
+        
+        # Lote por keyset no id: tags têm prioridade, depois "Conta: <nome>" em notes
+        query = """
+            WITH batch AS (
+                SELECT id, tags, notes FROM transactions
+                WHERE account_key IS NULL AND id > $3
+                  AND (tags && $1::text[] OR notes LIKE 'Conta: %')
+                ORDER BY id
+                LIMIT $4
+            ), resolved AS (
+                SELECT b.id, COALESCE(
+                    (SELECT tag FROM unnest(b.tags) AS tag WHERE tag = ANY($1::text[]) LIMIT 1),
+                    (SELECT m.key FROM unnest($1::text[], $2::text[]) AS m(key, name)
+                     WHERE b.notes LIKE 'Conta: ' || m.name || '%' LIMIT 1)
+                ) AS account_key
+                FROM batch b
+            ), updated AS (
+                UPDATE transactions t SET account_key = r.account_key
+                FROM resolved r
+                WHERE t.id = r.id AND r.account_key IS NOT NULL
+                RETURNING t.id
+            )
+            SELECT (SELECT MAX(id) FROM batch) AS last_id,
+                   (SELECT COUNT(*) FROM updated) AS updated
+        """
+        
+        last_id = 0
+        total = 0
+        try:
+            while True:
+                result = await self.execute_query_one(query, (keys, names, last_id, batch_size), query_class='batch')
+                if not result or result['last_id'] is None:
+                    break
+                last_id = result['last_id']
+                total += result['updated']
+            
+            if total:
+                logger.info(f"🔄 account_key preenchido em {total} transações")
+        except Exception as e:
+            logger.warning(f"Erro no backfill de account_key: {e}")
+    
+    async def start_command(self, update: Update, context):
+        """Comando /start com autenticação"""
+        telegram_user = update.effective_user
+        
+        # Verificar se usuário está cadastrado
+        async with self.db_pool.acquire() as conn:
+            existing_user = await conn.fetchrow(
+                "SELECT id, full_name, is_active FROM users WHERE telegram_id = $1",
+                telegram_user.id
             )
+        
+        if existing_user:
+            if existing_user['is_active']:
+                # Usuário já cadastrado
+                is_authenticated = context.user_data.get('authenticated', False)
+                
+                if is_authenticated:
+                    welcome_text = f"""🤖 *Bem-vindo de volta, {existing_user['full_name']}!* 
+
+✅ *Sistema ativo e funcionando*
+💰 Análise de gastos inteligente
+📊 Integração com +200 bancos
+🎯 Metas financeiras personalizadas
+💡 Conselhos de investimento com IA
+
+*Sistema manual ativo! Funcionalidades:*
+💰 Receitas com contas predefinidas
+💸 Despesas com parcelamento automático
+🏦 8 contas bancárias configuradas
+📊 Análises inteligentes com IA
+
+*Use os botões abaixo ou comandos diretos:*"""
+                    
+                    keyboard = [
+                        [InlineKeyboardButton("💰 Receitas", callback_data=encode_callback(MENU_ROUTE, "revenue")),
+                         InlineKeyboardButton("💸 Despesas", callback_data=encode_callback(MENU_ROUTE, "expense"))],
+                        [InlineKeyboardButton("💰 Saldo", callback_data=encode_callback(MENU_ROUTE, "balance")),
+                         InlineKeyboardButton("� Perfil", callback_data=encode_callback(MENU_ROUTE, "profile"))],
+                        [InlineKeyboardButton("� Dashboard", callback_data=encode_callback(MENU_ROUTE, "summary"))]
+                    ]
+                else:
+                    welcome_text = f"""🤖 *Olá {telegram_user.first_name}!* 
+
+✅ *Você já possui cadastro no sistema*
+🔐 Faça login para acessar suas funcionalidades
+
+*Após o login:*
+💰 Análise de gastos inteligente
+📊 Integração com +200 bancos
+🎯 Metas financeiras personalizadas
+💡 Conselhos de investimento com IA"""
+                    
+                    keyboard = [
+                        [InlineKeyboardButton("🔐 Fazer Login", callback_data=encode_callback(MENU_ROUTE, "login"))],
+                        [InlineKeyboardButton("ℹ️ Sobre o Sistema", callback_data=encode_callback(MENU_ROUTE, "about"))]
+                    ]
+            else:
+                welcome_text = f"""🤖 *Olá {telegram_user.first_name}!* 
+
+⚠️ *Sua conta está inativa*
+Entre em contato com o suporte para reativar.
+
+📧 Suporte disponível através do comando /ajuda"""
+                
+                keyboard = [
+                    [InlineKeyboardButton("📧 Solicitar Suporte", callback_data=encode_callback(MENU_ROUTE, "support"))]
+                ]
+        else:
+            # Novo usuário - precisa se cadastrar
+            welcome_text = f"""🤖 *Bem-vindo {telegram_user.first_name}!* 
+
+🚀 *Bot IA Financeiro - Sistema Completo*
+💰 Análise de gastos inteligente
+📊 Integração com +200 bancos brasileiros
+🎯 Metas financeiras personalizadas
+💡 Conselhos de investimento com IA
+🔒 Total segurança com criptografia
+
+📝 *Para começar, você precisa se cadastrar:*"""
+            
+            keyboard = [
+                [InlineKeyboardButton("📝 Criar Conta", callback_data=encode_callback(MENU_ROUTE, "registration"))],
+                [InlineKeyboardButton("ℹ️ Sobre o Sistema", callback_data=encode_callback(MENU_ROUTE, "about"))],
+                [InlineKeyboardButton("🔒 Segurança", callback_data=encode_callback(MENU_ROUTE, "security"))]
+            ]
+        
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        await update.message.reply_text(
+            welcome_text, 
+            parse_mode='Markdown',
+            reply_markup=reply_markup
+        )
+    
+    def register_callbacks(self):
+        """Registrar as rotas do menu principal no callback_router"""
+        callback_router.register(MENU_ROUTE, self.menu_callback)
+        for legacy_data, menu_key in LEGACY_MENU_CALLBACKS.items():
+            callback_router.register(legacy_data, self._legacy_menu_callback(menu_key))
+        callback_router.set_fallback(self.menu_callback)
+    
+    def _legacy_menu_callback(self, menu_key):
+        async def legacy_callback(update: Update, context):
+            return await self.menu_callback(update, context, menu_key)
+        return legacy_callback
+    
+    async def menu_callback(self, update: Update, context, menu_key=None):
+        """Exibir texto do botão do menu principal (rota "m")"""
+        query = update.callback_query
+        await query.answer()
+        
+        text = MENU_TEXTS.get(menu_key, MENU_FALLBACK_TEXT)
+        await query.edit_message_text(text, parse_mode='Markdown')
+    
+    async def callback_handler(self, update: Update, context):
+        """Handler para callbacks dos botões (despacho pelo callback_router)"""
+        return await callback_router.dispatch(update, context)
 
     async def get_or_create_user(self, telegram_user):
-        """Obter ou criar usuário"""
+        """Obter ou criar usuário (um statement atômico, sem SELECT-then-INSERT)"""
         try:
-            # Verificar se o usuário já existe
-            existing_user = await self.get_user_by_telegram_id(telegram_user.id)
-            if existing_user:
-                return existing_user
-            
-            # Criar novo usuário
+            first_name = telegram_user.first_name or "Usuário"
             user_data = (
                 telegram_user.id,
-                telegram_user.username or telegram_user.first_name,
-                telegram_user.first_name or "Usuário"
+                telegram_user.username,
+                first_name,
+                telegram_user.last_name,
+                ' '.join(filter(None, (first_name, telegram_user.last_name)))
             )
             
-            query = """
-                INSERT INTO users (telegram_id, username, full_name) 
-                VALUES ($1, $2, $3) 
-                RETURNING id, telegram_id, username, full_name, created_at
-            """
-            
-            user = await self.execute_query_one(query, user_data)
-            logger.info(f"Novo usuário criado: {user['full_name']} (ID: {user['telegram_id']})")
+            user = await self.execute_query_one(GET_OR_CREATE_USER_SQL, user_data)
+            if user.pop('created'):
+                logger.info(f"Novo usuário criado: {user['full_name']} (ID: {user['telegram_id']})")
             return user
             
         except Exception as e:
@@ -564,37 +765,148 @@ Digite um comando para continuar!""",
             raise
 
     async def get_user_by_telegram_id(self, telegram_id):
-        """Buscar usuário por ID do Telegram"""
+        """Buscar usuário ativo por ID do Telegram"""
         try:
-            async with self.db_pool.acquire() as conn:
-                user = await conn.fetchrow(
-                    "SELECT * FROM users WHERE telegram_id = $1 AND is_active = true",
-                    telegram_id
-                )
-                return dict(user) if user else None
+            return await self.execute_query_one(GET_USER_SQL, (telegram_id,))
         except Exception as e:
             logger.error(f"Erro ao buscar usuário {telegram_id}: {e}")
             return None
 
-    async def execute_query_one(self, query, params=None):
-        """Executar query que retorna um registro"""
+    async def _run_query(self, pool, method, query, params, query_class):
+        """Executar no pool indicado com o timeout da classe da query"""
         try:
-            async with self.db_pool.acquire() as conn:
-                result = await conn.fetchrow(query, *(params or []))
-                return dict(result) if result else None
+            # db.statement é resumido na thread do exportador (custo zero fora da amostra)
+            with tracer.span(f'db.{method}', **{'db.pool': pool.name, 'db.class': query_class,
+                                                 'db.statement': query}):
+                async with pool.acquire() as conn:
+                    return await getattr(conn, method)(query, *(params or []), timeout=pool.timeout_for(query_class))
+        except asyncio.TimeoutError:
+            pool.record_timeout(query_class)
+            logger.error(f"Timeout na query ({query_class}, pool {pool.name})")
+            raise
         except Exception as e:
             logger.error(f"Erro na query: {e}")
             raise
 
-    async def execute_query(self, query, params=None):
-        """Executar query que retorna múltiplos registros"""
+    async def execute_query_one(self, query, params=None, query_class='interactive'):
+        """Executar query que retorna um registro (timeout pela classe da query)"""
+        result = await self._run_query(self.db_pool, 'fetchrow', query, params, query_class)
+        return dict(result) if result else None
+
+    async def execute_query(self, query, params=None, query_class='interactive'):
+        """Executar query que retorna múltiplos registros (timeout pela classe da query)"""
+        results = await self._run_query(self.db_pool, 'fetch', query, params, query_class)
+        return [dict(row) for row in results] if results else []
+
+    async def execute_write(self, query, params=None, user_id=None, query_class='interactive'):
+        """Escrita no primário; abre a janela de read-your-writes do usuário"""
+        result = await self.execute_query_one(query, params, query_class)
+        if user_id is not None:
+            self.recent_writes.mark(user_id)
+        return result
+
+    async def insert_transaction(self, query, params, idempotency_key, user_id=None):
+        """INSERT idempotente (ON CONFLICT DO NOTHING RETURNING id)
+
+        Se a chave já existe retorna a transação gravada antes, marcada com
+        duplicate=True, em vez de criar outra linha.
+        """
+        result = await self.execute_write(query, params, user_id=user_id)
+        if result is not None:
+            return result
+        
+        existing = await self.execute_query_one(
+            "SELECT id FROM transactions WHERE idempotency_key = $1", (idempotency_key,)
+        )
+        if existing:
+            existing['duplicate'] = True
+            logger.info(f"Transação repetida ignorada (chave {idempotency_key})")
+        return existing
+
+    async def save_transaction(self, record):
+        """Gravar transação (ver transaction_ingestor.transaction_record)
+
+        Com a ingestão ligada entra na fila de group commit; sem ela é um
+        INSERT idempotente direto.
+        """
+        if self.ingestor.enabled:
+            with tracer.span('ingest.submit', **{'ingest.mode': self.ingestor.settings.mode}):
+                return await self.ingestor.submit(record)
+        return await self.insert_transaction(
+            SINGLE_INSERT_SQL, record_params(record), record['idempotency_key'], user_id=record['user_id']
+        )
+
+    async def save_transactions(self, records):
+        """Gravar várias transações juntas, tudo ou nada (ex.: as parcelas de uma compra)
+
+        Um único INSERT direto no primário, com ou sem a fila de ingestão: na
+        fila os registros poderiam cair em lotes diferentes e um rejeitado
+        deixaria a compra pela metade. Resultados na ordem dos registros;
+        chaves já gravadas voltam com duplicate=True, como em insert_transaction.
+        """
+        rows = await self.execute_query(BATCH_INSERT_SQL, (batch_payload(records),))
+        inserted = {row['idempotency_key']: row['id'] for row in rows}
+        
+        missing = [record['idempotency_key'] for record in records if record['idempotency_key'] not in inserted]
+        existing = {}
+        if missing:
+            existing = {row['idempotency_key']: row['id'] for row in await self.execute_query(EXISTING_KEYS_SQL, (missing,))}
+            logger.info(f"{len(existing)} transações repetidas ignoradas")
+        
+        for user_id in {record['user_id'] for record in records}:
+            self.recent_writes.mark(user_id)
+        
+        results = []
+        for record in records:
+            key = record['idempotency_key']
+            if key in inserted:
+                results.append({'id': inserted[key]})
+            elif key in existing:
+                results.append({'id': existing[key], 'duplicate': True})
+            else:
+                results.append(None)
+        return results
+
+    def read_pool_for(self, user_id=None):
+        """Pool para leituras do usuário: réplica, salvo escrita recente dele"""
+        if self.db_read_pool is None:
+            return self.db_pool
+        if user_id is not None and self.recent_writes.is_recent(user_id):
+            return self.db_pool
+        return self.db_read_pool
+
+    async def _run_read(self, method, query, params, user_id, query_class):
+        pool = self.read_pool_for(user_id)
         try:
-            async with self.db_pool.acquire() as conn:
-                results = await conn.fetch(query, *(params or []))
-                return [dict(row) for row in results] if results else []
-        except Exception as e:
-            logger.error(f"Erro na query: {e}")
-            raise
+            return await self._run_query(pool, method, query, params, query_class)
+        except CONNECTION_ERRORS:
+            if pool is self.db_pool:
+                raise
+            logger.warning("Réplica de leitura falhou, repetindo no primário")
+            return await self._run_query(self.db_pool, method, query, params, query_class)
+
+    async def execute_read_one(self, query, params=None, user_id=None, query_class='report'):
+        """Leitura (relatórios) que retorna um registro, na réplica quando configurada"""
+        result = await self._run_read('fetchrow', query, params, user_id, query_class)
+        return dict(result) if result else None
+
+    async def execute_read(self, query, params=None, user_id=None, query_class='report'):
+        """Leitura (relatórios) que retorna múltiplos registros, na réplica quando configurada"""
+        results = await self._run_read('fetch', query, params, user_id, query_class)
+        return [dict(row) for row in results] if results else []
+
+    async def get_account_totals(self, user_id):
+        """Totais de receitas e despesas por conta predefinida"""
+        query = """
+            SELECT account_key,
+                   COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END), 0) AS total_receitas,
+                   COALESCE(SUM(CASE WHEN type = 'expense' THEN ABS(amount) ELSE 0 END), 0) AS total_despesas,
+                   COUNT(*) AS transacoes
+            FROM transactions
+            WHERE user_id = $1 AND account_key IS NOT NULL
+            GROUP BY account_key
+        """
+        return await self.execute_read(query, (user_id,), user_id=user_id)
 
     async def get_user_accounts(self, user_id):
         """Buscar contas bancárias do usuário"""
@@ -604,7 +916,7 @@ Digite um comando para continuar!""",
                 WHERE user_id = $1 AND is_active = true
                 ORDER BY bank_name
             """
-            accounts = await self.execute_query(query, (user_id,))
+            accounts = await self.execute_read(query, (user_id,), user_id=user_id, query_class='interactive')
             
             # Se não há contas na base local, tentar buscar via Pluggy
             if not accounts:
@@ -697,8 +1009,8 @@ Digite um comando para continuar!""",
                 account.get('id')
             )
             
-            await self.execute_query_one(query, params)
-            logger.info(f"Conta salva no DB: {account.get('id')}")
+            await self.execute_write(query, params, user_id=user_id)
+            logger.debug(f"Conta salva no DB: {account.get('id')}")
             
         except Exception as e:
             logger.error(f"Erro ao salvar conta no DB: {e}")
@@ -706,140 +1018,22 @@ Digite um comando para continuar!""",
 
 
     async def create_demo_accounts(self, user_id):
-        """Criar contas e dados de demonstração para o usuário"""
+        """Criar contas e dados de demonstração para o usuário (carga set-based em uma transação)"""
         try:
-            # Limpar dados demo existentes
-            await self.clear_demo_data(user_id)
-            
-            # Inserir contas bancárias de exemplo
-            demo_accounts = [
-                ('Nubank', 'Conta Corrente', '****1234', 2450.00, 'BRL', 'demo_nubank', 'demo_acc_1'),
-                ('Banco Inter', 'Conta Corrente', '****5678', 1800.00, 'BRL', 'demo_inter', 'demo_acc_2'),
-                ('Itaú', 'Conta Poupança', '****9012', 5200.00, 'BRL', 'demo_itau', 'demo_acc_3')
-            ]
-            
-            for account_data in demo_accounts:
-                query = """
-                    INSERT INTO bank_accounts (
-                        user_id, bank_name, account_type, account_number, 
-                        balance, currency_code, is_active, pluggy_item_id, 
-                        pluggy_account_id, last_sync
-                    ) VALUES ($1, $2, $3, $4, $5, $6, true, $7, $8, CURRENT_TIMESTAMP)
-                """
-                await self.execute_query_one(query, (user_id,) + account_data)
-            
-            # Inserir cartões de exemplo
-            demo_cards = [
-                ('Nubank', 'Nubank Mastercard', '1234', 3000.00, 2850.00, 150.00, 15, 8, 'demo_nu_card'),
-                ('Banco Inter', 'Inter Gold Visa', '5678', 5000.00, 4200.00, 800.00, 10, 3, 'demo_inter_card')
-            ]
-            
-            for card_data in demo_cards:
-                query = """
-                    INSERT INTO credit_cards (
-                        user_id, bank_name, card_name, card_number_last4,
-                        credit_limit, available_limit, current_balance,
-                        due_date, closing_date, is_active, pluggy_account_id,
-                        last_sync
-                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, true, $10, CURRENT_TIMESTAMP)
-                """
-                await self.execute_query_one(query, (user_id,) + card_data)
-            
-            # Criar categorias de exemplo
-            await self.create_demo_categories(user_id)
-            
-            # Criar meta de exemplo
-            await self.create_demo_goal(user_id)
-            
-            # Criar transações de exemplo
-            await self.create_demo_transactions(user_id)
-            
-            logger.info(f"Dados demo criados para usuário {user_id}")
+            counts = await self.demo_data.seed_demo(user_id)
+            logger.info(f"Dados demo criados para usuário {user_id}: {counts}")
             
         except Exception as e:
             logger.error(f"Erro ao criar dados demo: {e}")
             raise
 
-    async def clear_demo_data(self, user_id):
-        """Limpar dados demo existentes"""
-        try:
-            # Limpar apenas dados marcados como demo
-            queries = [
-                "DELETE FROM bank_accounts WHERE user_id = $1 AND pluggy_item_id LIKE 'demo_%'",
-                "DELETE FROM credit_cards WHERE user_id = $1 AND pluggy_account_id LIKE 'demo_%'",
-                "DELETE FROM transactions WHERE user_id = $1 AND notes LIKE '%DEMO%'",
-                "DELETE FROM goals WHERE user_id = $1 AND title LIKE '%Demo%'"
-            ]
-            
-            for query in queries:
-                await self.execute_query_one(query, (user_id,))
-                
-        except Exception as e:
-            logger.warning(f"Erro ao limpar dados demo: {e}")
-
-    async def create_demo_categories(self, user_id):
-        """Criar categorias de exemplo"""
-        try:
-            categories = [
-                ('Alimentação', 'expense', '🍽️'),
-                ('Transporte', 'expense', '🚗'),
-                ('Lazer', 'expense', '🎮'),
-                ('Salário', 'income', '💰'),
-                ('Freelance', 'income', '💻')
-            ]
-            
-            for name, type_, icon in categories:
-                # Verificar se já existe primeiro
-                existing = await self.execute_query_one(
-                    "SELECT id FROM categories WHERE user_id = $1 AND name = $2", 
-                    (user_id, name)
-                )
-                
-                if not existing:
-                    query = """
-                        INSERT INTO categories (user_id, name, type, icon, is_active)
-                        VALUES ($1, $2, $3, $4, true)
-                    """
-                    await self.execute_query_one(query, (user_id, name, type_, icon))
-                
-        except Exception as e:
-            logger.warning(f"Erro ao criar categorias demo: {e}")
-
-    async def create_demo_goal(self, user_id):
-        """Criar meta de exemplo"""
-        try:
-            from datetime import date
-            
-            query = """
-                INSERT INTO goals (
-                    user_id, title, description, goal_type, target_amount,
-                    current_amount, target_date, priority, is_active
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, true)
-            """
-            
-            goal_data = (
-                user_id,
-                'Reserva de Emergência - Demo',
-                'Meta de exemplo: construir reserva de emergência equivalente a 6 meses de gastos',
-                'emergency_fund',
-                10000.00,
-                3200.00,
-                date(2025, 12, 31),
-                1
-            )
-            
-            await self.execute_query_one(query, goal_data)
-            
-        except Exception as e:
-            logger.warning(f"Erro ao criar meta demo: {e}")
-
     async def get_or_create_category(self, user_id: int, name: str, type_: str) -> dict:
         """Buscar ou criar categoria"""
         try:
             # Primeiro tentar buscar categoria existente
             existing = await self.execute_query_one(
-                "SELECT id, name, type, icon FROM categories WHERE user_id = $1 AND name = $2",
-                (user_id, name)
+                "SELECT id, name, type, icon FROM categories WHERE user_id = $1 AND name = $2 AND type = $3",
+                (user_id, name, type_)
             )
             
             if existing:
@@ -873,56 +1067,29 @@ Digite um comando para continuar!""",
                 RETURNING id, name, type, icon
             """
             
-            result = await self.execute_query_one(query, (user_id, name, type_, icon))
+            result = await self.execute_write(query, (user_id, name, type_, icon), user_id=user_id)
             return result
             
         except Exception as e:
             logger.error(f"Erro ao buscar/criar categoria: {e}")
             return None
 
-    async def create_demo_transactions(self, user_id):
-        """Criar transações de exemplo"""
-        try:
-            from datetime import date
-            
-            # Buscar IDs das categorias
-            alimentacao = await self.execute_query_one(
-                "SELECT id FROM categories WHERE user_id = $1 AND name = 'Alimentação'", 
-                (user_id,)
-            )
-            transporte = await self.execute_query_one(
-                "SELECT id FROM categories WHERE user_id = $1 AND name = 'Transporte'", 
-                (user_id,)
-            )
-            salario = await self.execute_query_one(
-                "SELECT id FROM categories WHERE user_id = $1 AND name = 'Salário'", 
-                (user_id,)
-            )
-            
-            transactions = [
-                ('Supermercado', 'Compras semanais', 125.50, 'expense', alimentacao['id'] if alimentacao else None, date(2025, 11, 3)),
-                ('Uber', 'Corrida para trabalho', 25.00, 'expense', transporte['id'] if transporte else None, date(2025, 11, 2)),
-                ('Salário Novembro', 'Pagamento mensal', 4500.00, 'income', salario['id'] if salario else None, date(2025, 11, 1)),
-                ('Restaurante', 'Almoço executivo', 45.00, 'expense', alimentacao['id'] if alimentacao else None, date(2025, 10, 30)),
-                ('Combustível', 'Abastecimento', 180.00, 'expense', transporte['id'] if transporte else None, date(2025, 10, 28))
-            ]
-            
-            for title, desc, amount, type_, cat_id, transaction_date in transactions:
-                query = """
-                    INSERT INTO transactions (
-                        user_id, title, description, amount, type, category_id,
-                        transaction_date, status, notes
-                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, 'paid', 'DEMO - Dados de exemplo')
-                """
-                await self.execute_query_one(query, (user_id, title, desc, amount, type_, cat_id, transaction_date))
-                
-        except Exception as e:
-            logger.warning(f"Erro ao criar transações demo: {e}")
+def run_bot():
+    """Montar a aplicação a partir do registro de handlers e iniciar o polling"""
+    from handler_registry import build_application
+    
+    bot = FinancialBot()
+    application = build_application(bot, TELEGRAM_TOKEN)
+    
+    # Iniciar bot
+    logger.info("🤖 Bot Telegram IA Financeiro iniciado!")
+    application.run_polling(allowed_updates=Update.ALL_TYPES)
 
-async def main():
+def main():
     """Função principal"""
-    # Iniciar servidor de health check em thread separada APENAS se não estiver em loop asyncio
+    # Iniciar servidor de health check em thread separada
     try:
+        from health_server import start_health_server
         health_thread = threading.Thread(target=start_health_server, daemon=True)
         health_thread.start()
         PORT = int(os.getenv('PORT', 8080))
@@ -930,211 +1097,17 @@ async def main():
     except Exception as e:
         logger.warning(f"Health server warning: {e}")
     
-    bot = FinancialBot()
-    
-    # Inicializar banco de dados
-    await bot.init_database()
-    
-    # Configurar aplicação do Telegram
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
-    
-    # Handlers básicos
-    application.add_handler(CommandHandler("start", bot.start_command))
-    
-    # Configurar bot_commands
-    from bot_commands import (BotCommands, WAITING_FULL_NAME, WAITING_EMAIL, WAITING_PASSWORD, 
-                             WAITING_LOGIN_PASSWORD, WAITING_OLD_PASSWORD, WAITING_NEW_PASSWORD,
-                             WAITING_EXPENSE_TITLE, WAITING_EXPENSE_AMOUNT, WAITING_EXPENSE_CATEGORY,
-                             WAITING_GOAL_TITLE, WAITING_GOAL_AMOUNT, WAITING_GOAL_TYPE)
-    from telegram.ext import ConversationHandler, MessageHandler, CallbackQueryHandler, filters
-    
-    bot_commands = BotCommands(bot)
-    
-    # ConversationHandler para cadastro
-    registration_handler = ConversationHandler(
-        entry_points=[CommandHandler('cadastro', bot_commands.start_registration)],
-        states={
-            WAITING_FULL_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_full_name)],
-            WAITING_EMAIL: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_email)],
-            WAITING_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_password)],
-        },
-        fallbacks=[CommandHandler('cancelar', bot_commands.cancel_operation)],
-    )
-    
-    # ConversationHandler para login
-    login_handler = ConversationHandler(
-        entry_points=[CommandHandler('login', bot_commands.login_command)],
-        states={
-            WAITING_LOGIN_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_login_password)],
-        },
-        fallbacks=[CommandHandler('cancelar', bot_commands.cancel_operation)],
-    )
-    
-    # ConversationHandler para alteração de senha
-    change_password_handler = ConversationHandler(
-        entry_points=[CommandHandler('trocar_senha', bot_commands.change_password_command)],
-        states={
-            WAITING_OLD_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_old_password)],
-            WAITING_NEW_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_new_password)],
-        },
-        fallbacks=[CommandHandler('cancelar', bot_commands.cancel_operation)],
-    )
-    
-    # Adicionar conversation handlers
-    application.add_handler(registration_handler)
-    application.add_handler(login_handler)
-    application.add_handler(change_password_handler)
-    
-    # Comandos de autenticação
-    application.add_handler(CommandHandler('perfil', bot_commands.profile_command))
-    application.add_handler(CommandHandler('logout', bot_commands.logout_command))
-    
-    # ConversationHandlers para gestão financeira
-    expense_handler = ConversationHandler(
-        entry_points=[CommandHandler('despesas', bot_commands.expenses_command)],
-        states={
-            WAITING_EXPENSE_TITLE: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_expense_title)],
-            WAITING_EXPENSE_AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_expense_amount)],
-            WAITING_EXPENSE_CATEGORY: [CallbackQueryHandler(bot_commands.process_expense_category)],
-        },
-        fallbacks=[CommandHandler('cancelar', bot_commands.cancel_operation)],
-    )
-    
-    goal_handler = ConversationHandler(
-        entry_points=[CommandHandler('metas', bot_commands.goals_command)],
-        states={
-            WAITING_GOAL_TITLE: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_goal_title)],
-            WAITING_GOAL_AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_goal_amount)],
-            WAITING_GOAL_TYPE: [CallbackQueryHandler(bot_commands.process_goal_type)],
-        },
-        fallbacks=[CommandHandler('cancelar', bot_commands.cancel_operation)],
-    )
-    
-    application.add_handler(expense_handler)
-    application.add_handler(goal_handler)
-    
-    # Comandos financeiros diretos
-    application.add_handler(CommandHandler('relatorio', bot_commands.expense_report_command))
-    application.add_handler(CommandHandler('resumo', bot_commands.financial_summary_command))
-    
-    # Comandos de atalho
-    application.add_handler(CommandHandler('nova_despesa', bot_commands.start_add_expense))
-    application.add_handler(CommandHandler('nova_meta', bot_commands.start_add_goal))
-    
-    # Handler de callbacks
-    application.add_handler(CallbackQueryHandler(bot.callback_handler))
-    
-    # Iniciar bot
-    logger.info("🤖 Bot Telegram IA Financeiro iniciado!")
-    await application.run_polling(allowed_updates=Update.ALL_TYPES)
+    run_bot()
 
-async def main_bot_only():
+def main_bot_only():
     """Executar apenas o bot sem health server"""
-    bot = FinancialBot()
-    
-    # Inicializar banco de dados
-    await bot.init_database()
-    
-    # Configurar aplicação do Telegram
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
-    
-    # Handlers básicos
-    application.add_handler(CommandHandler("start", bot.start_command))
-    
-    # Configurar bot_commands
-    from bot_commands import (BotCommands, WAITING_FULL_NAME, WAITING_EMAIL, WAITING_PASSWORD, 
-                             WAITING_LOGIN_PASSWORD, WAITING_OLD_PASSWORD, WAITING_NEW_PASSWORD,
-                             WAITING_EXPENSE_TITLE, WAITING_EXPENSE_AMOUNT, WAITING_EXPENSE_CATEGORY,
-                             WAITING_GOAL_TITLE, WAITING_GOAL_AMOUNT, WAITING_GOAL_TYPE)
-    from telegram.ext import ConversationHandler, MessageHandler, CallbackQueryHandler, filters
-    
-    bot_commands = BotCommands(bot)
-    
-    # ConversationHandler para cadastro
-    registration_handler = ConversationHandler(
-        entry_points=[CommandHandler('cadastro', bot_commands.start_registration)],
-        states={
-            WAITING_FULL_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_full_name)],
-            WAITING_EMAIL: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_email)],
-            WAITING_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_password)],
-        },
-        fallbacks=[CommandHandler('cancelar', bot_commands.cancel_operation)],
-    )
-    
-    # ConversationHandler para login
-    login_handler = ConversationHandler(
-        entry_points=[CommandHandler('login', bot_commands.login_command)],
-        states={
-            WAITING_LOGIN_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_login_password)],
-        },
-        fallbacks=[CommandHandler('cancelar', bot_commands.cancel_operation)],
-    )
-    
-    # ConversationHandler para alteração de senha
-    change_password_handler = ConversationHandler(
-        entry_points=[CommandHandler('trocar_senha', bot_commands.change_password_command)],
-        states={
-            WAITING_OLD_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_old_password)],
-            WAITING_NEW_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_new_password)],
-        },
-        fallbacks=[CommandHandler('cancelar', bot_commands.cancel_operation)],
-    )
-    
-    # Adicionar conversation handlers
-    application.add_handler(registration_handler)
-    application.add_handler(login_handler)
-    application.add_handler(change_password_handler)
-    
-    # Comandos de autenticação
-    application.add_handler(CommandHandler('perfil', bot_commands.profile_command))
-    application.add_handler(CommandHandler('logout', bot_commands.logout_command))
-    
-    # ConversationHandlers para gestão financeira
-    expense_handler = ConversationHandler(
-        entry_points=[CommandHandler('despesas', bot_commands.expenses_command)],
-        states={
-            WAITING_EXPENSE_TITLE: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_expense_title)],
-            WAITING_EXPENSE_AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_expense_amount)],
-            WAITING_EXPENSE_CATEGORY: [CallbackQueryHandler(bot_commands.process_expense_category)],
-        },
-        fallbacks=[CommandHandler('cancelar', bot_commands.cancel_operation)],
-        per_message=True
-    )
-    
-    goal_handler = ConversationHandler(
-        entry_points=[CommandHandler('metas', bot_commands.goals_command)],
-        states={
-            WAITING_GOAL_TITLE: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_goal_title)],
-            WAITING_GOAL_AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.receive_goal_amount)],
-            WAITING_GOAL_TYPE: [CallbackQueryHandler(bot_commands.process_goal_type)],
-        },
-        fallbacks=[CommandHandler('cancelar', bot_commands.cancel_operation)],
-        per_message=True
-    )
-    
-    application.add_handler(expense_handler)
-    application.add_handler(goal_handler)
-    
-    # Comandos financeiros diretos
-    application.add_handler(CommandHandler('relatorio', bot_commands.expense_report_command))
-    application.add_handler(CommandHandler('resumo', bot_commands.financial_summary_command))
-    
-    # Comandos de atalho
-    application.add_handler(CommandHandler('nova_despesa', bot_commands.start_add_expense))
-    application.add_handler(CommandHandler('nova_meta', bot_commands.start_add_goal))
-    
-    # Handler de callbacks
-    application.add_handler(CallbackQueryHandler(bot.callback_handler))
-    
-    # Iniciar bot
-    logger.info("🤖 Bot Telegram IA Financeiro iniciado!")
-    await application.run_polling(allowed_updates=Update.ALL_TYPES)
+    run_bot()
 
 if __name__ == '__main__':
     # Em produção no Railway, executar bot sem health server para evitar conflito
     if os.getenv('RAILWAY_ENVIRONMENT'):
         logger.info("🚀 Modo Railway - executando apenas bot")
-        asyncio.run(main_bot_only())
+        main_bot_only()
     else:
         # Localmente, executar com health server
-        asyncio.run(main())
\ No newline at end of file
+        main()
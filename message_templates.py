@@ -0,0 +1,164 @@
+"""
+Sistema de Templates de Mensagens
+Templates pré-compilados para respostas em Markdown do Telegram
+"""
+from typing import Iterable, List, Mapping, Optional
+import string
+
+# Limite de caracteres de uma mensagem do Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Caracteres especiais do Markdown (legado) do Telegram
+_MARKDOWN_ESCAPE_TABLE = str.maketrans({
+    '_': '\\_',
+    '*': '\\*',
+    '`': '\\`',
+    '[': '\\[',
+})
+
+_formatter = string.Formatter()
+
+
+def escape_markdown(value) -> str:
+    """Escapar texto livre (descrições, nomes) para parse_mode='Markdown'"""
+    return str(value).translate(_MARKDOWN_ESCAPE_TABLE)
+
+
+class MessageTemplate:
+    """Template compilado uma única vez; campos de texto são escapados por padrão
+
+    Sintaxe igual à de str.format. Use {campo!r} para inserir um trecho já
+    formatado (sem escape), por exemplo um bloco renderizado por outro template.
+    """
+
+    __slots__ = ('source', '_parts')
+
+    def __init__(self, source: str):
+        self.source = source
+        parts = []
+        for literal, field_name, format_spec, conversion in _formatter.parse(source):
+            if field_name is None:
+                parts.append((literal, None, None, False))
+                continue
+            if format_spec and '{' in format_spec:
+                raise ValueError(f"Campos aninhados não suportados: {field_name}")
+            if conversion not in (None, 'r'):
+                raise ValueError(f"Conversão não suportada: !{conversion}")
+            parts.append((literal, field_name, format_spec, conversion == 'r'))
+        self._parts = tuple(parts)
+
+    def render_map(self, values: Mapping) -> str:
+        """Renderizar a partir de um dicionário (ex.: linha do banco)"""
+        pieces = []
+        append = pieces.append
+        for literal, field_name, format_spec, raw in self._parts:
+            if literal:
+                append(literal)
+            if field_name is None:
+                continue
+            value = values[field_name]
+            text = format(value, format_spec) if format_spec else str(value)
+            append(text if raw or not isinstance(value, str) else text.translate(_MARKDOWN_ESCAPE_TABLE))
+        return ''.join(pieces)
+
+    def render(self, **values) -> str:
+        """Renderizar com argumentos nomeados"""
+        return self.render_map(values)
+
+    def render_rows(self, rows: Iterable[Mapping], separator: str = '') -> str:
+        """Renderizar uma linha do template por item e juntar com join"""
+        return separator.join(self.render_map(row) for row in rows)
+
+
+# Entidades do Markdown legado (sem aninhamento); ``` vem antes de ` na busca
+_ENTITY_MARKERS = ('```', '*', '_', '`')
+
+
+def _entity_after(text: str, entity: Optional[str] = None) -> Optional[str]:
+    """Marcador da entidade ainda aberta no fim de `text` (partindo de `entity` aberta)"""
+    index, size = 0, len(text)
+    while index < size:
+        if entity in ('`', '```'):
+            # Dentro de código tudo é literal até o marcador de fechamento
+            end = text.find(entity, index)
+            if end < 0:
+                return entity
+            index, entity = end + len(entity), None
+            continue
+        char = text[index]
+        if char == '\\':
+            index += 2
+        elif entity is not None:
+            if char == entity:
+                entity = None
+            index += 1
+        else:
+            entity = next((marker for marker in _ENTITY_MARKERS if text.startswith(marker, index)), None)
+            index += len(entity) if entity else 1
+    return entity
+
+
+def _join_chunk(opened: Optional[str], lines: List[str], closing: Optional[str]) -> str:
+    return (opened or '') + '\n'.join(lines) + (closing or '')
+
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """Dividir texto em partes de até `limit` caracteres, preferindo quebras de linha
+
+    Entidade aberta no ponto de corte (*negrito*, _itálico_, `código`) é
+    fechada no fim da parte e reaberta no início da seguinte: cada parte é
+    Markdown válido por si só.
+    """
+    if len(text) <= limit:
+        return [text]
+
+    # Folga para fechar e reabrir o marcador mais longo (```)
+    budget = limit - 2 * len(_ENTITY_MARKERS[0])
+    chunks = []
+    current = []
+    current_size = 0
+    opened = entity = None  # entidade aberta no início e no fim da parte atual
+
+    for line in text.split('\n'):
+        # Linha sozinha maior que o limite: corte rígido, sem separar escape nem ```
+        while len(line) > budget:
+            if current:
+                chunks.append(_join_chunk(opened, current, entity))
+                current, current_size, opened = [], 0, entity
+            cut = budget
+            while cut > 1 and line[cut - 1] in '\\`':
+                cut -= 1
+            piece, line = line[:cut], line[cut:]
+            closing = _entity_after(piece, entity)
+            chunks.append(_join_chunk(entity, [piece], closing))
+            opened = entity = closing
+
+        added_size = len(line) + (1 if current else 0)
+        if current and current_size + added_size > budget:
+            chunks.append(_join_chunk(opened, current, entity))
+            current, current_size, opened = [], 0, entity
+            added_size = len(line)
+        current.append(line)
+        current_size += added_size
+        entity = _entity_after(line, entity)
+
+    if current:
+        # Última parte: entidade sem fechamento já estava assim no texto original
+        chunks.append(_join_chunk(opened, current, None))
+
+    return chunks
+
+
+async def reply_markdown(message, text: str, reply_markup=None, **kwargs):
+    """Responder em Markdown dividindo mensagens longas; teclado vai na última parte"""
+    chunks = split_message(text)
+    last_index = len(chunks) - 1
+    sent = None
+    for index, chunk in enumerate(chunks):
+        sent = await message.reply_text(
+            chunk,
+            parse_mode='Markdown',
+            reply_markup=reply_markup if index == last_index else None,
+            **kwargs
+        )
+    return sent
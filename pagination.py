@@ -0,0 +1,66 @@
+"""
+Paginação por Keyset
+Cursores compactos para caber no callback_data do Telegram (máx. 64 bytes)
+"""
+from datetime import date
+from typing import Tuple
+import string
+
+# Itens por página nas listagens paginadas
+PAGE_SIZE = 10
+
+_BASE36_DIGITS = string.digits + string.ascii_lowercase
+_CURSOR_SEPARATOR = '_'
+
+
+def to_base36(number: int) -> str:
+    """Converter inteiro não negativo para base 36"""
+    if number < 0:
+        raise ValueError("Cursor não aceita números negativos")
+    if number == 0:
+        return '0'
+
+    digits = []
+    while number:
+        number, remainder = divmod(number, 36)
+        digits.append(_BASE36_DIGITS[remainder])
+    return ''.join(reversed(digits))
+
+
+def from_base36(text: str) -> int:
+    """Converter texto em base 36 para inteiro"""
+    return int(text, 36)
+
+
+def encode_cursor(*parts) -> str:
+    """Codificar posição do keyset (int, date ou float) em texto compacto"""
+    encoded = []
+    for part in parts:
+        if isinstance(part, date):
+            encoded.append(to_base36(part.toordinal()))
+        elif isinstance(part, int):
+            encoded.append(to_base36(part))
+        elif isinstance(part, float):
+            encoded.append(repr(part))
+        else:
+            raise TypeError(f"Tipo não suportado no cursor: {type(part).__name__}")
+    return _CURSOR_SEPARATOR.join(encoded)
+
+
+def decode_cursor(cursor: str, *types) -> Tuple:
+    """Decodificar cursor gerado por encode_cursor, dados os tipos esperados"""
+    parts = cursor.split(_CURSOR_SEPARATOR)
+    if len(parts) != len(types):
+        raise ValueError("Cursor inválido")
+
+    decoded = []
+    for part, type_ in zip(parts, types):
+        if type_ is date:
+            decoded.append(date.fromordinal(from_base36(part)))
+        elif type_ is int:
+            decoded.append(from_base36(part))
+        elif type_ is float:
+            decoded.append(float(part))
+        else:
+            raise TypeError(f"Tipo não suportado no cursor: {type_.__name__}")
+    return tuple(decoded)
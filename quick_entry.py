@@ -0,0 +1,400 @@
+"""
+Lançamento Rápido
+Uma mensagem ("gastei 45,90 ifood nubank ontem", "12x 2400 notebook c6") vira
+receita ou despesa completa em um passo, sem o fluxo guiado de /gastos e /receitas
+"""
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from functools import partial
+from typing import Callable, Dict, Mapping, Optional, Tuple
+import logging
+import re
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+
+from account_manager import account_manager, AccountManager, BankAccount
+from br_parsing import EXPENSE_VERBS, IGNORED_WORDS, INCOME_VERBS, STOPWORDS, fold, parse_date, parse_money
+from callback_router import callback_router, encode_callback
+from idempotency import idempotency_key, update_flow_id
+from message_templates import MessageTemplate
+
+logger = logging.getLogger(__name__)
+
+# Rota do callback_router do botão desfazer (qe:u:<flow_id>)
+QUICK_ENTRY_ROUTE = 'qe'
+
+# Filtro do MessageHandler: só mensagens que começam com verbo ou "12x"
+QUICK_ENTRY_PATTERN = re.compile(
+    r'^\s*(?:' + '|'.join(sorted(EXPENSE_VERBS | INCOME_VERBS)) + r'|\d{1,2}x)\b',
+    re.IGNORECASE
+)
+_INSTALLMENTS_RE = re.compile(r'(\d{1,2})x', re.IGNORECASE)
+
+# Apelidos de banco -> prefixo da chave da conta (nubank_pf, c6_pj, ...)
+BANK_ALIASES = {
+    'nubank': 'nubank', 'nu': 'nubank', 'roxinho': 'nubank',
+    'c6': 'c6', 'c6bank': 'c6',
+    'inter': 'inter', 'bancointer': 'inter',
+    'santander': 'santander',
+}
+
+# Termos comuns que não aparecem nos nomes/descrições dos tipos
+EXPENSE_KEYWORDS = {
+    'ifood': 'food', 'rappi': 'food', 'padaria': 'food', 'almoco': 'food', 'jantar': 'food', 'pizza': 'food',
+    'lanche': 'food', 'cafe': 'food', 'feira': 'food', 'acougue': 'food', 'supermercado': 'food',
+    'gasolina': 'transport', 'posto': 'transport', 'onibus': 'transport', 'metro': 'transport',
+    'taxi': 'transport', '99': 'transport', 'estacionamento': 'transport', 'passagem': 'transport',
+    'notebook': 'shopping', 'celular': 'shopping', 'roupa': 'shopping', 'tenis': 'shopping',
+    'geladeira': 'shopping', 'tv': 'shopping', 'presente': 'shopping', 'loja': 'shopping',
+    'consulta': 'health', 'remedio': 'health', 'exame': 'health', 'academia': 'health',
+    'curso': 'education', 'faculdade': 'education', 'escola': 'education', 'livro': 'education',
+    'energia': 'bills', 'condominio': 'bills', 'aluguel': 'bills', 'netflix': 'bills', 'spotify': 'bills',
+    'gas': 'bills',
+    'fornecedor': 'business', 'cnpj': 'business', 'mei': 'business',
+    'cinema': 'entertainment', 'show': 'entertainment', 'viagem': 'entertainment', 'bar': 'entertainment',
+}
+INCOME_KEYWORDS = {
+    'salario': 'salary', 'pagamento': 'salary', 'freela': 'freelance', 'projeto': 'freelance',
+    'venda': 'business', 'cliente': 'business', 'dividendo': 'investment', 'rendimento': 'investment',
+    'aluguel': 'rental',
+}
+
+# Regras do fluxo guiado para parcelamento
+MIN_INSTALLMENTS, MAX_INSTALLMENTS = 2, 24
+MIN_INSTALLMENT_VALUE = Decimal('10')
+MIN_INSTALLMENT_TOTAL = Decimal('100')
+
+QUICK_ENTRY_SAVED = MessageTemplate("""⚡ **{kind_name} registrada!**
+
+**Categoria:** {type_name}{learned_text!r}
+**Descrição:** {description}
+**Valor:** R$ {value:,.2f}{installments_text!r}
+**Data:** {entry_date:%d/%m/%Y}
+**Conta:** {account_color} {account_name}""")
+
+QUICK_ENTRY_HELP = """⚡ **Lançamento rápido**
+
+Não encontrei o valor na mensagem. Exemplos:
+• `gastei 45,90 ifood nubank ontem`
+• `12x 2400 notebook c6`
+• `recebi 3500 salário inter dia 5`
+
+Ou use `/gastos` e `/receitas` para o passo a passo."""
+
+
+class QuickEntryError(ValueError):
+    """Mensagem reconhecida como lançamento, mas inválida (texto vai para o usuário)"""
+
+
+def build_vocabulary(types: Mapping[str, Dict], keywords: Mapping[str, str]) -> Dict[str, str]:
+    """Palavra normalizada -> chave do tipo (nome e descrição dos tipos + palavras-chave)"""
+    vocabulary = {}
+    for key, info in types.items():
+        words = re.findall(r'\w+', f"{key} {info['name']} {info['description']}")
+        for word in words:
+            word = fold(word)
+            if len(word) >= 3 and word not in IGNORED_WORDS and not word.startswith('outra'):
+                vocabulary.setdefault(word, key)
+    vocabulary.update({fold(word): key for word, key in keywords.items()})
+    return vocabulary
+
+
+@dataclass(frozen=True)
+class QuickEntry:
+    """Lançamento resolvido a partir de uma mensagem"""
+    kind: str                   # 'expense' ou 'income'
+    value: Decimal
+    type_key: str
+    type_info: Mapping
+    account: BankAccount
+    entry_date: date
+    description: str
+    installments: int = 1
+    learned: bool = False       # tipo/conta vieram do histórico do usuário (categorizer)
+
+    def flow_data(self, user_id: int, flow_id: str) -> Dict:
+        """Mesmo formato do user_data dos fluxos guiados (save_expense / save_revenue)"""
+        data = {
+            'user_id': user_id,
+            'flow_id': flow_id,
+            'description': self.description,
+            'value': self.value,
+            'account_key': self.account.key,
+            'account': self.account,
+        }
+        if self.kind == 'income':
+            data.update(revenue_type=self.type_key, revenue_type_info=self.type_info,
+                        revenue_date=self.entry_date, frequency=self.type_info['default_frequency'])
+        else:
+            data.update(expense_type=self.type_key, expense_type_info=self.type_info,
+                        expense_date=self.entry_date, installments=self.installments,
+                        installment_value=self.value / self.installments,
+                        installment_start_date=self.entry_date)
+        return data
+
+
+class QuickEntryParser:
+    """Resolve tipo, categoria, conta, data e parcelas localmente, sem I/O"""
+
+    def __init__(self, expense_types: Mapping[str, Dict], revenue_types: Mapping[str, Dict],
+                 accounts: AccountManager = account_manager):
+        self.expense_types = expense_types
+        self.revenue_types = revenue_types
+        self.accounts = accounts
+        self.expense_vocabulary = build_vocabulary(expense_types, EXPENSE_KEYWORDS)
+        self.income_vocabulary = build_vocabulary(revenue_types, INCOME_KEYWORDS)
+
+    def _match_date(self, tokens: Tuple[str, ...], i: int, today: date) -> Tuple[Optional[date], int]:
+        """Data que começa no token i (frases de até 3 palavras); retorna (data, tokens usados)"""
+        for size in (3, 2, 1):
+            if i + size > len(tokens):
+                continue
+            if size == 1 and not (tokens[i].isalpha() or '/' in tokens[i]):
+                continue
+            try:
+                return parse_date(' '.join(tokens[i:i + size]), today), size
+            except ValueError:
+                continue
+        return None, 0
+
+    def parse(self, text: str, today: Optional[date] = None,
+              learned: Optional[Callable] = None) -> Optional[QuickEntry]:
+        """Resolver a mensagem; None se não houver valor, QuickEntryError se inválida
+
+        learned(kind, descrição) devolve a sugestão do histórico do usuário
+        (categorizer.Suggestion), que vale mais que o vocabulário fixo; banco
+        ou pf/pj digitados continuam mandando na conta.
+        """
+        today = today or date.today()
+        tokens = tuple(text.split())
+        if not tokens:
+            return None
+
+        kind = None
+        first = fold(tokens[0])
+        if first in EXPENSE_VERBS:
+            kind = 'expense'
+        elif first in INCOME_VERBS:
+            kind = 'income'
+        used = {0} if kind else set()
+
+        value = entry_date = bank = variant = None
+        installments = 1
+        folded = [fold(token) for token in tokens]
+
+        i = len(used)
+        while i < len(tokens):
+            token = tokens[i]
+            installment_match = _INSTALLMENTS_RE.fullmatch(token)
+            if installment_match:
+                installments = int(installment_match.group(1))
+                used.add(i)
+                i += 1
+                continue
+
+            if entry_date is None:
+                entry_date, size = self._match_date(tokens, i, today)
+                if size:
+                    used.update(range(i, i + size))
+                    i += size
+                    continue
+
+            if value is None and '/' not in token:
+                try:
+                    value = parse_money(token)
+                    used.add(i)
+                    i += 1
+                    continue
+                except ValueError:
+                    pass
+
+            if folded[i] in BANK_ALIASES and bank is None:
+                bank = BANK_ALIASES[folded[i]]
+                used.add(i)
+            elif folded[i] in ('pf', 'pj'):
+                variant = folded[i]
+                used.add(i)
+            i += 1
+
+        if value is None:
+            return None
+        if value <= 0:
+            raise QuickEntryError("❌ O valor precisa ser maior que zero.")
+
+        kind = kind or 'expense'
+        vocabulary = self.income_vocabulary if kind == 'income' else self.expense_vocabulary
+        types = self.revenue_types if kind == 'income' else self.expense_types
+        description = self._description(tokens, used)
+        suggestion = learned(kind, description) if learned and description else None
+        if suggestion is not None and suggestion.type_key not in types:
+            suggestion = None
+
+        if suggestion is not None:
+            type_key = suggestion.type_key
+        else:
+            type_key = next((vocabulary[word] for n, word in enumerate(folded)
+                             if n not in used and word in vocabulary), 'other')
+        type_info = types[type_key]
+
+        account = self._resolve_account(kind, type_key, type_info, bank, variant,
+                                        suggestion.account_key if suggestion else None)
+        description = description or re.sub(r'^\W+', '', type_info['name']).strip()
+
+        if installments > 1:
+            self._check_installments(kind, type_info, value, installments)
+
+        return QuickEntry(kind, value, type_key, type_info, account, entry_date or today,
+                          description, installments, learned=suggestion is not None)
+
+    def _resolve_account(self, kind, type_key, type_info, bank, variant, learned_account=None) -> BankAccount:
+        if bank is None and variant is None and learned_account:
+            account = self.accounts.get_account_by_key(learned_account)
+            if account and (kind == 'expense' or learned_account in self.accounts.get_revenue_accounts()):
+                return account
+
+        variant = variant or ('pj' if type_key == 'business' else 'pf')
+        if kind == 'income':
+            allowed = self.accounts.get_revenue_accounts()
+            key = f"{bank or 'inter'}_{variant}"
+            if key not in allowed:
+                names = ', '.join(account.name for account in allowed.values())
+                raise QuickEntryError(f"❌ Receitas só podem entrar em: {names}.")
+            return allowed[key]
+
+        if bank is None:
+            suggested = [k for k in type_info['common_accounts'] if k.endswith(variant)]
+            key = (suggested or type_info['common_accounts'])[0]
+        else:
+            key = f"{bank}_{variant}"
+        account = self.accounts.get_account_by_key(key)
+        if account is None:
+            raise QuickEntryError(f"❌ Conta não encontrada: {key}")
+        return account
+
+    @staticmethod
+    def _description(tokens, used) -> str:
+        words = [token for n, token in enumerate(tokens) if n not in used]
+        while words and fold(words[0]) in STOPWORDS:
+            words.pop(0)
+        while words and fold(words[-1]) in STOPWORDS:
+            words.pop()
+        description = ' '.join(words).strip(' ,.;-')
+        return description[:1].upper() + description[1:]
+
+    @staticmethod
+    def _check_installments(kind, type_info, value, installments):
+        if kind != 'expense':
+            raise QuickEntryError("❌ Parcelamento só vale para despesas.")
+        if not type_info['allow_installments']:
+            raise QuickEntryError(f"❌ {type_info['name']} não permite parcelamento.")
+        if not MIN_INSTALLMENTS <= installments <= MAX_INSTALLMENTS:
+            raise QuickEntryError(f"❌ Parcelas entre {MIN_INSTALLMENTS} e {MAX_INSTALLMENTS}.")
+        if value < MIN_INSTALLMENT_TOTAL or value / installments < MIN_INSTALLMENT_VALUE:
+            raise QuickEntryError(
+                f"❌ Parcelamento a partir de R$ {MIN_INSTALLMENT_TOTAL:,.2f}, "
+                f"com parcelas de no mínimo R$ {MIN_INSTALLMENT_VALUE:,.2f}."
+            )
+
+
+class QuickEntryManager:
+    """Handler do lançamento rápido e do botão desfazer"""
+
+    def __init__(self, bot_instance, expense_manager, revenue_manager):
+        self.bot = bot_instance
+        self.expense_manager = expense_manager
+        self.revenue_manager = revenue_manager
+        self.parser = QuickEntryParser(expense_manager.expense_types, revenue_manager.revenue_types)
+        callback_router.register(QUICK_ENTRY_ROUTE, self.undo_callback)
+
+    async def quick_entry_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Mensagem livre começando com verbo ("gastei", "recebi") ou "12x" """
+        user = await self.bot.get_or_create_user(update.effective_user)
+        categorizer = self.bot.categorizer
+        try:
+            await categorizer.load(user['id'])
+        except Exception as e:
+            logger.warning(f"⚠️ Histórico de categorias indisponível: {e}")
+
+        try:
+            entry = self.parser.parse(update.message.text, learned=partial(categorizer.suggest, user['id']))
+        except QuickEntryError as e:
+            await update.message.reply_text(str(e))
+            return
+        if entry is None:
+            await update.message.reply_text(QUICK_ENTRY_HELP, parse_mode='Markdown')
+            return
+
+        # Mesma update reentregue (ex.: após um restart, sem o filtro em memória) gera a mesma chave
+        flow_id = update_flow_id(update.update_id)
+        data = entry.flow_data(user['id'], flow_id)
+        if entry.kind == 'income':
+            saved = await self.revenue_manager.save_revenue(data)
+        else:
+            saved = await self.expense_manager.save_expense(data)
+
+        if not saved:
+            await update.message.reply_text(
+                "❌ **Erro ao salvar lançamento**\n\n"
+                "Tente novamente ou use `/gastos` / `/receitas`.",
+                parse_mode='Markdown'
+            )
+            return
+
+        installments_text = (
+            f"\n**Parcelas:** {entry.installments}x R$ {data['installment_value']:,.2f}"
+            if entry.installments > 1 else ""
+        )
+        text = QUICK_ENTRY_SAVED.render(
+            kind_name='Receita' if entry.kind == 'income' else 'Despesa',
+            type_name=entry.type_info['name'],
+            learned_text=" _(pelo seu histórico)_" if entry.learned else "",
+            description=entry.description,
+            value=entry.value,
+            installments_text=installments_text,
+            entry_date=entry.entry_date,
+            account_color=entry.account.color,
+            account_name=entry.account.name,
+        )
+        keyboard = InlineKeyboardMarkup([[InlineKeyboardButton(
+            "↩️ Desfazer", callback_data=encode_callback(QUICK_ENTRY_ROUTE, 'u', flow_id)
+        )]])
+        await update.message.reply_text(text, parse_mode='Markdown', reply_markup=keyboard)
+
+    async def undo_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                            action: str = '', flow_id: str = ''):
+        """Apagar as transações do lançamento (rota qe:u:<flow_id>)"""
+        query = update.callback_query
+        await query.answer()
+        if action != 'u' or not flow_id:
+            return
+
+        user = await self.bot.get_or_create_user(update.effective_user)
+        # Lançamento ainda na fila de ingestão precisa chegar ao banco (e ao categorizador) antes
+        await self.bot.ingestor.flush()
+        await self.bot.categorizer.flush()
+        key = idempotency_key(user['id'], flow_id)
+        row = await self.bot.execute_write(
+            """
+            WITH removed AS (
+                DELETE FROM transactions
+                WHERE user_id = $1 AND (idempotency_key = $2 OR idempotency_key LIKE $2 || ':%')
+                RETURNING title, type, tags[1] AS type_key, account_key
+            )
+            SELECT count(*) AS removed, min(title) AS title, min(type) AS kind,
+                   min(type_key) AS type_key, min(account_key) AS account_key
+            FROM removed
+            """,
+            (user['id'], key), user_id=user['id']
+        )
+        removed = row['removed'] if row else 0
+        # Lançamento desfeito não reforça o mapeamento (pode ter sido um palpite errado)
+        if removed:
+            await self.bot.categorizer.learn(
+                user['id'], row['kind'], row['title'], row['type_key'], row['account_key'], hits=-1
+            )
+        await query.edit_message_text(
+            f"↩️ Lançamento desfeito ({removed} transação(ões) removida(s))." if removed
+            else "ℹ️ Nada para desfazer: o lançamento já tinha sido removido."
+        )
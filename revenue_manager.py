@@ -8,6 +8,13 @@ from typing import Dict, List
 from datetime import datetime, date
 import logging
 
+from message_templates import MessageTemplate
+from br_parsing import parse_date, parse_money
+from account_manager import account_manager, ACCOUNT_ROUTE
+from callback_router import encode_callback, decode_callback
+from idempotency import idempotency_key, new_flow_id
+from transaction_ingestor import transaction_record
+
 logger = logging.getLogger(__name__)
 
 # Estados da conversa
@@ -19,6 +26,46 @@ WAITING_REVENUE_ACCOUNT = 'waiting_revenue_account'
 WAITING_REVENUE_FREQUENCY = 'waiting_revenue_frequency'
 WAITING_REVENUE_CONFIRMATION = 'waiting_revenue_confirmation'
 
+# callback_data compacto do fluxo de receitas (rv:<ação>[:<valor>])
+REVENUE_ROUTE = 'rv'
+CANCEL_REVENUE = encode_callback(REVENUE_ROUTE, 'x')
+CONFIRM_REVENUE = encode_callback(REVENUE_ROUTE, 'ok')
+EDIT_REVENUE = encode_callback(REVENUE_ROUTE, 'ed')
+
+# Templates das respostas que exibem texto digitado pelo usuário
+DESCRIPTION_SAVED = MessageTemplate("""✅ **Descrição salva:** {description}
+
+💵 **Agora digite o valor da receita:**
+
+💡 **Formatos aceitos:**
+• 1500 ou 1500,00
+• 2.350,50 (com pontos e vírgulas)
+• 5000.00 (formato americano)
+
+**Qual o valor desta receita?**""")
+
+REVENUE_CONFIRMATION = MessageTemplate("""📋 **Confirme os dados da receita:**
+
+**Tipo:** {type_name}
+**Descrição:** {description}
+**Valor:** R$ {value:,.2f}
+**Data:** {revenue_date:%d/%m/%Y}
+**Conta:** {account_color} {account_name}
+**Frequência:** {frequency_text}
+
+**Tudo correto?**""")
+
+REVENUE_SAVED = MessageTemplate("""✅ **Receita cadastrada com sucesso!**
+
+💰 **{description}**
+💵 **R$ {value:,.2f}**
+📅 **{revenue_date:%d/%m/%Y}**
+
+**Comandos úteis:**
+• /saldo - Ver saldos atualizados
+• /receitas - Adicionar nova receita  
+• /resumo - Dashboard financeiro""")
+
 class RevenueManager:
     """Gerenciador de receitas com UX guiada"""
     
@@ -64,6 +111,10 @@ class RevenueManager:
                 'default_frequency': 'once'
             }
         }
+        
+        # Categorizador aprende só tipos conhecidos
+        if bot_instance is not None:
+            bot_instance.categorizer.register_types('income', self.revenue_types)
     
     async def start_add_revenue(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Iniciar processo de adição de receita"""
@@ -72,6 +123,7 @@ class RevenueManager:
         # Limpar dados anteriores
         context.user_data.clear()
         context.user_data['user_id'] = user['id']
+        context.user_data['flow_id'] = new_flow_id()
         
         text = """💰 **Adicionar Nova Receita**
 
@@ -86,10 +138,10 @@ Cada tipo tem configurações específicas para facilitar o cadastro."""
         for key, revenue_type in self.revenue_types.items():
             keyboard.append([InlineKeyboardButton(
                 revenue_type['name'],
-                callback_data=f"revenue_type_{key}"
+                callback_data=encode_callback(REVENUE_ROUTE, 't', key)
             )])
         
-        keyboard.append([InlineKeyboardButton("❌ Cancelar", callback_data="cancel_revenue")])
+        keyboard.append([InlineKeyboardButton("❌ Cancelar", callback_data=CANCEL_REVENUE)])
         reply_markup = InlineKeyboardMarkup(keyboard)
         
         await update.message.reply_text(text, parse_mode='Markdown', reply_markup=reply_markup)
@@ -100,11 +152,12 @@ Cada tipo tem configurações específicas para facilitar o cadastro."""
         query = update.callback_query
         await query.answer()
         
-        if query.data == "cancel_revenue":
+        if query.data == CANCEL_REVENUE:
             await query.edit_message_text("❌ Cadastro de receita cancelado.")
             return ConversationHandler.END
         
-        revenue_type_key = query.data.replace("revenue_type_", "")
+        route, args = decode_callback(query.data)
+        revenue_type_key = args[-1] if route == REVENUE_ROUTE and args else None
         revenue_type = self.revenue_types.get(revenue_type_key)
         
         if not revenue_type:
@@ -143,18 +196,8 @@ Cada tipo tem configurações específicas para facilitar o cadastro."""
             return WAITING_REVENUE_DESCRIPTION
         
         context.user_data['description'] = description
-        revenue_type = context.user_data['revenue_type_info']
         
-        text = f"""✅ **Descrição salva:** {description}
-
-💵 **Agora digite o valor da receita:**
-
-💡 **Formatos aceitos:**
-• 1500 ou 1500,00
-• 2.350,50 (com pontos e vírgulas)
-• 5000.00 (formato americano)
-
-**Qual o valor desta receita?**"""
+        text = DESCRIPTION_SAVED.render(description=description)
         
         await update.message.reply_text(text, parse_mode='Markdown')
         return WAITING_REVENUE_VALUE
@@ -164,10 +207,8 @@ Cada tipo tem configurações específicas para facilitar o cadastro."""
         value_text = update.message.text.strip()
         
         try:
-            # Limpar e converter valor
-            value_clean = value_text.replace('R$', '').replace(' ', '')
-            value_clean = value_clean.replace('.', '').replace(',', '.')
-            value = float(value_clean)
+            # Decimal exato (centavos), aceita formatos BR e americano
+            value = parse_money(value_text)
             
             if value <= 0:
                 raise ValueError("Valor deve ser positivo")
@@ -193,6 +234,7 @@ Cada tipo tem configurações específicas para facilitar o cadastro."""
 • 15/11 (assumirá ano atual)
 • hoje (data de hoje)
 • ontem (data de ontem)
+• dia 5, há 3 dias, semana passada
 
 **Qual a data desta receita?**"""
         
@@ -204,24 +246,7 @@ Cada tipo tem configurações específicas para facilitar o cadastro."""
         date_text = update.message.text.strip().lower()
         
         try:
-            if date_text == "hoje":
-                revenue_date = date.today()
-            elif date_text == "ontem":
-                from datetime import timedelta
-                revenue_date = date.today() - timedelta(days=1)
-            elif "/" in date_text:
-                parts = date_text.split("/")
-                if len(parts) == 2:  # dd/mm
-                    day, month = int(parts[0]), int(parts[1])
-                    year = date.today().year
-                elif len(parts) == 3:  # dd/mm/yyyy
-                    day, month, year = int(parts[0]), int(parts[1]), int(parts[2])
-                else:
-                    raise ValueError("Formato inválido")
-                
-                revenue_date = date(year, month, day)
-            else:
-                raise ValueError("Formato não reconhecido")
+            revenue_date = parse_date(date_text)
                 
         except (ValueError, TypeError):
             await update.message.reply_text(
@@ -230,7 +255,8 @@ Cada tipo tem configurações específicas para facilitar o cadastro."""
                 "• 15/11/2025\n"
                 "• 15/11 (ano atual)\n"
                 "• hoje\n"
-                "• ontem\n\n"
+                "• ontem\n"
+                "• dia 5, há 3 dias, semana passada\n\n"
                 "**Digite novamente a data:**"
             )
             return WAITING_REVENUE_DATE
@@ -238,9 +264,6 @@ Cada tipo tem configurações específicas para facilitar o cadastro."""
         context.user_data['revenue_date'] = revenue_date
         
         # Prosseguir para seleção de conta (sempre Inter PF ou PJ)
-        from account_manager import account_manager
-        revenue_accounts = account_manager.get_revenue_accounts()
-        
         text = f"""✅ **Data salva:** {revenue_date.strftime('%d/%m/%Y')}
 
 🏦 **Escolha a conta que receberá o dinheiro:**
@@ -248,9 +271,7 @@ Cada tipo tem configurações específicas para facilitar o cadastro."""
 **💡 Contas de receita disponíveis:**
 (Como definido, receitas sempre vão para contas Inter)"""
         
-        keyboard = account_manager.get_account_keyboard(revenue_accounts)
-        keyboard.append([InlineKeyboardButton("❌ Cancelar", callback_data="cancel_revenue")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = account_manager.get_revenue_keyboard(CANCEL_REVENUE)
         
         await update.message.reply_text(text, parse_mode='Markdown', reply_markup=reply_markup)
         return WAITING_REVENUE_ACCOUNT
@@ -260,12 +281,12 @@ Cada tipo tem configurações específicas para facilitar o cadastro."""
         query = update.callback_query
         await query.answer()
         
-        if query.data == "cancel_revenue":
+        if query.data == CANCEL_REVENUE:
             await query.edit_message_text("❌ Cadastro de receita cancelado.")
             return ConversationHandler.END
         
-        account_key = query.data.replace("select_account_", "")
-        from account_manager import account_manager
+        route, args = decode_callback(query.data)
+        account_key = args[0] if route == ACCOUNT_ROUTE and args else None
         account = account_manager.get_account_by_key(account_key)
         
         if not account:
@@ -279,7 +300,7 @@ Cada tipo tem configurações específicas para facilitar o cadastro."""
         revenue_type_info = context.user_data['revenue_type_info']
         
         if revenue_type_info['is_recurring']:
-            text = f"""✅ **Conta selecionada:** {account['color']} {account['name']}
+            text = f"""✅ **Conta selecionada:** {account.color} {account.name}
 
 🔄 **Esta receita é recorrente?**
 
@@ -288,10 +309,10 @@ Como você selecionou "{revenue_type_info['name']}", geralmente é uma receita q
 **Escolha a frequência:**"""
             
             keyboard = [
-                [InlineKeyboardButton("📅 Mensal", callback_data="freq_monthly")],
-                [InlineKeyboardButton("📆 Semanal", callback_data="freq_weekly")],
-                [InlineKeyboardButton("🔄 Apenas uma vez", callback_data="freq_once")],
-                [InlineKeyboardButton("❌ Cancelar", callback_data="cancel_revenue")]
+                [InlineKeyboardButton("📅 Mensal", callback_data=encode_callback(REVENUE_ROUTE, 'f', 'monthly'))],
+                [InlineKeyboardButton("📆 Semanal", callback_data=encode_callback(REVENUE_ROUTE, 'f', 'weekly'))],
+                [InlineKeyboardButton("🔄 Apenas uma vez", callback_data=encode_callback(REVENUE_ROUTE, 'f', 'once'))],
+                [InlineKeyboardButton("❌ Cancelar", callback_data=CANCEL_REVENUE)]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
@@ -307,11 +328,12 @@ Como você selecionou "{revenue_type_info['name']}", geralmente é uma receita q
         query = update.callback_query
         await query.answer()
         
-        if query.data == "cancel_revenue":
+        if query.data == CANCEL_REVENUE:
             await query.edit_message_text("❌ Cadastro de receita cancelado.")
             return ConversationHandler.END
         
-        frequency = query.data.replace("freq_", "")
+        route, args = decode_callback(query.data)
+        frequency = args[-1] if route == REVENUE_ROUTE and args else 'once'
         context.user_data['frequency'] = frequency
         
         return await self.show_confirmation(query, context)
@@ -328,21 +350,20 @@ Como você selecionou "{revenue_type_info['name']}", geralmente é uma receita q
             'weekly': '📆 Semanal'
         }.get(data['frequency'], 'Uma vez')
         
-        text = f"""📋 **Confirme os dados da receita:**
-
-**Tipo:** {revenue_type_info['name']}
-**Descrição:** {data['description']}
-**Valor:** R$ {data['value']:,.2f}
-**Data:** {data['revenue_date'].strftime('%d/%m/%Y')}
-**Conta:** {account['color']} {account['name']}
-**Frequência:** {frequency_text}
-
-**Tudo correto?**"""
+        text = REVENUE_CONFIRMATION.render(
+            type_name=revenue_type_info['name'],
+            description=data['description'],
+            value=data['value'],
+            revenue_date=data['revenue_date'],
+            account_color=account.color,
+            account_name=account.name,
+            frequency_text=frequency_text
+        )
         
         keyboard = [
-            [InlineKeyboardButton("✅ Confirmar", callback_data="confirm_revenue")],
-            [InlineKeyboardButton("✏️ Editar", callback_data="edit_revenue")],
-            [InlineKeyboardButton("❌ Cancelar", callback_data="cancel_revenue")]
+            [InlineKeyboardButton("✅ Confirmar", callback_data=CONFIRM_REVENUE)],
+            [InlineKeyboardButton("✏️ Editar", callback_data=EDIT_REVENUE)],
+            [InlineKeyboardButton("❌ Cancelar", callback_data=CANCEL_REVENUE)]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
@@ -354,31 +375,21 @@ Como você selecionou "{revenue_type_info['name']}", geralmente é uma receita q
         query = update.callback_query
         await query.answer()
         
-        if query.data == "cancel_revenue":
+        if query.data == CANCEL_REVENUE:
             await query.edit_message_text("❌ Cadastro de receita cancelado.")
             return ConversationHandler.END
-        elif query.data == "edit_revenue":
+        elif query.data == EDIT_REVENUE:
             await query.edit_message_text(
                 "✏️ **Para editar, inicie novamente com /receitas**\n\n"
                 "Em breve teremos opção de edição durante o cadastro!"
             )
             return ConversationHandler.END
-        elif query.data == "confirm_revenue":
+        elif query.data == CONFIRM_REVENUE:
             # Salvar receita no banco
             success = await self.save_revenue(context.user_data)
             
             if success:
-                data = context.user_data
-                text = f"""✅ **Receita cadastrada com sucesso!**
-
-💰 **{data['description']}**
-💵 **R$ {data['value']:,.2f}**
-📅 **{data['revenue_date'].strftime('%d/%m/%Y')}**
-
-**Comandos úteis:**
-• /saldo - Ver saldos atualizados
-• /receitas - Adicionar nova receita  
-• /resumo - Dashboard financeiro"""
+                text = REVENUE_SAVED.render_map(context.user_data)
                 
                 await query.edit_message_text(text, parse_mode='Markdown')
             else:
@@ -401,33 +412,31 @@ Como você selecionou "{revenue_type_info['name']}", geralmente é uma receita q
                 'income'
             )
             
-            # Salvar transação
-            query = """
-                INSERT INTO transactions (
-                    user_id, title, description, amount, type, category_id,
-                    transaction_date, status, notes, tags
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
-                RETURNING id
-            """
-            
-            transaction_data = (
-                data['user_id'],
-                data['description'],
-                f"Receita: {data['revenue_type_info']['description']}",
-                data['value'],
-                'income',
-                category['id'] if category else None,
-                data['revenue_date'],
-                'paid',
-                f"Conta: {data['account']['name']}, Frequência: {data['frequency']}",
-                [data['revenue_type'], data['account_key']]
+            # Salvar transação (confirmação repetida do mesmo fluxo não duplica)
+            record = transaction_record(
+                user_id=data['user_id'],
+                title=data['description'],
+                description=f"Receita: {data['revenue_type_info']['description']}",
+                amount=data['value'],
+                type='income',
+                category_id=category['id'] if category else None,
+                transaction_date=data['revenue_date'],
+                status='paid',
+                notes=f"Conta: {data['account'].name}, Frequência: {data['frequency']}",
+                tags=[data['revenue_type'], data['account_key']],
+                account_key=data['account_key'],
+                idempotency_key=idempotency_key(data['user_id'], data.setdefault('flow_id', new_flow_id()))
             )
             
-            result = await self.bot.execute_query_one(query, transaction_data)
+            result = await self.bot.save_transaction(record)
             
             if result:
+                # Confirmação repetida (duplicate) não reforça o mapeamento de novo
+                await self.bot.categorizer.learn_saved(
+                    [result], data['user_id'], 'income', data['description'], data['revenue_type'], data['account_key']
+                )
                 # Se é recorrente, criar lembretes futuros (implementar depois)
-                logger.info(f"Receita salva: {data['description']} - R$ {data['value']}")
+                logger.debug(f"Receita salva: {data['description']} - R$ {data['value']}")
                 return True
             
             return False
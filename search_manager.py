@@ -0,0 +1,184 @@
+"""
+Sistema de Busca de Transações
+Busca por tags (GIN) e texto completo em português (tsvector) com paginação keyset
+"""
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+from typing import Dict, List, Optional, Tuple
+import logging
+import zlib
+
+from pagination import PAGE_SIZE, encode_cursor, decode_cursor
+from message_templates import MessageTemplate
+from callback_router import callback_router, encode_callback
+
+logger = logging.getLogger(__name__)
+
+# Rota do callback_router da paginação de busca (bs:<cursor>)
+SEARCH_ROUTE = 'bs'
+
+# Templates da página de resultados
+SEARCH_HEADER = MessageTemplate("🔎 **Resultados para:** {term}\n\n")
+SEARCH_EMPTY = MessageTemplate("🔎 **Nenhum resultado para:** {term}")
+SEARCH_LINE = MessageTemplate("{icon} {transaction_date:%d/%m/%Y} • R$ {value:,.2f} — {title}")
+
+# Ranking por relevância; empate resolvido pelo id (keyset estável)
+SEARCH_FIRST_QUERY = """
+    WITH q AS (SELECT websearch_to_tsquery('portuguese', $2) AS query)
+    SELECT t.id, t.title, t.amount, t.type, t.transaction_date,
+           ts_rank(t.search_vector, q.query) AS rank
+    FROM transactions t, q
+    WHERE t.user_id = $1
+      AND (t.search_vector @@ q.query OR t.tags @> ARRAY[$3]::text[])
+    ORDER BY rank DESC, t.id DESC
+    LIMIT $4
+"""
+
+# Páginas seguintes: abaixo do (rank, id) do último item exibido
+SEARCH_NEXT_QUERY = """
+    WITH q AS (SELECT websearch_to_tsquery('portuguese', $2) AS query)
+    SELECT t.id, t.title, t.amount, t.type, t.transaction_date,
+           ts_rank(t.search_vector, q.query) AS rank
+    FROM transactions t, q
+    WHERE t.user_id = $1
+      AND (t.search_vector @@ q.query OR t.tags @> ARRAY[$3]::text[])
+      AND (ts_rank(t.search_vector, q.query), t.id) < ($4::real, $5::int)
+    ORDER BY rank DESC, t.id DESC
+    LIMIT $6
+"""
+
+
+def term_hash(term: str) -> int:
+    """Hash curto do termo, levado no cursor para não paginar outra busca"""
+    return zlib.crc32(term.encode('utf-8')) & 0xFFFFF
+
+
+class SearchManager:
+    """Busca de transações por tags e texto"""
+
+    def __init__(self, bot_instance):
+        self.bot = bot_instance
+        callback_router.register(SEARCH_ROUTE, self.search_page_callback)
+
+    async def search_transactions(self, user_id: int, term: str,
+                                  after: Optional[Tuple[float, int]] = None,
+                                  limit: int = PAGE_SIZE) -> Tuple[List[Dict], Optional[str]]:
+        """Buscar uma página de resultados; retorna (linhas, cursor da próxima página)"""
+        # Uma linha extra indica se existe próxima página
+        if after is None:
+            rows = await self.bot.execute_query(
+                SEARCH_FIRST_QUERY, (user_id, term, term.lower(), limit + 1)
+            )
+        else:
+            after_rank, after_id = after
+            rows = await self.bot.execute_query(
+                SEARCH_NEXT_QUERY,
+                (user_id, term, term.lower(), after_rank, after_id, limit + 1)
+            )
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(term_hash(term), float(last['rank']), last['id'])
+
+        return rows, next_cursor
+
+    def format_results(self, term: str, rows: List[Dict]) -> str:
+        """Formatar página de resultados"""
+        if not rows:
+            return SEARCH_EMPTY.render(term=term)
+
+        lines = SEARCH_LINE.render_rows((
+            {
+                'icon': "💰" if row['type'] == 'income' else "💸",
+                'transaction_date': row['transaction_date'],
+                'value': abs(row['amount']),
+                'title': row['title'],
+            }
+            for row in rows
+        ), separator="\n")
+        return SEARCH_HEADER.render(term=term) + lines
+
+    def get_page_keyboard(self, next_cursor: Optional[str]) -> Optional[InlineKeyboardMarkup]:
+        """Botão de próxima página com o cursor no callback_data"""
+        if not next_cursor:
+            return None
+        return InlineKeyboardMarkup([[InlineKeyboardButton(
+            "➡️ Mais resultados",
+            callback_data=encode_callback(SEARCH_ROUTE, next_cursor)
+        )]])
+
+    async def search_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /buscar <termo>"""
+        term = " ".join(context.args or []).strip()
+
+        if len(term) < 2:
+            await update.message.reply_text(
+                "🔎 **Buscar transações**\n\n"
+                "Use: `/buscar <termo>`\n\n"
+                "💡 **Exemplos:**\n"
+                "• `/buscar uber`\n"
+                "• `/buscar mercado -atacadão`\n"
+                "• `/buscar \"plano de saúde\"`",
+                parse_mode='Markdown'
+            )
+            return
+
+        user = await self.bot.get_or_create_user(update.effective_user)
+        context.user_data['search_term'] = term
+
+        try:
+            rows, next_cursor = await self.search_transactions(user['id'], term)
+        except Exception as e:
+            logger.error(f"Erro na busca: {e}")
+            await update.message.reply_text(
+                "❌ **Erro ao buscar transações**\n\n"
+                "Tente novamente em alguns instantes.",
+                parse_mode='Markdown'
+            )
+            return
+
+        await update.message.reply_text(
+            self.format_results(term, rows),
+            parse_mode='Markdown',
+            reply_markup=self.get_page_keyboard(next_cursor)
+        )
+
+    async def search_page_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE, cursor: str = ''):
+        """Próxima página da busca (rota bs:<cursor>)"""
+        query = update.callback_query
+        await query.answer()
+
+        term = context.user_data.get('search_term')
+        if not term:
+            await query.edit_message_text("⌛ Busca expirada. Use `/buscar` novamente.", parse_mode='Markdown')
+            return
+
+        try:
+            cursor_hash, *after = decode_cursor(cursor, int, float, int)
+        except ValueError:
+            await query.edit_message_text("❌ Página inválida. Use `/buscar` novamente.", parse_mode='Markdown')
+            return
+
+        # Botão de uma busca anterior: o termo salvo já é outro
+        if cursor_hash != term_hash(term):
+            await query.edit_message_text("⌛ Busca expirada. Use `/buscar` novamente.", parse_mode='Markdown')
+            return
+
+        try:
+            user = await self.bot.get_or_create_user(update.effective_user)
+            rows, next_cursor = await self.search_transactions(user['id'], term, tuple(after))
+
+            await query.edit_message_text(
+                self.format_results(term, rows),
+                parse_mode='Markdown',
+                reply_markup=self.get_page_keyboard(next_cursor)
+            )
+        except Exception as e:
+            logger.error(f"Erro na paginação da busca: {e}")
+            await query.edit_message_text(
+                "❌ **Erro ao buscar transações**\n\n"
+                "Tente novamente em alguns instantes.",
+                parse_mode='Markdown'
+            )
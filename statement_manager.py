@@ -0,0 +1,184 @@
+"""
+Sistema de Extrato
+Listagem do histórico de transações com paginação keyset (transaction_date, id)
+"""
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from pagination import PAGE_SIZE, encode_cursor, decode_cursor
+from message_templates import MessageTemplate
+from callback_router import callback_router, encode_callback
+
+logger = logging.getLogger(__name__)
+
+# Rota do callback_router da navegação do extrato (ex:n:<cursor> / ex:p:<cursor>)
+STATEMENT_ROUTE = 'ex'
+
+# Templates da página do extrato
+STATEMENT_HEADER = MessageTemplate("📄 **Extrato** — página {page}\n\n")
+STATEMENT_LINE = MessageTemplate("{icon} {transaction_date:%d/%m/%Y} • R$ {value:,.2f} — {title}{account_text}")
+
+# Primeira página: as mais recentes (idx_transactions_user_date_id)
+STATEMENT_FIRST_QUERY = """
+    SELECT id, title, amount, type, transaction_date, account_key
+    FROM transactions
+    WHERE user_id = $1
+    ORDER BY transaction_date DESC, id DESC
+    LIMIT $2
+"""
+
+# Páginas seguintes: mais antigas que o último item exibido. A comparação de
+# linha sem "OR $2 IS NULL" vira limite do índice também no plano genérico
+STATEMENT_NEXT_QUERY = """
+    SELECT id, title, amount, type, transaction_date, account_key
+    FROM transactions
+    WHERE user_id = $1
+      AND (transaction_date, id) < ($2::date, $3::int)
+    ORDER BY transaction_date DESC, id DESC
+    LIMIT $4
+"""
+
+# Páginas anteriores: mais recentes que o primeiro item exibido, lidas em ordem inversa
+STATEMENT_PREV_QUERY = """
+    SELECT id, title, amount, type, transaction_date, account_key
+    FROM transactions
+    WHERE user_id = $1
+      AND (transaction_date, id) > ($2::date, $3::int)
+    ORDER BY transaction_date ASC, id ASC
+    LIMIT $4
+"""
+
+
+class StatementManager:
+    """Extrato paginado de transações"""
+
+    def __init__(self, bot_instance):
+        self.bot = bot_instance
+        callback_router.register(STATEMENT_ROUTE, self.statement_page_callback)
+
+    async def fetch_page(self, user_id: int, direction: str = 'n',
+                         anchor: Optional[Tuple[date, int]] = None,
+                         limit: int = PAGE_SIZE) -> Tuple[List[Dict], bool]:
+        """Buscar uma página a partir da âncora; retorna (linhas, existe mais nessa direção)"""
+        anchor_date, anchor_id = anchor if anchor else (None, None)
+
+        if direction == 'p':
+            rows = await self.bot.execute_query(
+                STATEMENT_PREV_QUERY, (user_id, anchor_date, anchor_id, limit + 1)
+            )
+            has_more = len(rows) > limit
+            rows = list(reversed(rows[:limit]))
+        else:
+            if anchor is None:
+                rows = await self.bot.execute_query(STATEMENT_FIRST_QUERY, (user_id, limit + 1))
+            else:
+                rows = await self.bot.execute_query(
+                    STATEMENT_NEXT_QUERY, (user_id, anchor_date, anchor_id, limit + 1)
+                )
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+
+        return rows, has_more
+
+    def format_page(self, rows: List[Dict], page: int) -> str:
+        """Formatar página do extrato"""
+        if not rows:
+            return (
+                "📄 **Extrato vazio**\n\n"
+                "• `/receitas` - Adicionar receita\n"
+                "• `/gastos` - Registrar despesa"
+            )
+
+        from account_manager import account_manager
+
+        def line_values(row):
+            account = account_manager.get_account_by_key(row['account_key']) if row['account_key'] else None
+            return {
+                'icon': "💰" if row['type'] == 'income' else "💸",
+                'transaction_date': row['transaction_date'],
+                'value': abs(row['amount']),
+                'title': row['title'],
+                'account_text': f" ({account.color} {account.name})" if account else "",
+            }
+
+        return STATEMENT_HEADER.render(page=page) + STATEMENT_LINE.render_rows(
+            (line_values(row) for row in rows), separator="\n"
+        )
+
+    def get_navigation_keyboard(self, rows: List[Dict], page: int,
+                                has_prev: bool, has_next: bool) -> Optional[InlineKeyboardMarkup]:
+        """Botões anterior/próxima com cursores compactos (página, data, id)"""
+        if not rows:
+            return None
+
+        buttons = []
+        if has_prev:
+            first = rows[0]
+            cursor = encode_cursor(page - 1, first['transaction_date'], first['id'])
+            buttons.append(InlineKeyboardButton("⬅️ Anterior", callback_data=encode_callback(STATEMENT_ROUTE, 'p', cursor)))
+        if has_next:
+            last = rows[-1]
+            cursor = encode_cursor(page + 1, last['transaction_date'], last['id'])
+            buttons.append(InlineKeyboardButton("Próxima ➡️", callback_data=encode_callback(STATEMENT_ROUTE, 'n', cursor)))
+
+        return InlineKeyboardMarkup([buttons]) if buttons else None
+
+    async def statement_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /extrato - primeira página"""
+        user = await self.bot.get_or_create_user(update.effective_user)
+
+        try:
+            rows, has_next = await self.fetch_page(user['id'])
+        except Exception as e:
+            logger.error(f"Erro ao carregar extrato: {e}")
+            await update.message.reply_text(
+                "❌ **Erro ao carregar extrato**\n\n"
+                "Tente novamente em alguns instantes."
+            )
+            return
+
+        await update.message.reply_text(
+            self.format_page(rows, 1),
+            parse_mode='Markdown',
+            reply_markup=self.get_navigation_keyboard(rows, 1, False, has_next)
+        )
+
+    async def statement_page_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                      direction: str = '', cursor: str = ''):
+        """Navegação do extrato (rota ex:n:<cursor> / ex:p:<cursor>)"""
+        query = update.callback_query
+        await query.answer()
+
+        try:
+            if direction not in ('n', 'p'):
+                raise ValueError(direction)
+            page, anchor_date, anchor_id = decode_cursor(cursor, int, date, int)
+        except ValueError:
+            await query.edit_message_text("❌ Página inválida. Use `/extrato` novamente.", parse_mode='Markdown')
+            return
+
+        try:
+            user = await self.bot.get_or_create_user(update.effective_user)
+            rows, has_more = await self.fetch_page(user['id'], direction, (anchor_date, anchor_id))
+
+            # Indo para trás sempre há próxima; indo para frente sempre há anterior
+            if direction == 'p':
+                has_prev, has_next = has_more, True
+            else:
+                has_prev, has_next = page > 1, has_more
+
+            await query.edit_message_text(
+                self.format_page(rows, page),
+                parse_mode='Markdown',
+                reply_markup=self.get_navigation_keyboard(rows, page, has_prev, has_next)
+            )
+        except Exception as e:
+            logger.error(f"Erro na paginação do extrato: {e}")
+            await query.edit_message_text(
+                "❌ **Erro ao carregar extrato**\n\n"
+                "Tente novamente em alguns instantes ou use `/extrato` novamente.",
+                parse_mode='Markdown'
+            )
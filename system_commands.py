@@ -0,0 +1,369 @@
+"""
+Comandos Gerais do Bot
+Saldo, status, demonstração, login automático, debug e handlers de fallback/erro
+"""
+from telegram import Update
+from telegram.ext import ContextTypes
+import logging
+
+from account_manager import account_manager
+from message_templates import MessageTemplate, reply_markdown
+from callback_router import callback_router
+
+logger = logging.getLogger(__name__)
+
+# Templates do /saldo
+BALANCE_REAL_ACCOUNT = MessageTemplate("{icon!r}**{bank_name}**\nTipo: {account_type}\nSaldo: R$ {balance:,.2f}\n\n")
+BALANCE_DEMO_ACCOUNT = MessageTemplate("{icon!r}**{bank_name}**\nSaldo: R$ {balance:,.2f}\n\n")
+BALANCE_LEDGER_ACCOUNT = MessageTemplate(
+    "{icon!r} **{name}**\nReceitas: R$ {income:,.2f} • Despesas: R$ {expenses:,.2f}\n"
+    "Saldo: R$ {balance:,.2f} ({count} lançamentos)\n\n"
+)
+
+# Cor por banco (contas reais e demo)
+REAL_BANK_ICONS = (('inter', '🟡 '), ('nubank', '💜 '), ('c6', '⚫ '), ('santander', '🔴 '))
+DEMO_BANK_ICONS = (('nubank', '💜 '), ('inter', '🟡 '), ('itau', '🔶 '))
+
+def bank_icon(bank_name, icons):
+    """Ícone do banco pelo nome"""
+    lower_name = bank_name.lower()
+    for fragment, icon in icons:
+        if fragment in lower_name:
+            return icon
+    return "🏦 "
+
+class SystemCommands:
+    """Comandos gerais do sistema manual (sem APIs externas)"""
+    
+    def __init__(self, bot_instance):
+        self.bot = bot_instance
+    
+    async def balance_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando de saldo simplificado"""
+        user = await self.bot.get_or_create_user(update.effective_user)
+        
+        try:
+            # Buscar contas do usuário e os lançamentos por conta predefinida
+            accounts = await self.bot.get_user_accounts(user['id'])
+            totals = await self.bot.get_account_totals(user['id'])
+            
+            if not accounts and not totals:
+                await update.message.reply_text(
+                    "🏦 **Nenhuma conta encontrada**\n\n"
+                    "**Opções disponíveis:**\n"
+                    "• `/demo` - Carregar dados de exemplo\n"
+                    "• `/receitas` - Adicionar primeira receita\n"
+                    "• `/gastos` - Registrar primeira despesa\n\n"
+                    "💡 Comece adicionando uma receita ou despesa!"
+                )
+                return
+            
+            # Separar contas demo das reais
+            contas_demo = []
+            contas_reais = []
+            
+            for account in accounts:
+                row = {
+                    'bank_name': account.get('bank_name', 'Banco'),
+                    'account_type': account.get('account_type', 'Conta'),
+                    'balance': float(account.get('balance', 0)),
+                }
+                if (account.get('pluggy_item_id') or '').startswith('demo_'):
+                    row['icon'] = bank_icon(row['bank_name'], DEMO_BANK_ICONS)
+                    contas_demo.append(row)
+                else:
+                    row['icon'] = bank_icon(row['bank_name'], REAL_BANK_ICONS)
+                    contas_reais.append(row)
+            
+            sections = ["💰 **Seus Saldos:**\n\n"]
+            
+            # Mostrar contas reais primeiro
+            if contas_reais:
+                sections.append("🏦 **CONTAS REAIS:**\n")
+                sections.append(BALANCE_REAL_ACCOUNT.render_rows(contas_reais))
+                total_real = sum(row['balance'] for row in contas_reais)
+                sections.append(f"💵 **Total Real: R$ {total_real:,.2f}**\n\n")
+            
+            # Mostrar contas demo se existirem
+            if contas_demo:
+                sections.append("🎮 **DADOS DE DEMONSTRAÇÃO:**\n")
+                sections.append(BALANCE_DEMO_ACCOUNT.render_rows(contas_demo))
+                total_demo = sum(row['balance'] for row in contas_demo)
+                sections.append(f"🎮 **Total Demo: R$ {total_demo:,.2f}**\n")
+            
+            # Total geral
+            if accounts:
+                total_geral = sum(float(acc.get('balance', 0)) for acc in accounts)
+                sections.append(f"\n💎 **TOTAL GERAL: R$ {total_geral:,.2f}**\n\n")
+            
+            # Receitas e despesas registradas no bot, por conta (/receitas, /gastos, lançamento rápido)
+            if totals:
+                ledger = []
+                for row in sorted(totals, key=lambda row: row['account_key']):
+                    account = account_manager.get_account_by_key(row['account_key'])
+                    income, expenses = float(row['total_receitas']), float(row['total_despesas'])
+                    ledger.append({
+                        'icon': account.color if account else '🏦',
+                        'name': account.name if account else row['account_key'],
+                        'income': income,
+                        'expenses': expenses,
+                        'balance': income - expenses,
+                        'count': row['transacoes'],
+                    })
+                sections.append("📒 **LANÇAMENTOS POR CONTA:**\n")
+                sections.append(BALANCE_LEDGER_ACCOUNT.render_rows(ledger))
+                total_ledger = sum(row['balance'] for row in ledger)
+                sections.append(f"📒 **Saldo dos lançamentos: R$ {total_ledger:,.2f}**")
+            
+            await reply_markdown(update.message, ''.join(sections))
+            
+        except Exception as e:
+            logger.error(f"Erro ao buscar saldo: {e}")
+            await update.message.reply_text(
+                "❌ **Erro ao consultar saldo**\n\n"
+                f"Detalhes técnicos: {str(e)}\n\n"
+                "Tente: `/demo` para dados de exemplo"
+            )
+    
+    async def connect_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando para conectar conta bancária manualmente"""
+        user = await self.bot.get_or_create_user(update.effective_user)
+        
+        try:
+            # Sistema manual - usar account_manager
+            from account_manager import account_manager
+            
+            text = """🏦 **Sistema de Contas Manuais**
+
+**✅ Nova funcionalidade: Contas predefinidas!**
+
+**🏦 Contas disponíveis:**
+🟡 Banco Inter PJ (Receitas)
+🟡 Banco Inter PF (Receitas)  
+⚫ C6 Bank PJ
+⚫ C6 Bank PF
+💜 Nubank PJ
+💜 Nubank PF
+🔴 Santander PJ  
+🔴 Santander PF
+
+**💡 Como usar:**
+• `/receitas` - Adicionar receitas (salário, vendas)
+• `/gastos` - Adicionar despesas com parcelamento
+• `/saldo` - Ver contas cadastradas
+
+**🎯 Benefícios:**
+✅ Controle total dos seus dados
+✅ Interface guiada e intuitiva  
+✅ Parcelamento automático
+✅ Categorização inteligente
+✅ Sem APIs externas
+
+**Comece adicionando uma receita ou despesa!**"""
+            
+            await update.message.reply_text(text, parse_mode='Markdown')
+            
+        except Exception as e:
+            logger.error(f"Erro no comando conectar: {e}")
+            await update.message.reply_text(
+                "❌ **Erro no sistema de contas**\n\n"
+                "Tente novamente em alguns instantes."
+            )
+    
+    async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Verificar status dos serviços"""
+        user = await self.bot.get_or_create_user(update.effective_user)
+        
+        try:
+            # Mostrar loading
+            loading_msg = await update.message.reply_text(
+                "🔍 **Verificando status dos serviços...**\n⏳ Aguarde alguns segundos"
+            )
+            
+            # Status simplificado - sem API externa
+            status_message = """📊 **Status dos Serviços**
+
+🤖 **Bot Telegram:** ✅ Online
+🗄️ **Banco PostgreSQL:** ✅ Conectado  
+🏦 **Sistema Manual:** ✅ Ativo
+📱 **Interface Guiada:** ✅ Funcionando
+
+**🎯 Funcionalidades disponíveis:**
+• ✅ Cadastro de receitas
+• ✅ Gestão de despesas com parcelamento
+• ✅ Contas bancárias predefinidas
+• ✅ Relatórios financeiros
+• ✅ Análise por IA (OpenAI)
+
+**💡 Comandos principais:**
+• `/receitas` - Adicionar receitas
+• `/gastos` - Registrar despesas  
+• `/saldo` - Ver contas e saldos
+• `/resumo` - Dashboard financeiro
+
+🟢 **Sistema 100% operacional!**"""
+            
+            # Editar mensagem de loading
+            await loading_msg.edit_text(status_message, parse_mode='Markdown')
+            
+        except Exception as e:
+            logger.error(f"Erro no comando status: {e}")
+            await update.message.reply_text(
+                "❌ **Erro ao verificar status**\n\n"
+                "Bot funcionando normalmente."
+            )
+    
+    async def demo_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando para carregar dados de demonstração"""
+        user = await self.bot.get_or_create_user(update.effective_user)
+        
+        try:
+            await update.message.reply_text(
+                "🎮 **Carregando dados de demonstração...**\n⏳ Aguarde alguns segundos"
+            )
+            
+            # Criar dados demo
+            await self.bot.create_demo_accounts(user['id'])
+            
+            await update.message.reply_text(
+                "✅ **Dados de demonstração carregados!**\n\n"
+                "💡 **O que foi criado:**\n"
+                "🏦 Contas bancárias de exemplo\n"
+                "💳 Cartões de crédito demo\n"
+                "📊 Transações de exemplo\n"
+                "🎯 Meta financeira demo\n\n"
+                "**Comandos para testar:**\n"
+                "• `/saldo` - Ver contas e saldos\n"
+                "• `/resumo` - Dashboard completo\n"
+                "• `/receitas` - Adicionar nova receita\n"
+                "• `/gastos` - Registrar nova despesa"
+            )
+            
+        except Exception as e:
+            logger.error(f"Erro ao criar dados demo: {e}")
+            await update.message.reply_text(
+                "❌ **Erro ao carregar dados demo**\n\n"
+                f"Detalhes: {str(e)}"
+            )
+    
+    async def test_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando de teste do sistema"""
+        user = await self.bot.get_or_create_user(update.effective_user)
+        
+        await update.message.reply_text(
+            f"✅ **Sistema funcionando!**\n\n"
+            f"👤 **Usuário:** {user['full_name']}\n"
+            f"🆔 **ID:** {user['id']}\n"
+            f"📧 **Email:** {user.get('email', 'Não cadastrado')}\n\n"
+            f"🤖 **Bot:** Online\n"
+            f"🗄️ **Banco:** Conectado\n"
+            f"📱 **Sistema manual:** Ativo\n\n"
+            f"**Teste concluído com sucesso!**"
+        )
+    
+    async def debug_receitas_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Debug do comando receitas"""
+        await update.message.reply_text("🔧 DEBUG: Comando /receitas funcionando!")
+    
+    async def debug_gastos_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Debug do comando gastos"""
+        await update.message.reply_text("🔧 DEBUG: Comando /gastos funcionando!")
+    
+    async def debug_perfil_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Debug do comando perfil"""
+        await update.message.reply_text("🔧 DEBUG: Comando /perfil funcionando!")
+    
+    async def debug_callbacks_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Debug das rotas de callback"""
+        stats = callback_router.get_stats()
+        if not stats:
+            await update.message.reply_text("🔧 Nenhum callback processado ainda.")
+            return
+        
+        lines = [
+            f"{route}: {s['count']}x • média {s['avg_ms']}ms • máx {s['max_ms']}ms • erros {s['errors']}"
+            for route, s in sorted(stats.items())
+        ]
+        await update.message.reply_text("🔧 CALLBACKS POR ROTA:\n\n" + "\n".join(lines))
+    
+    async def debug_pool_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Debug do pool de conexões"""
+        from db_pool import pool_metrics
+        
+        lines = []
+        for metrics in pool_metrics():
+            lines.append(
+                f"{metrics['name']}: {metrics['in_use']}/{metrics['limit']} em uso "
+                f"(abertas {metrics['open_connections']}, pico {metrics['peak_in_use']})\n"
+                f"  espera média {metrics['avg_wait_ms']}ms • máx {metrics['max_wait_ms']}ms • "
+                f"fila {metrics['waiting']} (pico {metrics['peak_waiting']})\n"
+                f"  timeouts {metrics['timeouts'] or 0} • ajustes {metrics['resizes']}"
+            )
+        await update.message.reply_text("🔧 POOL DO BANCO:\n\n" + ("\n\n".join(lines) or "Nenhum pool ativo."))
+    
+    async def enter_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Login automático funcionando"""
+        user = await self.bot.get_or_create_user(update.effective_user)
+        
+        await update.message.reply_text(
+            f"✅ **Login automático realizado!**\n\n"
+            f"👤 **Usuário:** {user['full_name']}\n"
+            f"🆔 **ID:** {user['id']}\n"
+            f"📧 **Email:** {user.get('email', 'Não cadastrado')}\n\n"
+            f"**Sistema funcionando:**\n"
+            f"• Digite `/receitas` para testar receitas\n"
+            f"• Digite `/gastos` para testar despesas\n"
+            f"• Digite `/saldo` para ver contas\n\n"
+            f"**Debug disponível:**\n"
+            f"• `/debug_handlers` - Ver handlers registrados"
+        )
+    
+    async def fallback_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handler para mensagens não reconhecidas"""
+        message_text = update.message.text if update.message and update.message.text else "sem texto"
+        
+        # Se começa com /, é um comando não reconhecido
+        if message_text.startswith('/'):
+            await update.message.reply_text(
+                f"❌ **Comando não reconhecido:** `{message_text}`\n\n"
+                "**Comandos disponíveis:**\n"
+                "• `/start` - Menu principal\n"
+                "• `/receitas` - Sistema de receitas\n"
+                "• `/gastos` - Sistema de despesas\n"
+                "• `/saldo` - Ver contas e saldos\n"
+                "• `/extrato` - Histórico de transações\n"
+                "• `/buscar` - Buscar transações\n"
+                "• `/perfil` - Seu perfil\n"
+                "• `/demo` - Dados de exemplo\n\n"
+                "**Debug:**\n"
+                "• `/debug_receitas` - Testar receitas\n"
+                "• `/debug_gastos` - Testar gastos\n"
+                "• `/debug_perfil` - Testar perfil\n\n"
+                "💡 Use `/start` para voltar ao menu principal.",
+                parse_mode='Markdown'
+            )
+        else:
+            # Mensagem normal fora de conversa
+            await update.message.reply_text(
+                "🤖 **Bot ativo!**\n\n"
+                "Para usar o sistema financeiro, digite um comando:\n"
+                "• `/start` - Começar\n"
+                "• `/receitas` - Adicionar receitas\n" 
+                "• `/gastos` - Registrar despesas\n\n"
+                "⚡ **Lançamento rápido:** `gastei 45,90 ifood nubank ontem`\n\n"
+                "💡 **Dica:** Use `/start` para ver o menu completo!"
+            )
+    
+    async def error_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handler global de erros"""
+        logger.error(f"❌ Erro no bot: {context.error}")
+        
+        if update and update.effective_message:
+            try:
+                await update.effective_message.reply_text(
+                    "❌ **Erro interno do bot**\n\n"
+                    "Tente novamente em alguns segundos.\n"
+                    "Se o problema persistir, use `/start` para reiniciar."
+                )
+            except:
+                pass  # Se não conseguir responder, ignorar
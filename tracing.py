@@ -0,0 +1,335 @@
+"""
+Tracing por Update
+Um trace por update do Telegram com spans filhos para handlers, queries, acquire do
+pool e chamadas da Bot API; ids propagados por contextvars e exportados em OTLP/JSON
+(coletor local via HTTP ou arquivo JSON por linha)
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+
+from telegram.request import BaseRequest
+
+logger = logging.getLogger(__name__)
+
+# Destinos: 'file' (OTLP/JSON, um ExportTraceServiceRequest por linha, o formato
+# do receiver otlpjsonfile do OpenTelemetry Collector) ou 'otlp' (POST /v1/traces)
+TRACING_EXPORTERS = ('file', 'otlp')
+
+SERVICE_NAME = 'bot-ia-financeiro'
+
+# Traces agrupados por envio e intervalo máximo entre envios
+EXPORT_BATCH = 100
+EXPORT_INTERVAL = 1.0
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('trace_span', default=None)
+
+_SQL_SPACES = re.compile(r'\s+')
+
+
+@dataclass(frozen=True)
+class TracingSettings:
+    """Configuração do tracing (ver from_env para as variáveis de ambiente)"""
+    sample_rate: float = 0.0
+    exporter: str = 'file'
+    file_path: str = 'data/traces.jsonl'
+    otlp_endpoint: str = 'http://localhost:4318/v1/traces'
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str] = os.environ) -> 'TracingSettings':
+        """TRACING_SAMPLE_RATE (0 desliga), TRACING_EXPORTER, TRACING_FILE e TRACING_OTLP_ENDPOINT"""
+        exporter = env.get('TRACING_EXPORTER', cls.exporter).lower()
+        if exporter not in TRACING_EXPORTERS:
+            raise ValueError(f"TRACING_EXPORTER inválido: {exporter} (use {', '.join(TRACING_EXPORTERS)})")
+        sample_rate = float(env.get('TRACING_SAMPLE_RATE', cls.sample_rate))
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"TRACING_SAMPLE_RATE fora de 0..1: {sample_rate}")
+        return cls(
+            sample_rate=sample_rate,
+            exporter=exporter,
+            file_path=env.get('TRACING_FILE', cls.file_path),
+            otlp_endpoint=env.get('TRACING_OTLP_ENDPOINT', cls.otlp_endpoint),
+        )
+
+
+class Span:
+    """Trecho cronometrado de um trace (tempos em ns desde a época)"""
+
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, trace: 'Trace', name: str, parent_id: Optional[str], attributes: Dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = random.getrandbits(64).to_bytes(8, 'big').hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+
+class Trace:
+    """Spans de uma update; exportado quando o span raiz termina"""
+
+    __slots__ = ('trace_id', 'spans')
+
+    def __init__(self):
+        self.trace_id = random.getrandbits(128).to_bytes(16, 'big').hex()
+        self.spans: List[Span] = []
+
+
+class _NoopScope:
+    """Span de trace não amostrado: não mede nada"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopScope()
+
+
+class _SpanScope:
+    __slots__ = ('tracer', 'span', 'token')
+
+    def __init__(self, tracer: 'Tracer', span: Span):
+        self.tracer = tracer
+        self.span = span
+        self.token = None
+
+    def __enter__(self) -> Span:
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        span.end_ns = time.time_ns()
+        if exc_type is not None:
+            span.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self.token)
+        span.trace.spans.append(span)
+        if span.parent_id is None:
+            self.tracer._finish(span.trace)
+        return False
+
+
+def _attribute_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def otlp_payload(traces: List[Trace]) -> Dict:
+    """ExportTraceServiceRequest (OTLP/JSON) com os spans dos traces"""
+    spans = []
+    for trace in traces:
+        for span in trace.spans:
+            item = {
+                'traceId': trace.trace_id,
+                'spanId': span.span_id,
+                'name': span.name,
+                'kind': 2 if span.parent_id is None else 1,   # SERVER na raiz, INTERNAL nos filhos
+                'startTimeUnixNano': str(span.start_ns),
+                'endTimeUnixNano': str(span.end_ns),
+                'attributes': [{'key': key, 'value': _attribute_value(
+                                    sql_summary(value) if key == 'db.statement' else value
+                               )} for key, value in span.attributes.items()],
+                'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+            }
+            if span.parent_id:
+                item['parentSpanId'] = span.parent_id
+            spans.append(item)
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+        'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+    }]}
+
+
+class TraceExporter:
+    """Thread que agrupa os traces terminados e grava/envia fora do event loop"""
+
+    def __init__(self, settings: TracingSettings):
+        self.settings = settings
+        self.exported = 0
+        self.failed = 0
+        self._queue: "queue.SimpleQueue[Optional[Trace]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+        self._thread.start()
+
+    def submit(self, trace: Trace):
+        self._queue.put(trace)
+
+    def close(self, timeout: float = 5.0):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        batch: List[Trace] = []
+        closing = False
+        while not closing:
+            deadline = time.monotonic() + EXPORT_INTERVAL
+            while len(batch) < EXPORT_BATCH:
+                try:
+                    trace = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if trace is None:
+                    closing = True
+                    break
+                batch.append(trace)
+            if batch:
+                self._export(batch)
+                batch = []
+
+    def _export(self, batch: List[Trace]):
+        body = json.dumps(otlp_payload(batch), separators=(',', ':'))
+        try:
+            if self.settings.exporter == 'otlp':
+                request = urllib.request.Request(
+                    self.settings.otlp_endpoint, data=body.encode('utf-8'),
+                    headers={'Content-Type': 'application/json'}, method='POST'
+                )
+                with urllib.request.urlopen(request, timeout=5):
+                    pass
+            else:
+                directory = os.path.dirname(self.settings.file_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.settings.file_path, 'a', encoding='utf-8') as f:
+                    f.write(body + '\n')
+            self.exported += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.warning(f"⚠️ Falha ao exportar {len(batch)} traces ({self.settings.exporter}): {e}")
+
+
+class Tracer:
+    """Amostragem na raiz: update fora da amostra não cria span nenhum
+
+    trace() abre o span raiz de uma update; span() e record() só fazem algo
+    dentro de um trace amostrado (o contextvar acompanha as corrotinas e
+    as tasks criadas a partir delas).
+    """
+
+    def __init__(self, settings: Optional[TracingSettings] = None):
+        self.settings = settings or TracingSettings.from_env()
+        self._exporter: Optional[TraceExporter] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.sample_rate > 0
+
+    def configure(self, settings: TracingSettings):
+        """Trocar a configuração (exportador atual é encerrado)"""
+        self.close()
+        self.settings = settings
+
+    def trace(self, name: str, **attributes):
+        if not self.enabled or random.random() >= self.settings.sample_rate:
+            return _NOOP
+        return _SpanScope(self, Span(Trace(), name, None, attributes))
+
+    def span(self, name: str, **attributes):
+        parent = _current_span.get()
+        if parent is None:
+            return _NOOP
+        return _SpanScope(self, Span(parent.trace, name, parent.span_id, attributes))
+
+    def record(self, name: str, seconds: float, **attributes):
+        """Span filho já terminado que durou `seconds` até agora (ex.: espera do pool)"""
+        parent = _current_span.get()
+        if parent is None:
+            return
+        span = Span(parent.trace, name, parent.span_id, attributes)
+        span.end_ns = span.start_ns
+        span.start_ns -= int(seconds * 1e9)
+        parent.trace.spans.append(span)
+
+    def current_trace_id(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.trace.trace_id if span is not None else None
+
+    def _finish(self, trace: Trace):
+        if self._exporter is None:
+            self._exporter = TraceExporter(self.settings)
+        self._exporter.submit(trace)
+
+    def stats(self) -> Dict:
+        exporter = self._exporter
+        return {
+            'sample_rate': self.settings.sample_rate,
+            'exporter': self.settings.exporter,
+            'exported': exporter.exported if exporter else 0,
+            'failed': exporter.failed if exporter else 0,
+        }
+
+    def close(self):
+        """Enviar os traces pendentes e parar a thread do exportador"""
+        if self._exporter is not None:
+            self._exporter.close()
+            self._exporter = None
+
+
+def sql_summary(query: str, limit: int = 200) -> str:
+    """Statement em uma linha para o atributo db.statement (parâmetros ficam como $n)"""
+    return _SQL_SPACES.sub(' ', query).strip()[:limit]
+
+
+def update_label(update) -> str:
+    """Rótulo da update sem conteúdo do usuário: comando, rota do callback ou tipo"""
+    query = getattr(update, 'callback_query', None)
+    if query is not None:
+        data = query.data or ''
+        return 'callback ' + ':'.join(data.split(':')[1:3]) if data[:1].isdigit() else 'callback'
+    message = getattr(update, 'effective_message', None)
+    text = getattr(message, 'text', None) or ''
+    if text.startswith('/'):
+        return text.split()[0].split('@')[0]
+    return 'texto' if text else 'update'
+
+
+class TracedRequest(BaseRequest):
+    """Cliente da Bot API que abre um span por chamada (método no nome do span)"""
+
+    def __init__(self, inner: BaseRequest):
+        self.inner = inner
+
+    @property
+    def read_timeout(self):
+        return self.inner.read_timeout
+
+    async def initialize(self):
+        await self.inner.initialize()
+
+    async def shutdown(self):
+        await self.inner.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        with tracer.span(f'telegram.{api_method}', **{'rpc.system': 'telegram', 'rpc.method': api_method}):
+            return await self.inner.do_request(
+                url, method, request_data=request_data, read_timeout=read_timeout,
+                write_timeout=write_timeout, connect_timeout=connect_timeout, pool_timeout=pool_timeout
+            )
+
+
+# Instância compartilhada (configurada pelas variáveis de ambiente)
+tracer = Tracer()
@@ -0,0 +1,450 @@
+"""
+Ingestão de Transações com Group Commit
+Fila write-behind: confirma ao usuário após o enfileiramento durável (journal local)
+ou após o commit, e grava as transações pendentes de vários usuários em um único INSERT
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Mapping, Optional
+import asyncio
+import json
+import logging
+import os
+import time
+
+from db_pool import CONNECTION_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Modos: 'off' (INSERT síncrono por transação), 'enqueue' (confirma após o
+# journal) e 'commit' (confirma após o group commit)
+INGEST_MODES = ('off', 'enqueue', 'commit')
+
+# Colunas gravadas: nome -> (tipo no jsonb_to_recordset, valor padrão)
+TRANSACTION_FIELDS = {
+    'user_id': ('integer', None),
+    'title': ('text', None),
+    'description': ('text', None),
+    'amount': ('numeric', None),
+    'type': ('text', None),
+    'category_id': ('integer', None),
+    'transaction_date': ('date', None),
+    'status': ('text', 'paid'),
+    'notes': ('text', None),
+    'tags': ('text[]', None),
+    'account_key': ('text', None),
+    'is_installment': ('boolean', False),
+    'installment_number': ('integer', None),
+    'total_installments': ('integer', None),
+    'idempotency_key': ('text', None),
+}
+
+_COLUMNS = ', '.join(TRANSACTION_FIELDS)
+
+# Uma linha por registro do lote; chaves repetidas (reenvios, replay do journal) são ignoradas
+BATCH_INSERT_SQL = f"""
+    INSERT INTO transactions ({_COLUMNS})
+    SELECT {_COLUMNS}
+    FROM jsonb_to_recordset($1::jsonb) AS r({', '.join(f'{name} {kind}' for name, (kind, _) in TRANSACTION_FIELDS.items())})
+    ON CONFLICT (idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+    RETURNING id, idempotency_key
+"""
+
+SINGLE_INSERT_SQL = f"""
+    INSERT INTO transactions ({_COLUMNS})
+    VALUES ({', '.join(f'${i}' for i in range(1, len(TRANSACTION_FIELDS) + 1))})
+    ON CONFLICT (idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+    RETURNING id
+"""
+
+EXISTING_KEYS_SQL = "SELECT id, idempotency_key FROM transactions WHERE idempotency_key = ANY($1::text[])"
+
+# Journal maior que isso é truncado quando não há transações pendentes
+JOURNAL_COMPACT_BYTES = 1024 * 1024
+
+
+def transaction_record(**fields) -> Dict:
+    """Registro de transação com todas as colunas (padrões aplicados)"""
+    unknown = set(fields) - set(TRANSACTION_FIELDS)
+    if unknown:
+        raise ValueError(f"Colunas desconhecidas: {', '.join(sorted(unknown))}")
+    if not fields.get('idempotency_key'):
+        raise ValueError("Transação sem idempotency_key")
+    return {name: fields.get(name, default) for name, (_, default) in TRANSACTION_FIELDS.items()}
+
+
+def record_params(record: Mapping) -> tuple:
+    """Parâmetros posicionais do SINGLE_INSERT_SQL"""
+    return tuple(record[name] for name in TRANSACTION_FIELDS)
+
+
+def batch_payload(records: List[Dict]) -> str:
+    """Parâmetro do BATCH_INSERT_SQL (os registros em um array JSON)"""
+    return json.dumps(records, default=str)
+
+
+@dataclass(frozen=True)
+class IngestSettings:
+    """Configuração da fila (ver from_env para as variáveis de ambiente)"""
+    mode: str = 'off'
+    interval_ms: float = 5.0
+    max_batch: int = 500
+    journal_path: Optional[str] = 'data/transactions.journal'
+    retry_delay: float = 1.0
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str] = os.environ) -> 'IngestSettings':
+        """TRANSACTION_INGEST_MODE, TRANSACTION_INGEST_INTERVAL_MS,
+        TRANSACTION_INGEST_MAX_BATCH e TRANSACTION_INGEST_JOURNAL (vazio desliga o journal)"""
+        mode = env.get('TRANSACTION_INGEST_MODE', cls.mode).lower()
+        if mode not in INGEST_MODES:
+            raise ValueError(f"TRANSACTION_INGEST_MODE inválido: {mode} (use {', '.join(INGEST_MODES)})")
+        return cls(
+            mode=mode,
+            interval_ms=float(env.get('TRANSACTION_INGEST_INTERVAL_MS', cls.interval_ms)),
+            max_batch=int(env.get('TRANSACTION_INGEST_MAX_BATCH', cls.max_batch)),
+            journal_path=env.get('TRANSACTION_INGEST_JOURNAL', cls.journal_path) or None,
+        )
+
+
+class PendingWrite:
+    """Transação na fila e o future de quem espera o commit"""
+
+    __slots__ = ('record', 'future', 'enqueued_at')
+
+    def __init__(self, record: Dict, future: asyncio.Future):
+        self.record = record
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class TransactionJournal:
+    """Journal local (JSON por linha) das transações ainda não commitadas
+
+    Entradas: {"e": registro} no enfileiramento, {"c": [chaves]} após o
+    commit e {"d": [chaves]} para registros descartados por erro. As
+    escritas concorrentes são agrupadas em um único fsync.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = asyncio.Lock()
+        self._lines: List[str] = []
+        self._waiter: Optional[asyncio.Future] = None
+        self.syncs = 0
+
+    def recover(self) -> List[Dict]:
+        """Registros enfileirados e nunca commitados; reescreve o journal só com eles"""
+        if not os.path.exists(self.path):
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            return []
+
+        pending: Dict[str, Dict] = {}
+        with open(self.path, encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Última linha incompleta (queda durante a escrita)
+                    continue
+                if 'e' in entry:
+                    pending[entry['e']['idempotency_key']] = entry['e']
+                for key in entry.get('c', []) + entry.get('d', []):
+                    pending.pop(key, None)
+
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as journal:
+            for record in pending.values():
+                journal.write(json.dumps({'e': record}, default=str) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temporary, self.path)
+        return list(pending.values())
+
+    async def append(self, entry: Dict):
+        """Gravar a entrada de forma durável (fsync compartilhado com as concorrentes)"""
+        self._lines.append(json.dumps(entry, default=str))
+        waiter = self._waiter
+        if waiter is None:
+            waiter = self._waiter = asyncio.get_running_loop().create_future()
+            asyncio.ensure_future(self._sync(waiter))
+        await asyncio.shield(waiter)
+
+    async def _sync(self, waiter: asyncio.Future):
+        async with self._lock:
+            lines, self._lines, self._waiter = self._lines, [], None
+            try:
+                await asyncio.to_thread(self._write, lines)
+                self.syncs += 1
+                waiter.set_result(None)
+            except Exception as e:
+                waiter.set_exception(e)
+
+    def _write(self, lines: List[str]):
+        with open(self.path, 'a', encoding='utf-8') as journal:
+            journal.write('\n'.join(lines) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    async def compact(self, is_idle: Callable[[], bool]):
+        """Truncar o journal grande quando tudo já foi commitado"""
+        async with self._lock:
+            if self._lines or not is_idle() or os.path.getsize(self.path) < JOURNAL_COMPACT_BYTES:
+                return
+            await asyncio.to_thread(self._truncate)
+
+    def _truncate(self):
+        with open(self.path, 'w', encoding='utf-8') as journal:
+            os.fsync(journal.fileno())
+
+
+class TransactionIngestor:
+    """Fila write-behind de transações com group commit
+
+    As transações de todos os usuários acumulam por até interval_ms e são
+    gravadas em um único INSERT ... SELECT FROM jsonb_to_recordset. A
+    idempotency_key torna reenvios e o replay do journal inofensivos.
+    """
+
+    def __init__(self, bot_instance, settings: Optional[IngestSettings] = None):
+        self.bot = bot_instance
+        self.settings = settings or IngestSettings.from_env()
+        self.journal = (
+            TransactionJournal(self.settings.journal_path)
+            if self.settings.journal_path and self.enabled else None
+        )
+        self._queue: List[PendingWrite] = []
+        self._inflight: List[PendingWrite] = []
+        self._uncommitted = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.stats = {'batches': 0, 'rows': 0, 'duplicates': 0, 'failed': 0,
+                      'retries': 0, 'max_batch': 0, 'total_latency': 0.0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.mode != 'off'
+
+    async def start(self):
+        """Iniciar o flush em segundo plano e reenviar o que ficou no journal"""
+        if not self.enabled or self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+        if self.journal is None:
+            logger.warning("⚠️ Ingestão sem journal: transações na fila se perdem se o processo cair")
+            return
+        recovered = await asyncio.to_thread(self.journal.recover)
+        self._uncommitted += len(recovered)
+        for record in recovered:
+            self._enqueue(record)
+        logger.info(
+            f"📥 Ingestão em group commit ({self.settings.mode}, {self.settings.interval_ms:g}ms, "
+            f"lote até {self.settings.max_batch})"
+            + (f", {len(recovered)} transações recuperadas do journal" if recovered else "")
+        )
+
+    async def submit(self, record: Dict, wait_commit: Optional[bool] = None) -> Optional[Dict]:
+        """Enfileirar a transação
+
+        Retorna {'id': None, 'queued': True, 'committed': future} após o
+        enfileiramento durável (o future resolve com a linha do group commit)
+        ou, com wait_commit (padrão no modo 'commit'), a linha gravada; a
+        espera é limitada pelo timeout de lote do pool (asyncio.TimeoutError).
+        """
+        if self._task is None:
+            raise RuntimeError("TransactionIngestor não iniciado")
+
+        # Contada como pendente antes do journal para a compactação não apagá-la
+        self._uncommitted += 1
+        if self.journal is not None:
+            try:
+                await self.journal.append({'e': record})
+            except Exception:
+                self._uncommitted -= 1
+                raise
+
+        pending = self._enqueue(record)
+        if wait_commit is None:
+            wait_commit = self.settings.mode == 'commit'
+        if wait_commit:
+            # O lote continua na fila se o chamador desistir (a chave evita duplicar no reenvio)
+            return await asyncio.wait_for(
+                asyncio.shield(pending.future), self.bot.db_pool.timeout_for('batch')
+            )
+        return {'id': None, 'queued': True, 'committed': pending.future}
+
+    def _enqueue(self, record: Dict) -> PendingWrite:
+        pending = PendingWrite(record, asyncio.get_running_loop().create_future())
+        self._queue.append(pending)
+        self._wakeup.set()
+        return pending
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if not self._queue and self._closing:
+                return
+            # Janela de agrupamento: outras transações chegam enquanto esperamos
+            if not self._closing and len(self._queue) < self.settings.max_batch:
+                await asyncio.sleep(self.settings.interval_ms / 1000)
+            self._wakeup.clear()
+
+            while self._queue:
+                batch = self._queue[:self.settings.max_batch]
+                del self._queue[:self.settings.max_batch]
+                self._inflight = batch
+                try:
+                    await self._write(batch)
+                except Exception as e:
+                    # Erro fora do previsto (ex.: journal): falha só este lote, o flush continua
+                    self._fail(batch, e)
+                self._inflight = []
+
+            if self._closing and not self._queue:
+                return
+
+    async def _write(self, batch: List[PendingWrite]):
+        try:
+            await self._commit(batch)
+        except CONNECTION_ERRORS as e:
+            # Banco indisponível: devolver o lote à frente da fila e tentar de novo
+            logger.warning(f"Group commit adiado ({len(batch)} transações): {e}")
+            self.stats['retries'] += 1
+            self._queue[:0] = batch
+            await asyncio.sleep(self.settings.retry_delay)
+        except Exception as e:
+            logger.error(f"Lote rejeitado ({len(batch)} transações), gravando uma a uma: {e}")
+            await self._commit_individually(batch)
+
+    def _fail(self, batch: List[PendingWrite], error: Exception):
+        """Resolver com None os futures ainda abertos do lote
+
+        Os registros não são marcados no journal: continuam pendentes e voltam
+        na próxima inicialização (a idempotency_key evita duplicar os já gravados).
+        """
+        pending_writes = [pending for pending in batch if not pending.future.done()]
+        logger.error(f"Falha no group commit ({len(pending_writes)} transações sem resposta): {error}",
+                     exc_info=error)
+        self.stats['failed'] += len(pending_writes)
+        for pending in pending_writes:
+            pending.future.set_result(None)
+
+    async def _commit(self, batch: List[PendingWrite]):
+        """Gravar o lote em um único statement e resolver os futures"""
+        records = [pending.record for pending in batch]
+        async with self.bot.db_pool.acquire() as conn:
+            rows = await conn.fetch(
+                BATCH_INSERT_SQL, batch_payload(records), timeout=self.bot.db_pool.timeout_for('batch')
+            )
+            inserted = {row['idempotency_key']: row['id'] for row in rows}
+
+            missing = [record['idempotency_key'] for record in records
+                       if record['idempotency_key'] not in inserted]
+            existing = {}
+            if missing:
+                existing = {
+                    row['idempotency_key']: row['id'] for row in await conn.fetch(EXISTING_KEYS_SQL, missing)
+                }
+
+        self.stats['batches'] += 1
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+        now = time.perf_counter()
+        for pending in batch:
+            key = pending.record['idempotency_key']
+            self.stats['total_latency'] += now - pending.enqueued_at
+            if key in inserted:
+                # Mesma chave duas vezes no lote (confirmação repetida): só a primeira gravou
+                result = {'id': inserted.pop(key)}
+                existing[key] = result['id']
+                self.stats['rows'] += 1
+            elif key in existing:
+                result = {'id': existing[key], 'duplicate': True}
+                self.stats['duplicates'] += 1
+            else:
+                result = None
+            if not pending.future.done():
+                pending.future.set_result(result)
+            self.bot.recent_writes.mark(pending.record['user_id'])
+
+        await self._settle(committed=[p.record['idempotency_key'] for p in batch])
+
+    async def _commit_individually(self, batch: List[PendingWrite]):
+        """Isolar registros inválidos de um lote rejeitado"""
+        for index, pending in enumerate(batch):
+            try:
+                await self._commit([pending])
+            except CONNECTION_ERRORS:
+                # Banco caiu no meio: o restante volta para a fila
+                self._queue[:0] = batch[index:]
+                return
+            except Exception as e:
+                logger.error(f"Transação descartada ({pending.record['idempotency_key']}): {e}")
+                self.stats['failed'] += 1
+                if not pending.future.done():
+                    pending.future.set_result(None)
+                await self._settle(dropped=[pending.record['idempotency_key']])
+
+    async def _settle(self, committed: List[str] = (), dropped: List[str] = ()):
+        self._uncommitted -= len(committed) + len(dropped)
+        if self.journal is None:
+            return
+        entry = {'c': list(committed)} if committed else {'d': list(dropped)}
+        await self.journal.append(entry)
+        if self._uncommitted == 0:
+            await self.journal.compact(lambda: self._uncommitted == 0)
+
+    async def flush(self):
+        """Aguardar até a fila atual ser gravada"""
+        futures = [pending.future for pending in self._queue]
+        if futures:
+            self._wakeup.set()
+            await asyncio.gather(*futures, return_exceptions=True)
+
+    async def close(self, timeout: Optional[float] = None):
+        """Gravar o que resta na fila e parar o flush
+
+        Com o banco fora do ar o lote voltaria à fila indefinidamente: após
+        timeout (padrão: timeout de lote do pool) o flush é cancelado e os
+        registros ficam no journal para a próxima inicialização.
+        """
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        if timeout is None:
+            timeout = self.bot.db_pool.timeout_for('batch')
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            unsent = 0
+            for pending in (*self._inflight, *self._queue):
+                if not pending.future.done():
+                    pending.future.set_result(None)
+                    unsent += 1
+            self._queue.clear()
+            self._inflight = []
+            logger.warning(
+                f"⚠️ Ingestão encerrada após {timeout:g}s com {unsent} transações sem gravar"
+                + ("; serão regravadas do journal na próxima inicialização" if self.journal else " (sem journal: perdidas)")
+            )
+        self._task = None
+
+    def snapshot(self) -> Dict:
+        """Métricas da fila (JSON-serializável)"""
+        stats = self.stats
+        settled = stats['rows'] + stats['duplicates']
+        return {
+            'mode': self.settings.mode,
+            'queued': len(self._queue),
+            'batches': stats['batches'],
+            'rows': stats['rows'],
+            'duplicates': stats['duplicates'],
+            'failed': stats['failed'],
+            'retries': stats['retries'],
+            'avg_batch': round((settled + stats['failed']) / stats['batches'], 1) if stats['batches'] else 0.0,
+            'max_batch': stats['max_batch'],
+            'avg_latency_ms': round(stats['total_latency'] / settled * 1000, 3) if settled else 0.0,
+            'journal_syncs': self.journal.syncs if self.journal else 0,
+        }